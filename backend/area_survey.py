@@ -0,0 +1,257 @@
+"""
+Batch area survey
+Splits a bounding box into a grid of cells, fetches each cell's reference imagery
+concurrently and runs change detection against post-event imagery in a process pool
+"""
+
+import os
+import re
+import math
+import time
+import asyncio
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from change_detection import CHANGE_CELL_MIN_RATIO, align_images, change_grid, change_metrics, classify_changes
+from tiles import lonlat_to_pixel, mosaic, pixel_to_lonlat
+
+# Stored post-event imagery: <SURVEY_IMAGERY_DIR>/<event>/<z>/<x>/<y>.png (or .jpg)
+DEFAULT_IMAGERY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "survey_imagery")
+EVENT_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+def detect_cell_changes(post: np.ndarray, reference_png: bytes, align: bool = True) -> Dict:
+    """
+    Worker entry point (module level so it can be sent to a process pool)
+
+    Args:
+        post: HxWx3 uint8 post-event imagery of the cell
+        reference_png: Reference imagery of the same window
+        align: Register the reference onto the post-event imagery first
+
+    Returns:
+        Change percentage, detected change types and alignment for the cell
+    """
+    reference_img = Image.open(BytesIO(reference_png)).convert("RGB")
+    if reference_img.size != (post.shape[1], post.shape[0]):
+        reference_img = reference_img.resize((post.shape[1], post.shape[0]))
+    reference = np.array(reference_img)
+
+    overlap = None
+    aligned = False
+    if align:
+        warped, overlap, alignment = align_images(reference, post)
+        if warped is not None:
+            reference, aligned = warped, True
+
+    metrics = change_metrics(post, reference, mask=overlap)
+    grid = change_grid(post, reference, mask=overlap)
+    return {
+        "change_percentage": round(metrics["change_percentage"], 2),
+        "changes_detected": classify_changes(metrics),
+        "hotspots": int(np.count_nonzero(np.nan_to_num(grid, nan=0.0) >= CHANGE_CELL_MIN_RATIO)),
+        "aligned": aligned
+    }
+
+class AreaSurvey:
+    """Grid survey of a bounding box, streamed as cells finish and ranked by change"""
+
+    def __init__(self, image_service, workers: int = 2, fetch_concurrency: int = 8, max_cells: int = 256,
+                 imagery_dir: str = DEFAULT_IMAGERY_DIR, align: bool = True):
+        """
+        Args:
+            image_service: HEREImageService providing reference windows (rate-limited and cached)
+            workers: Change detection processes
+            fetch_concurrency: Reference windows fetched at once
+            max_cells: Largest grid a survey may request
+            imagery_dir: Root of stored post-event tile sets, one directory per event
+            align: Register reference imagery onto each cell before comparing
+        """
+        self.image_service = image_service
+        self.workers = workers
+        self.fetch_concurrency = fetch_concurrency
+        self.max_cells = max_cells
+        self.imagery_dir = imagery_dir
+        self.align = align
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def grid(self, south: float, west: float, north: float, east: float, zoom: int, cell_px: int = 512) -> Dict:
+        """
+        Cells covering a bounding box at a zoom level
+
+        Raises:
+            ValueError: Invalid bbox, or more than max_cells cells
+
+        Returns:
+            Dict with the bbox pixel window (left, top, width, height) and its cells;
+            edge cells are clipped to the bbox
+        """
+        if not (south < north and west < east):
+            raise ValueError("bbox must be south < north and west < east")
+        left, top = lonlat_to_pixel(west, north, zoom)
+        right, bottom = lonlat_to_pixel(east, south, zoom)
+        left, top = math.floor(left), math.floor(top)
+        width, height = max(1, math.ceil(right) - left), max(1, math.ceil(bottom) - top)
+        count = math.ceil(width / cell_px) * math.ceil(height / cell_px)
+        if count > self.max_cells:
+            raise ValueError(f"bbox needs {count} cells at zoom {zoom} (at most {self.max_cells}) - "
+                             f"use a lower zoom or larger cells")
+
+        cells = []
+        for row, y in enumerate(range(0, height, cell_px)):
+            for column, x in enumerate(range(0, width, cell_px)):
+                cell_width, cell_height = min(cell_px, width - x), min(cell_px, height - y)
+                west_lon, north_lat = pixel_to_lonlat(left + x, top + y, zoom)
+                east_lon, south_lat = pixel_to_lonlat(left + x + cell_width, top + y + cell_height, zoom)
+                # Center on a whole pixel so the reference crop lands exactly on the cell
+                center_lon, center_lat = pixel_to_lonlat(left + x + cell_width // 2, top + y + cell_height // 2, zoom)
+                cells.append({
+                    "id": f"r{row}c{column}",
+                    "row": row,
+                    "column": column,
+                    "x": x,
+                    "y": y,
+                    "width": cell_width,
+                    "height": cell_height,
+                    "bounds": [round(west_lon, 7), round(south_lat, 7), round(east_lon, 7), round(north_lat, 7)],
+                    "center": {"lat": round(center_lat, 7), "lon": round(center_lon, 7)}
+                })
+        return {"zoom": zoom, "left": left, "top": top, "width": width, "height": height, "cells": cells}
+
+    def validate_event(self, event: str) -> str:
+        """Path of a stored event's tile set"""
+        if not EVENT_NAME.match(event):
+            raise ValueError("event may only contain letters, digits, '-' and '_'")
+        path = os.path.join(self.imagery_dir, event)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"No stored imagery for event '{event}'")
+        return path
+
+    def upload_source(self, image: Image.Image, survey: Dict) -> Callable[[Dict], Optional[np.ndarray]]:
+        """Post-event imagery from one upload covering the whole bbox"""
+        scale_x, scale_y = image.width / survey["width"], image.height / survey["height"]
+
+        def load(cell: Dict) -> Optional[np.ndarray]:
+            box = (
+                round(cell["x"] * scale_x), round(cell["y"] * scale_y),
+                round((cell["x"] + cell["width"]) * scale_x), round((cell["y"] + cell["height"]) * scale_y)
+            )
+            if box[2] <= box[0] or box[3] <= box[1]:
+                return None
+            return np.array(image.crop(box).resize((cell["width"], cell["height"])))
+
+        return load
+
+    def stored_source(self, event_dir: str, survey: Dict) -> Callable[[Dict], Optional[np.ndarray]]:
+        """Post-event imagery from a stored z/x/y tile set"""
+        def load_tile(z: int, x: int, y: int) -> Optional[Image.Image]:
+            for extension in ("png", "jpg"):
+                path = os.path.join(event_dir, str(z), str(x), f"{y}.{extension}")
+                if os.path.exists(path):
+                    return Image.open(path)
+            return None
+
+        def load(cell: Dict) -> Optional[np.ndarray]:
+            image = mosaic(survey["left"] + cell["x"], survey["top"] + cell["y"], survey["zoom"],
+                           cell["width"], cell["height"], load_tile)
+            return np.array(image) if image is not None else None
+
+        return load
+
+    async def run(self, survey: Dict, post_source: Callable[[Dict], Optional[np.ndarray]],
+                  top: int = 20) -> AsyncIterator[Dict]:
+        """
+        Survey every cell, yielding events as they happen
+
+        Yields:
+            {"type": "survey"} first, then one {"type": "cell"} per finished cell with
+            its current rank, then {"type": "ranking"} with the top cells by change
+        """
+        cells = survey["cells"]
+        yield {
+            "type": "survey",
+            "zoom": survey["zoom"],
+            "cells": len(cells),
+            "grid": {"width": survey["width"], "height": survey["height"]}
+        }
+
+        if self._executor is None:
+            # Spawned, not forked: the server process holds sockets, threads and a DB pool
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        loop = asyncio.get_running_loop()
+        fetches = asyncio.Semaphore(self.fetch_concurrency)
+        # Cells holding imagery at once (fetching or waiting for a worker)
+        window = self.fetch_concurrency + 2 * self.workers
+        start = time.perf_counter()
+
+        async def survey_cell(cell: Dict) -> Dict:
+            result = {key: cell[key] for key in ("id", "row", "column", "bounds", "center")}
+            try:
+                async with fetches:
+                    # Reference windows go through the shared tile limiter and image cache
+                    reference, post = await asyncio.gather(
+                        asyncio.to_thread(self.image_service.get_reference_png, cell["center"]["lat"],
+                                          cell["center"]["lon"], survey["zoom"], cell["width"], cell["height"],
+                                          "satellite.day"),
+                        asyncio.to_thread(post_source, cell)
+                    )
+                if "error" in reference:
+                    return {**result, "status": reference.get("status", "error"), "error": reference["error"]}
+                if post is None:
+                    return {**result, "status": "no_imagery"}
+                changes = await loop.run_in_executor(self._executor, detect_cell_changes, post,
+                                                     reference["png"], self.align)
+            except Exception as e:
+                # A corrupt tile or a crashed worker loses one cell, not the survey
+                print(f"❌ Error surveying cell {cell['id']}: {e}")
+                return {**result, "status": "error", "error": str(e)}
+            return {**result, "status": "done", "reference_cached": bool(reference.get("cached")), **changes}
+
+        done: List[Dict] = []
+        failed = 0
+        remaining = iter(cells)
+        pending = set()
+        try:
+            while True:
+                # Tasks are created as earlier cells finish, never the whole grid up front
+                for cell in remaining:
+                    pending.add(asyncio.create_task(survey_cell(cell)))
+                    if len(pending) >= window:
+                        break
+                if not pending:
+                    break
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    result = task.result()
+                    if result["status"] == "done":
+                        done.append(result)
+                        result["rank"] = 1 + sum(other["change_percentage"] > result["change_percentage"]
+                                                 for other in done)
+                    else:
+                        failed += 1
+                    yield {"type": "cell", **result}
+        finally:
+            # Client disconnected (generator closed) or the survey failed: stop the other cells
+            for task in pending:
+                task.cancel()
+
+        done.sort(key=lambda cell: cell["change_percentage"], reverse=True)
+        elapsed = time.perf_counter() - start
+        print(f"✅ Surveyed {len(done)}/{len(cells)} cells in {elapsed:.2f}s")
+        yield {
+            "type": "ranking",
+            "surveyed": len(done),
+            "skipped": failed,
+            "seconds": round(elapsed, 2),
+            "cells": [{**cell, "rank": rank} for rank, cell in enumerate(done[:top], start=1)]
+        }
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,380 @@
+"""
+Change detection kernels
+Single-pass metrics between a disaster image and its reference, computed in row strips
+"""
+
+from io import BytesIO
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import cv2
+from PIL import Image
+
+# Pixels per strip - bounds every temporary to a few MB regardless of image size
+STRIP_PIXELS = 1 << 20
+# A channel value differing by more than this counts as changed
+CHANGE_THRESHOLD = 30
+
+# Change map: cell size in pixels, and the changed-pixel ratio from which a cell is reported
+CHANGE_CELL_SIZE = 32
+CHANGE_CELL_MIN_RATIO = 0.25
+# Cell levels by changed-pixel ratio, highest first
+CHANGE_LEVELS = [(0.75, "critical"), (0.5, "high"), (0.25, "medium"), (0.0, "low")]
+
+# Alignment: feature matching runs on a pyramid level this large, refinement at full size
+ALIGN_MATCH_SIDE = 800
+ALIGN_MIN_INLIERS = 15
+
+def downsample(image: np.ndarray, max_pixels: int) -> np.ndarray:
+    """Pyramid level of an image with at most max_pixels pixels (area averaging)"""
+    height, width = image.shape[:2]
+    if height * width <= max_pixels:
+        return image
+    scale = (max_pixels / (height * width)) ** 0.5
+    return cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+def change_metrics(disaster: np.ndarray, reference: np.ndarray, threshold: int = CHANGE_THRESHOLD,
+                   max_pixels: Optional[int] = None, mask: Optional[np.ndarray] = None) -> Dict:
+    """
+    Every change metric in one pass over two same-sized uint8 RGB images
+
+    Works strip by strip on int16 differences, so no full-size float64 copy is
+    made and uint8 subtraction can't wrap around.
+
+    Args:
+        disaster: HxWx3 uint8 disaster image
+        reference: HxWx3 uint8 reference image
+        threshold: Per-channel difference that counts as a changed value
+        max_pixels: Compare on a downsampled pyramid level of at most this many pixels
+        mask: Optional HxW bool array - only these pixels are compared
+
+    Returns:
+        Dict with change_percentage, darkening (mean gray difference), green_loss,
+        texture_change (gray std difference), color_shift (mean absolute difference)
+        and the pixel count compared
+    """
+    if max_pixels:
+        if mask is not None:
+            mask = downsample(mask.astype(np.uint8), max_pixels).astype(bool)
+        disaster = downsample(disaster, max_pixels)
+        reference = downsample(reference, max_pixels)
+
+    height, width = disaster.shape[:2]
+    rows = max(1, STRIP_PIXELS // max(width, 1))
+
+    pixels = 0
+    changed = 0
+    diff_sum = 0
+    green_diff_sum = 0
+    abs_diff_sum = 0
+    gray = {"disaster": [0.0, 0.0], "reference": [0.0, 0.0]}  # sum, sum of squares (gray * 3)
+
+    for top in range(0, height, rows):
+        d = disaster[top:top + rows]
+        r = reference[top:top + rows]
+        if mask is not None:
+            strip_mask = mask[top:top + rows]
+            d, r = d[strip_mask], r[strip_mask]  # (n, 3)
+        else:
+            d, r = d.reshape(-1, 3), r.reshape(-1, 3)
+        if not len(d):
+            continue
+        pixels += len(d)
+
+        diff = d.astype(np.int16)
+        diff -= r
+        diff_sum += int(diff.sum(dtype=np.int64))
+        green_diff_sum += int(diff[:, 1].sum(dtype=np.int64))
+        np.abs(diff, out=diff)
+        abs_diff_sum += int(diff.sum(dtype=np.int64))
+        changed += int(np.count_nonzero(diff > threshold))
+
+        for name, image in (("disaster", d), ("reference", r)):
+            channel_sum = image.sum(axis=1, dtype=np.float64)
+            gray[name][0] += float(channel_sum.sum(dtype=np.float64))
+            gray[name][1] += float(np.dot(channel_sum, channel_sum))
+
+    if not pixels:
+        return {"pixels": 0, "change_percentage": 0.0, "darkening": 0.0, "green_loss": 0.0,
+                "texture_change": 0.0, "color_shift": 0.0}
+
+    def gray_std(name: str) -> float:
+        total, squares = gray[name]
+        mean = total / pixels
+        return max(squares / pixels - mean * mean, 0.0) ** 0.5 / 3
+
+    values = pixels * 3
+    return {
+        "pixels": pixels,
+        "change_percentage": changed / values * 100,
+        "darkening": diff_sum / values,
+        "green_loss": -green_diff_sum / pixels,
+        "texture_change": gray_std("disaster") - gray_std("reference"),
+        "color_shift": abs_diff_sum / values
+    }
+
+def classify_changes(metrics: Dict) -> Dict:
+    """Change flags from the metrics (thresholds of the original analysis)"""
+    return {
+        "water_increase": metrics["darkening"] < -20,
+        "vegetation_loss": metrics["green_loss"] > 10,
+        "infrastructure_damage": abs(metrics["texture_change"]) > 15,
+        "color_shift_detected": metrics["color_shift"] > 25
+    }
+
+def change_grid(disaster: np.ndarray, reference: np.ndarray, cell: int = CHANGE_CELL_SIZE,
+                threshold: int = CHANGE_THRESHOLD, mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Changed-pixel ratio per cell x cell block, in O(pixels)
+
+    A pixel is changed when any channel differs by more than threshold. Counts are
+    block reductions over row strips, so temporaries stay strip-sized.
+
+    Args:
+        disaster: HxWx3 uint8 disaster image
+        reference: HxWx3 uint8 reference image
+        cell: Cell size in pixels
+        threshold: Per-channel difference that counts as a change
+        mask: Optional HxW bool array of comparable pixels
+
+    Returns:
+        float32 array (rows x columns of cells); NaN where less than half a cell was comparable
+    """
+    height, width = disaster.shape[:2]
+    grid_rows, grid_columns = -(-height // cell), -(-width // cell)
+    changed = np.zeros((grid_rows, grid_columns), np.int64)
+    valid = np.zeros((grid_rows, grid_columns), np.int64)
+    strip_rows = max(1, STRIP_PIXELS // (width * cell))
+
+    for first_row in range(0, grid_rows, strip_rows):
+        top = first_row * cell
+        bottom = min(height, top + strip_rows * cell)
+        row_count = -(-(bottom - top) // cell)
+
+        diff = disaster[top:bottom].astype(np.int16)
+        diff -= reference[top:bottom]
+        np.abs(diff, out=diff)
+        strip_changed = diff.max(axis=2) > threshold
+        strip_valid = mask[top:bottom] if mask is not None else np.ones(strip_changed.shape, bool)
+        strip_changed &= strip_valid
+
+        # Zero-pad the strip to whole cells, then sum each cell block
+        for counts, values in ((changed, strip_changed), (valid, strip_valid)):
+            padded = np.zeros((row_count * cell, grid_columns * cell), np.uint8)
+            padded[:bottom - top, :width] = values
+            counts[first_row:first_row + row_count] = \
+                padded.reshape(row_count, cell, grid_columns, cell).sum(axis=(1, 3))
+
+    # Partial edge cells count against their own area, not a full cell
+    cell_area = np.full((grid_rows, grid_columns), cell * cell, np.int64)
+    if height % cell:
+        cell_area[-1] = (height % cell) * cell
+    if width % cell:
+        cell_area[:, -1] = cell_area[:, -1] // cell * (width % cell)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = (changed / valid).astype(np.float32)
+    ratio[valid * 2 < cell_area] = np.nan
+    return ratio
+
+def change_level(ratio: float) -> str:
+    return next(level for minimum, level in CHANGE_LEVELS if ratio >= minimum)
+
+def grid_polygons(grid: np.ndarray, cell: int, size: Tuple[int, int], min_ratio: float = CHANGE_CELL_MIN_RATIO,
+                  to_lonlat: Optional[Callable[[float, float], Tuple[float, float]]] = None) -> Dict:
+    """
+    Changed cells as a GeoJSON FeatureCollection of polygons
+
+    Args:
+        grid: Output of change_grid
+        cell: Cell size in pixels
+        size: (width, height) of the image the grid covers
+        min_ratio: Cells at or above this changed ratio are returned
+        to_lonlat: Maps image (x, y) to (lon, lat); pixel coordinates are returned without it
+
+    Returns:
+        FeatureCollection, most changed cells first
+    """
+    width, height = size
+    rows, columns = np.nonzero(np.nan_to_num(grid, nan=0.0) >= min_ratio)
+    order = np.argsort(-grid[rows, columns], kind="stable")
+    project = to_lonlat or (lambda x, y: (x, y))
+
+    features = []
+    for row, column in zip(rows[order], columns[order]):
+        x0, y0 = int(column) * cell, int(row) * cell
+        x1, y1 = min(x0 + cell, width), min(y0 + cell, height)
+        ring = [project(x, y) for x, y in ((x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0))]
+        ratio = float(grid[row, column])
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [[[round(a, 7), round(b, 7)] for a, b in ring]]},
+            "properties": {
+                "row": int(row),
+                "column": int(column),
+                "change_ratio": round(ratio, 3),
+                "level": change_level(ratio)
+            }
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+def grid_overlay_png(grid: np.ndarray, cell: int, size: Tuple[int, int],
+                     min_ratio: float = CHANGE_CELL_MIN_RATIO) -> bytes:
+    """Transparent heatmap PNG the size of the image (yellow to red, clear below min_ratio)"""
+    ratio = np.nan_to_num(grid, nan=0.0)
+    overlay = np.zeros(grid.shape + (4,), np.uint8)
+    overlay[..., 0] = 239
+    overlay[..., 1] = (200 * (1 - ratio)).astype(np.uint8)
+    overlay[..., 2] = 40
+    overlay[..., 3] = np.where(ratio >= min_ratio, 80 + 140 * ratio, 0).astype(np.uint8)
+
+    width, height = size
+    image = Image.fromarray(overlay, "RGBA").resize(
+        (grid.shape[1] * cell, grid.shape[0] * cell), Image.NEAREST
+    ).crop((0, 0, width, height))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+def _gray_level(image: np.ndarray, max_side: int) -> Tuple[np.ndarray, float]:
+    """Grayscale pyramid level no larger than max_side, with its scale factor"""
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+    scale = min(1.0, max_side / max(gray.shape[:2]))
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray, scale
+
+def _plausible(homography: np.ndarray) -> bool:
+    """Reject degenerate fits (mirroring, collapse, extreme perspective)"""
+    determinant = np.linalg.det(homography[:2, :2])
+    return 0.25 < determinant < 4.0 and abs(homography[2, 0]) < 2e-3 and abs(homography[2, 1]) < 2e-3
+
+def align_images(reference: np.ndarray, target: np.ndarray, refine: bool = True
+                 ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], Dict]:
+    """
+    Register a reference image onto a target (e.g. a HERE tile onto a drone photo)
+
+    ORB features are matched on a downscaled pyramid level and a RANSAC homography is
+    fitted there, scaled to full resolution, then refined with ECC at full resolution.
+
+    Args:
+        reference: HxWx3 uint8 image to warp
+        target: HxWx3 uint8 image defining the output frame
+
+    Returns:
+        (warped reference, bool overlap mask, info) - the images are None when no
+        reliable alignment was found
+    """
+    info = {"aligned": False, "matches": 0, "inliers": 0, "refined": False}
+    reference_gray, reference_scale = _gray_level(reference, ALIGN_MATCH_SIDE)
+    target_gray, target_scale = _gray_level(target, ALIGN_MATCH_SIDE)
+
+    orb = cv2.ORB_create(nfeatures=2000)
+    reference_points, reference_descriptors = orb.detectAndCompute(reference_gray, None)
+    target_points, target_descriptors = orb.detectAndCompute(target_gray, None)
+    if reference_descriptors is None or target_descriptors is None:
+        return None, None, info
+
+    # Lowe ratio test on the two nearest neighbours
+    matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+    matches = [
+        pair[0] for pair in matcher.knnMatch(reference_descriptors, target_descriptors, k=2)
+        if len(pair) == 2 and pair[0].distance < 0.75 * pair[1].distance
+    ]
+    info["matches"] = len(matches)
+    if len(matches) < ALIGN_MIN_INLIERS:
+        return None, None, info
+
+    source = np.float32([reference_points[m.queryIdx].pt for m in matches])
+    destination = np.float32([target_points[m.trainIdx].pt for m in matches])
+    homography, inliers = cv2.findHomography(source, destination, cv2.RANSAC, 3.0)
+    info["inliers"] = int(inliers.sum()) if inliers is not None else 0
+    if homography is None or info["inliers"] < ALIGN_MIN_INLIERS:
+        return None, None, info
+
+    # Pyramid coordinates -> full resolution: H = S_target^-1 . H_level . S_reference
+    homography = (
+        np.diag([1 / target_scale, 1 / target_scale, 1.0]) @ homography
+        @ np.diag([reference_scale, reference_scale, 1.0])
+    )
+    if not _plausible(homography):
+        return None, None, info
+
+    height, width = target.shape[:2]
+    if refine:
+        try:
+            # ECC estimates the inverse mapping (target -> reference coordinates)
+            criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 1e-4)
+            _, inverse = cv2.findTransformECC(
+                cv2.cvtColor(target, cv2.COLOR_RGB2GRAY).astype(np.float32),
+                cv2.cvtColor(reference, cv2.COLOR_RGB2GRAY).astype(np.float32),
+                np.linalg.inv(homography).astype(np.float32),
+                cv2.MOTION_HOMOGRAPHY, criteria, None, 5
+            )
+            refined = np.linalg.inv(inverse.astype(np.float64))
+            refined /= refined[2, 2]
+            if _plausible(refined):
+                homography, info["refined"] = refined, True
+        except (cv2.error, np.linalg.LinAlgError):
+            pass  # Keep the feature-based estimate
+
+    warped = cv2.warpPerspective(reference, homography, (width, height), flags=cv2.INTER_LINEAR)
+    # Overlap: warped footprint of the reference, eroded so interpolated borders are excluded
+    footprint = cv2.warpPerspective(np.full(reference.shape[:2], 255, np.uint8), homography, (width, height),
+                                    flags=cv2.INTER_NEAREST)
+    overlap = cv2.erode(footprint, np.ones((3, 3), np.uint8)) > 0
+
+    info.update(
+        aligned=True,
+        overlap_percentage=round(float(overlap.mean()) * 100, 2),
+        homography=[[round(float(v), 6) for v in row] for row in homography]
+    )
+    return warped, overlap, info
+
+# Benchmark: python change_detection.py
+if __name__ == "__main__":
+    import time
+    import tracemalloc
+
+    def legacy(disaster_img: np.ndarray, ref_img: np.ndarray) -> Dict:
+        """The previous float64 implementation, for comparison"""
+        difference = np.abs(disaster_img.astype(float) - ref_img.astype(float))
+        change_percentage = (np.sum(difference > 30) / difference.size) * 100
+        disaster_gray = np.mean(disaster_img, axis=2)
+        ref_gray = np.mean(ref_img, axis=2)
+        return {
+            "change_percentage": change_percentage,
+            "darkening": np.mean(disaster_gray - ref_gray),
+            "green_loss": np.mean(ref_img[:, :, 1]) - np.mean(disaster_img[:, :, 1]),
+            "texture_change": np.std(disaster_gray) - np.std(ref_gray),
+            "color_shift": np.mean(np.abs(disaster_img.astype(np.int16) - ref_img))
+        }
+
+    def measure(fn):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return result, seconds, peak / 1e6
+
+    print("\n" + "="*60)
+    print("CHANGE DETECTION BENCHMARK")
+    print("="*60 + "\n")
+    print(f"{'input':>5} | {'kernel':>16} | {'time (s)':>8} | {'peak MB':>8} | {'change %':>8}")
+    rng = np.random.default_rng(0)
+    for label, (width, height) in (("4K", (3840, 2160)), ("8K", (7680, 4320))):
+        reference = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        disaster = reference.copy()
+        disaster[: height // 2] = np.clip(disaster[: height // 2].astype(np.int16) - 60, 0, 255)
+
+        for name, fn in (
+            ("float64 legacy", lambda: legacy(disaster, reference)),
+            ("fused strips", lambda: change_metrics(disaster, reference)),
+            ("fused, 1/16 area", lambda: change_metrics(disaster, reference, max_pixels=height * width // 16)),
+            ("change grid", lambda: {"change_percentage": float(np.nanmean(change_grid(disaster, reference))) * 100}),
+        ):
+            result, seconds, peak = measure(fn)
+            print(f"{label:>5} | {name:>16} | {seconds:>8.3f} | {peak:>8.1f} | {result['change_percentage']:>8.2f}")
@@ -0,0 +1,279 @@
+"""
+GIS file formats for layer exports
+GeoJSON features, GeoParquet (pyarrow) and spatially indexed FlatGeobuf (pyogrio/GDAL)
+"""
+
+import os
+import struct
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from serialization import dumps
+
+# pyarrow / pyogrio are optional - the GeoJSON export works without them
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = ds = pq = None
+    PYARROW_AVAILABLE = False
+
+try:
+    import pyogrio
+    PYOGRIO_AVAILABLE = True
+except ImportError:
+    pyogrio = None
+    PYOGRIO_AVAILABLE = False
+
+# (west, south, east, north) in WGS84 degrees
+BBox = Tuple[float, float, float, float]
+
+# Rows per Parquet row group - small enough that bbox reads can skip most of the file
+PARQUET_ROW_GROUP_SIZE = 16 * 1024
+
+# Columns generated by feature_table / write_geoparquet - same-named properties get a prefix
+GENERATED_COLUMNS = ('lon', 'lat', 'geometry', 'bbox')
+PROPERTY_PREFIX = "prop_"
+
+def to_feature(record: Dict, layer: Optional[str] = None) -> Dict:
+    """GeoJSON Point feature for an API record ({"coordinates": {"lat", "lon"}, ...})"""
+    coordinates = record.get('coordinates')
+    properties = {k: v for k, v in record.items() if k != 'coordinates'}
+    if layer:
+        properties['layer'] = layer
+    return {
+        "type": "Feature",
+        "id": record.get('id'),
+        "geometry": {
+            "type": "Point",
+            "coordinates": [coordinates['lon'], coordinates['lat']]
+        } if coordinates else None,
+        "properties": properties
+    }
+
+def _point_wkb(lon: float, lat: float) -> bytes:
+    # Little-endian WKB Point
+    return struct.pack("<BIdd", 1, 1, lon, lat)
+
+def _column(values: List):
+    """Arrow array with a type inferred from the values (nested values become JSON text)"""
+    kinds = {type(v) for v in values if v is not None}
+    if kinds and kinds <= {bool}:
+        return pa.array(values, pa.bool_())
+    if kinds and kinds <= {int}:
+        return pa.array(values, pa.int64())
+    if kinds and kinds <= {int, float}:
+        return pa.array([None if v is None else float(v) for v in values], pa.float64())
+    return pa.array([
+        None if v is None else v if isinstance(v, str)
+        else dumps(v).decode() if isinstance(v, (dict, list)) else str(v)
+        for v in values
+    ], pa.string())
+
+def feature_table(records: List[Dict]):
+    """
+    Columnar layer: one column per property plus WKB geometry and lon/lat
+
+    Properties named like a generated column (lon, lat, geometry, bbox) are
+    written as prop_<name> instead of overwriting it.
+
+    Args:
+        records: API records with a "coordinates" dict
+
+    Returns:
+        pyarrow Table
+    """
+    names: Dict[str, None] = {}
+    for record in records:
+        names.update(dict.fromkeys(k for k in record if k != 'coordinates'))
+    columns_for = {}
+    for name in names:
+        column = name
+        while column in GENERATED_COLUMNS or (column != name and column in names):
+            column = PROPERTY_PREFIX + column
+        columns_for[name] = column
+
+    lons, lats, geometry = [], [], []
+    for record in records:
+        coordinates = record.get('coordinates')
+        if coordinates:
+            lons.append(coordinates['lon'])
+            lats.append(coordinates['lat'])
+            geometry.append(_point_wkb(coordinates['lon'], coordinates['lat']))
+        else:
+            lons.append(None)
+            lats.append(None)
+            geometry.append(None)
+
+    columns = {column: _column([record.get(name) for record in records]) for name, column in columns_for.items()}
+    columns['lon'] = pa.array(lons, pa.float64())
+    columns['lat'] = pa.array(lats, pa.float64())
+    columns['geometry'] = pa.array(geometry, pa.binary())
+    return pa.table(columns)
+
+def _morton_order(lons: np.ndarray, lats: np.ndarray) -> np.ndarray:
+    """Row order along a Z-order curve so nearby points share row groups"""
+    x = np.clip(((lons + 180.0) / 360.0 * 65535), 0, 65535).astype(np.uint64)
+    y = np.clip(((lats + 90.0) / 180.0 * 65535), 0, 65535).astype(np.uint64)
+    code = np.zeros(len(x), dtype=np.uint64)
+    for bit in range(16):
+        code |= ((x >> np.uint64(bit)) & np.uint64(1)) << np.uint64(2 * bit)
+        code |= ((y >> np.uint64(bit)) & np.uint64(1)) << np.uint64(2 * bit + 1)
+    return np.argsort(code, kind="stable")
+
+def write_geoparquet(table, sink, row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+    """
+    Write a feature table as GeoParquet 1.1
+
+    Rows are Z-order sorted and carry a bbox covering column, so readers (DuckDB,
+    GeoPandas, read_geoparquet_bbox) can skip row groups outside a query window.
+    """
+    lons = table['lon'].to_numpy(zero_copy_only=False).astype(float)
+    lats = table['lat'].to_numpy(zero_copy_only=False).astype(float)
+    table = table.take(pa.array(_morton_order(np.nan_to_num(lons), np.nan_to_num(lats))))
+
+    lon_column, lat_column = table['lon'], table['lat']
+    bbox_column = pa.StructArray.from_arrays(
+        [lon_column.combine_chunks(), lat_column.combine_chunks(),
+         lon_column.combine_chunks(), lat_column.combine_chunks()],
+        names=["xmin", "ymin", "xmax", "ymax"]
+    )
+    table = table.append_column("bbox", bbox_column)
+
+    valid = ~np.isnan(lons)
+    extent = [
+        float(lons[valid].min()), float(lats[valid].min()),
+        float(lons[valid].max()), float(lats[valid].max())
+    ] if valid.any() else []
+    geo_metadata = {
+        "version": "1.1.0",
+        "primary_column": "geometry",
+        "columns": {
+            "geometry": {
+                "encoding": "WKB",
+                "geometry_types": ["Point"],
+                "bbox": extent,
+                "covering": {"bbox": {
+                    "xmin": ["bbox", "xmin"], "ymin": ["bbox", "ymin"],
+                    "xmax": ["bbox", "xmax"], "ymax": ["bbox", "ymax"]
+                }}
+            }
+        }
+    }
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"geo": dumps(geo_metadata)})
+    pq.write_table(table, sink, row_group_size=row_group_size, compression="zstd",
+                   write_statistics=True)
+
+def write_flatgeobuf(table, path: str, layer: str):
+    """
+    Write a feature table as FlatGeobuf with its packed Hilbert R-tree index
+
+    Records without coordinates are left out - the index can't hold NULL geometries.
+    """
+    table = table.filter(table['geometry'].is_valid())
+    pyogrio.write_arrow(
+        table.drop_columns(["lon", "lat"]),
+        path,
+        layer=layer,
+        driver="FlatGeobuf",
+        geometry_name="geometry",
+        geometry_type="Point",
+        crs="EPSG:4326",
+        layer_options={"SPATIAL_INDEX": "YES"}
+    )
+
+def flatgeobuf_bytes(table, layer: str) -> bytes:
+    """FlatGeobuf needs a seekable file for the index - write to a temp dir and read back"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"{layer}.fgb")
+        write_flatgeobuf(table, path, layer)
+        with open(path, "rb") as f:
+            return f.read()
+
+def read_geoparquet_bbox(path: str, bbox: BBox):
+    """Read the features of a GeoParquet file inside a bbox (row groups pruned by statistics)"""
+    west, south, east, north = bbox
+    condition = (
+        (ds.field("bbox", "xmin") <= east) & (ds.field("bbox", "xmax") >= west)
+        & (ds.field("bbox", "ymin") <= north) & (ds.field("bbox", "ymax") >= south)
+    )
+    return ds.dataset(path, format="parquet").to_table(filter=condition)
+
+def read_flatgeobuf_bbox(path: str, bbox: BBox):
+    """Read the features of a FlatGeobuf file inside a bbox (via its spatial index)"""
+    _, table = pyogrio.read_arrow(path, bbox=bbox)
+    return table
+
+# Benchmark: python geo_formats.py [features]
+if __name__ == "__main__":
+    import sys
+    import json
+    import time
+    import random
+
+    feature_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    # ~1% of the generated area
+    query_bbox = (72.75, 18.95, 72.85, 19.05)
+
+    def synthetic_records(n: int) -> List[Dict]:
+        return [{
+            "id": f"zone_{i}",
+            "name": f"Zone {i}",
+            "coordinates": {"lat": 19.0 + random.uniform(-0.5, 0.5), "lon": 72.8 + random.uniform(-0.5, 0.5)},
+            "severity": random.choice(["critical", "high", "medium", "low"]),
+            "damage_score": round(random.random(), 2),
+            "affected_area_km2": round(random.uniform(0.5, 50), 1),
+            "verified": random.random() > 0.5,
+            "last_updated": "2025-01-01T00:00:00"
+        } for i in range(n)]
+
+    def timed(fn):
+        start = time.perf_counter()
+        result = fn()
+        return result, time.perf_counter() - start
+
+    records = synthetic_records(feature_count)
+    print("\n" + "="*60)
+    print(f"GIS EXPORT BENCHMARK ({feature_count:,} point features)")
+    print("="*60 + "\n")
+    print(f"{'format':>11} | {'write (s)':>9} | {'size MB':>7} | {'bbox read (s)':>13} | {'hits':>6}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        def write_geojson(path):
+            with open(path, "wb") as f:
+                f.write(dumps({"type": "FeatureCollection", "features": [to_feature(r) for r in records]}))
+
+        def read_geojson_bbox(path, bbox):
+            west, south, east, north = bbox
+            with open(path, "rb") as f:
+                features = json.loads(f.read())["features"]
+            return [
+                feature for feature in features
+                if west <= feature["geometry"]["coordinates"][0] <= east
+                and south <= feature["geometry"]["coordinates"][1] <= north
+            ]
+
+        formats = [("geojson", "geojson", write_geojson, read_geojson_bbox)]
+        if PYARROW_AVAILABLE:
+            formats.append((
+                "geoparquet", "parquet",
+                lambda path: write_geoparquet(feature_table(records), path),
+                read_geoparquet_bbox
+            ))
+            if PYOGRIO_AVAILABLE:
+                formats.append((
+                    "flatgeobuf", "fgb",
+                    lambda path: write_flatgeobuf(feature_table(records), path, "zones"),
+                    read_flatgeobuf_bbox
+                ))
+
+        for name, extension, write, read in formats:
+            path = os.path.join(directory, f"zones.{extension}")
+            _, write_seconds = timed(lambda: write(path))
+            hits, read_seconds = timed(lambda: read(path, query_bbox))
+            print(f"{name:>11} | {write_seconds:>9.3f} | {os.path.getsize(path) / 1e6:>7.2f} | "
+                  f"{read_seconds:>13.4f} | {len(hits):>6,}")
@@ -1,63 +1,190 @@
 """
 HERE Map Image API Integration
-Provides cartographic reference images for disaster comparison and change detection
+Provides cartographic reference images (mosaicked from cached z/x/y raster tiles)
+for disaster comparison and change detection
 """
 
 import os
 import requests
-from typing import Dict, Optional, Tuple
+from typing import BinaryIO, Callable, Dict, Optional, Tuple, Union
 from dotenv import load_dotenv
 import base64
 from io import BytesIO
 from PIL import Image, ImageDraw
 import numpy as np
-import time
-from functools import wraps
+
+from change_detection import (CHANGE_CELL_MIN_RATIO, CHANGE_CELL_SIZE, align_images, change_grid, change_metrics,
+                              classify_changes, grid_overlay_png, grid_polygons)
+from http_client import here_http
+from image_cache import DEFAULT_CACHE_PATH, ImageCache
+from rate_limiter import RateLimitedError, here_limiter
+from tiles import lonlat_to_pixel, mosaic, pixel_to_lonlat
 
 load_dotenv()
 
-def rate_limit(max_per_second=2):
-    """Rate limiter decorator - limits to max_per_second requests"""
-    min_interval = 1.0 / max_per_second
-    last_called = [0.0]
-    
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            elapsed = time.time() - last_called[0]
-            left_to_wait = min_interval - elapsed
-            if left_to_wait > 0:
-                time.sleep(left_to_wait)
-            ret = func(*args, **kwargs)
-            last_called[0] = time.time()
-            return ret
-        return wrapper
-    return decorator
+MB = 1024 * 1024
+
+# Uploaded images are decoded at most this large on their longest side (JPEGs via draft mode);
+# a request may ask for up to COMPARE_MAX_SIDE_LIMIT (full-resolution drone imagery, e.g. 4K)
+COMPARE_MAX_SIDE = int(os.getenv("COMPARE_MAX_SIDE", "1024"))
+COMPARE_MAX_SIDE_LIMIT = int(os.getenv("COMPARE_MAX_SIDE_LIMIT", "4096"))
+# Align the reference onto uploads (ORB + RANSAC homography) before comparing
+COMPARE_ALIGN = os.getenv("COMPARE_ALIGN", "true").lower() == "true"
+# Refuse images with more pixels than this before decoding (decompression bombs)
+MAX_IMAGE_PIXELS = 100_000_000
+
+# Reference map types -> HERE Raster Tile API v3 styles
+TILE_STYLES = {
+    "normal.day": "explore.day",
+    "satellite.day": "satellite.day",
+    "terrain.day": "topo.day",
+    "hybrid.day": "explore.satellite.day"
+}
 
 class HEREImageService:
-    """HERE Map Image API service for cartographic reference images"""
+    """HERE raster tile service for cartographic reference images"""
     
     def __init__(self):
         self.api_key = os.getenv("HERE_API_KEY", "")
-        self.map_image_base = "https://image.maps.ls.hereapi.com/mia/1.6"
-        self._cache = {}  # Simple in-memory cache
+        # {z}/{x}/{y} template; point HERE_TILE_URL at a local tile server for offline testing
+        self.tile_url = os.getenv("HERE_TILE_URL", "https://maps.hereapi.com/v3/base/mc/{z}/{x}/{y}/png")
+        # Raw image bytes; the SQLite tier is shared by every worker process and survives restarts
+        self._cache = ImageCache(
+            path=os.getenv("HERE_CACHE_PATH") or DEFAULT_CACHE_PATH,
+            memory_bytes=int(os.getenv("HERE_CACHE_MEMORY_MB", "64")) * MB,
+            disk_bytes=int(os.getenv("HERE_CACHE_DISK_MB", "512")) * MB,
+            ttl_seconds=float(os.getenv("HERE_CACHE_TTL_HOURS", "168")) * 3600
+        )
+        self.limiter = here_limiter
+        self.http = here_http
         
     def is_configured(self) -> bool:
         """Check if HERE API key is configured"""
         return bool(self.api_key and self.api_key != "YOUR_HERE_API_KEY_HERE")
     
-    @rate_limit(max_per_second=2)  # Limit to 2 requests per second
-    def get_reference_image(
-        self, 
-        lat: float, 
-        lon: float, 
+    def cache_stats(self) -> Dict:
+        """Image cache hit ratio, evictions and sizes"""
+        return self._cache.stats()
+    
+    def _fetch_tile(self, zoom: int, x: int, y: int, map_type: str) -> requests.Response:
+        """Rate-limited tile GET; raises RateLimitedError on 429 (after slowing tiles down)"""
+        self.limiter.acquire_sync(self.api_key, "tiles")
+        params = {"style": TILE_STYLES.get(map_type, "explore.day"), "apiKey": self.api_key}
+        response = self.http.get("tiles", self.tile_url.format(z=zoom, x=x, y=y), params=params, timeout=15)
+        retry_after = self.limiter.feedback(self.api_key, "tiles", response)
+        if retry_after is not None:
+            raise RateLimitedError("tiles", retry_after)
+        return response
+    
+    def _tile(self, zoom: int, x: int, y: int, map_type: str) -> Tuple[bytes, bool]:
+        """Raw tile bytes and whether they came from the cache (raises on HTTP errors)"""
+        cache_key = f"tile/{map_type}/{zoom}/{x}/{y}"
+        data = self._cache.get(cache_key)
+        if data is not None:
+            return data, True
+        response = self._fetch_tile(zoom, x, y, map_type)
+        response.raise_for_status()
+        self._cache.put(cache_key, response.content)
+        return response.content, False
+    
+    def get_tile(self, zoom: int, x: int, y: int, map_type: str = "normal.day") -> Optional[bytes]:
+        """
+        Get one raster tile
+        
+        Args:
+            zoom: Zoom level
+            x: Tile column
+            y: Tile row
+            map_type: Map style (normal.day, satellite.day, terrain.day, hybrid.day)
+            
+        Returns:
+            PNG bytes, or None if the tile couldn't be fetched
+        """
+        try:
+            return self._tile(zoom, x, y, map_type)[0]
+        except (RateLimitedError, requests.exceptions.RequestException) as e:
+            print(f"❌ Error fetching tile {zoom}/{x}/{y}: {e}")
+            return None
+    
+    @staticmethod
+    def _mock_reference(width: int, height: int) -> Image.Image:
+        """Sample image standing in for HERE imagery"""
+        # Use normal/clean Mumbai image as reference (not the flood image!)
+        sample_path = os.path.join(os.path.dirname(__file__), "test_images", "normal_mumbai_reference.jpg")
+        try:
+            if os.path.exists(sample_path):
+                return Image.open(sample_path).convert('RGB')
+        except Exception as e:
+            print(f"Mock mode error: {e}, using simple placeholder")
+        
+        # Fallback: Create a simple gray satellite-like image
+        img = Image.new('RGB', (width, height), color=(200, 200, 200))
+        draw = ImageDraw.Draw(img)
+        # Draw some grid lines to simulate map
+        for i in range(0, width, 50):
+            draw.line([(i, 0), (i, height)], fill=(180, 180, 180), width=1)
+        for i in range(0, height, 50):
+            draw.line([(0, i), (width, i)], fill=(180, 180, 180), width=1)
+        return img
+    
+    def _reference_window(
+        self, lat: float, lon: float, zoom: int, width: int, height: int, map_type: str
+    ) -> Tuple[Optional[Image.Image], Dict]:
+        """
+        Decoded reference image for a window
+        
+        Returns:
+            (RGB image, metadata) - the image is None and metadata has "error" on failure
+        """
+        if not self.is_configured():
+            return None, {"error": "HERE API key not configured"}
+        
+        result = {
+            "success": True,
+            "location": {"lat": lat, "lon": lon},
+            "zoom": zoom,
+            "dimensions": {"width": width, "height": height},
+            "map_type": map_type,
+            "format": "png"
+        }
+        
+        # Mock mode for testing (bypasses the API and its rate limits)
+        if os.getenv("USE_MOCK_IMAGES", "false").lower() == "true":
+            print(f"🔧 MOCK MODE: Using sample HERE reference image for {lat}, {lon}")
+            result["mock"] = True
+            return self._mock_reference(width, height), result
+        
+        # Mosaic the tiles under the requested window, then crop to its exact center and size
+        center_x, center_y = lonlat_to_pixel(lon, lat, zoom)
+        tiles = {"total": 0, "cached": 0}
+        
+        def load_tile(z: int, x: int, y: int) -> Image.Image:
+            data, cached = self._tile(z, x, y, map_type)
+            tiles["total"] += 1
+            tiles["cached"] += cached
+            return Image.open(BytesIO(data))
+        
+        try:
+            image = mosaic(round(center_x) - width // 2, round(center_y) - height // 2, zoom, width, height, load_tile)
+        except RateLimitedError as e:
+            return None, e.as_result()
+        except requests.exceptions.RequestException as e:
+            return None, {"error": f"Failed to fetch reference image: {str(e)}"}
+        
+        result["tiles"] = tiles
+        return image, result
+    
+    def get_reference_png(
+        self,
+        lat: float,
+        lon: float,
         zoom: int = 15,
         width: int = 512,
         height: int = 512,
         map_type: str = "normal.day"
-    ) -> Optional[Dict]:
+    ) -> Dict:
         """
-        Get HERE cartographic reference image for a location
+        Get HERE cartographic reference image for a location as raw PNG bytes
         
         Args:
             lat: Latitude
@@ -68,124 +195,62 @@ class HEREImageService:
             map_type: Map style (normal.day, satellite.day, terrain.day, hybrid.day)
             
         Returns:
-            Dict with image data and metadata
+            Dict with metadata and the PNG under "png" (or "error")
         """
-        if not self.is_configured():
-            return {"error": "HERE API key not configured"}
-        
-        # Mock mode for testing (bypasses rate limits)
-        if os.getenv("USE_MOCK_IMAGES", "false").lower() == "true":
-            print(f"🔧 MOCK MODE: Using sample HERE reference image for {lat}, {lon}")
-            
-            # Use normal/clean Mumbai image as reference (not the flood image!)
-            sample_path = os.path.join(os.path.dirname(__file__), "test_images", "normal_mumbai_reference.jpg")
-            
-            try:
-                # Use one of the test images as a mock reference
-                if os.path.exists(sample_path):
-                    with open(sample_path, 'rb') as f:
-                        mock_image_data = base64.b64encode(f.read()).decode('utf-8')
-                else:
-                    # Fallback: Create a simple gray satellite-like image
-                    from PIL import Image, ImageDraw
-                    img = Image.new('RGB', (width, height), color=(200, 200, 200))
-                    draw = ImageDraw.Draw(img)
-                    # Draw some grid lines to simulate map
-                    for i in range(0, width, 50):
-                        draw.line([(i, 0), (i, height)], fill=(180, 180, 180), width=1)
-                    for i in range(0, height, 50):
-                        draw.line([(0, i), (width, i)], fill=(180, 180, 180), width=1)
-                    
-                    buffer = BytesIO()
-                    img.save(buffer, format='PNG')
-                    mock_image_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                
-                return {
-                    "success": True,
-                    "image_base64": mock_image_data,
-                    "location": {"lat": lat, "lon": lon},
-                    "zoom": zoom,
-                    "dimensions": {"width": width, "height": height},
-                    "map_type": map_type,
-                    "format": "png",
-                    "mock": True
-                }
-            except Exception as e:
-                print(f"Mock mode error: {e}, using simple placeholder")
-                # Ultimate fallback
-                mock_image = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5ErkJggg=="
-                return {
-                    "success": True,
-                    "image_base64": mock_image,
-                    "location": {"lat": lat, "lon": lon},
-                    "zoom": zoom,
-                    "dimensions": {"width": width, "height": height},
-                    "map_type": map_type,
-                    "format": "png",
-                    "mock": True
-                }
-        
-        # Check cache first
-        cache_key = f"{lat}_{lon}_{zoom}_{width}_{height}_{map_type}"
-        if cache_key in self._cache:
-            print(f"✅ Returning cached image for {lat}, {lon}")
-            return self._cache[cache_key]
-        
-        try:
-            # HERE Map Image API endpoint
-            url = f"{self.map_image_base}/mapview"
-            
-            params = {
-                "c": f"{lat},{lon}",  # Center coordinates
-                "z": zoom,
-                "w": width,
-                "h": height,
-                "t": 0,  # Map type: 0=normal, 1=satellite, 2=terrain, 3=hybrid
-                "apiKey": self.api_key
-            }
-            
-            # Map type conversion
-            type_map = {
-                "normal.day": 0,
-                "satellite.day": 1,
-                "terrain.day": 2,
-                "hybrid.day": 3
-            }
-            params["t"] = type_map.get(map_type, 0)
-            
-            response = requests.get(url, params=params, timeout=15)
-            
-            # Handle rate limiting with better error message
-            if response.status_code == 429:
-                return {
-                    "error": "Rate limit reached. Please wait 30-60 seconds and try again. HERE API limits requests per second.",
-                    "retry_after": 60,
-                    "status": "rate_limited"
-                }
-            
-            response.raise_for_status()
-            
-            # Convert image to base64 for easy transmission
-            image_data = base64.b64encode(response.content).decode('utf-8')
-            
-            result = {
+        # Encoded windows are cached too, keyed by the center pixel the crop is snapped to
+        center_x, center_y = lonlat_to_pixel(lon, lat, zoom)
+        cache_key = f"png/{map_type}/{zoom}/{round(center_x)}/{round(center_y)}/{width}x{height}"
+        mock = os.getenv("USE_MOCK_IMAGES", "false").lower() == "true"
+        png = None if mock or not self.is_configured() else self._cache.get(cache_key)
+        if png is not None:
+            return {
                 "success": True,
-                "image_base64": image_data,
                 "location": {"lat": lat, "lon": lon},
                 "zoom": zoom,
                 "dimensions": {"width": width, "height": height},
                 "map_type": map_type,
-                "format": "png"
+                "format": "png",
+                "cached": True,
+                "png": png
             }
-            
-            # Cache the result
-            self._cache[cache_key] = result
-            print(f"✅ Cached image for {lat}, {lon}")
-            
+        
+        image, result = self._reference_window(lat, lon, zoom, width, height, map_type)
+        if image is None:
             return result
+        buffer = BytesIO()
+        image.save(buffer, format="PNG")
+        result["png"] = buffer.getvalue()
+        if not mock:
+            self._cache.put(cache_key, result["png"])
+        return result
+    
+    def get_reference_image(
+        self, 
+        lat: float, 
+        lon: float, 
+        zoom: int = 15,
+        width: int = 512,
+        height: int = 512,
+        map_type: str = "normal.day"
+    ) -> Optional[Dict]:
+        """
+        Get HERE cartographic reference image for a location, base64-encoded for JSON clients
+        
+        Args:
+            lat: Latitude
+            lon: Longitude
+            zoom: Zoom level (1-20, higher = more detail)
+            width: Image width in pixels
+            height: Image height in pixels
+            map_type: Map style (normal.day, satellite.day, terrain.day, hybrid.day)
             
-        except requests.exceptions.RequestException as e:
-            return {"error": f"Failed to fetch reference image: {str(e)}"}
+        Returns:
+            Dict with image data and metadata
+        """
+        result = self.get_reference_png(lat, lon, zoom, width, height, map_type)
+        if "png" in result:
+            result["image_base64"] = base64.b64encode(result.pop("png")).decode('utf-8')
+        return result
     
     def get_satellite_reference(
         self,
@@ -206,25 +271,52 @@ class HEREImageService:
             height: Image height
             
         Returns:
-            Dict with satellite image data
+            Dict with satellite image metadata and raw PNG bytes
+        """
+        return self.get_reference_png(lat, lon, zoom, width, height, "satellite.day")
+    
+    @staticmethod
+    def open_image(source: Union[str, bytes, BinaryIO], max_side: int = COMPARE_MAX_SIDE) -> Image.Image:
         """
-        return self.get_reference_image(lat, lon, zoom, width, height, "satellite.day")
+        Decode an image as RGB, no larger than max_side on its longest side
+        
+        JPEGs are decoded straight at 1/2, 1/4 or 1/8 scale (draft mode), so a large
+        photo never materializes at full resolution.
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = BytesIO(source)
+        img = Image.open(source)  # Reads the header only
+        if img.width * img.height > MAX_IMAGE_PIXELS:
+            raise ValueError(f"Image too large ({img.width}x{img.height})")
+        img.draft("RGB", (max_side, max_side))
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if max(img.size) > max_side:
+            img.thumbnail((max_side, max_side))
+        return img
     
     def compare_disaster_image(
         self,
-        disaster_image_path: str,
+        disaster_image: Union[str, bytes, BinaryIO],
         lat: float,
         lon: float,
-        zoom: int = 15
+        zoom: int = 15,
+        cell_size: int = CHANGE_CELL_SIZE,
+        overlay: bool = False,
+        max_side: int = COMPARE_MAX_SIDE
     ) -> Optional[Dict]:
         """
         Compare disaster image with HERE reference cartographic image
         
         Args:
-            disaster_image_path: Path to disaster image
+            disaster_image: Image bytes, a binary file-like object (e.g. a spooled upload) or a path
             lat: Location latitude
             lon: Location longitude
             zoom: Zoom level for reference image
+            cell_size: Change map cell size in pixels
+            overlay: Embed the change map as a base64 PNG overlay
+            max_side: Longest side the upload is compared at (capped at COMPARE_MAX_SIDE_LIMIT);
+                the reference window is fetched at the same size, so larger means more tiles
             
         Returns:
             Dict with comparison results and change detection metrics
@@ -233,33 +325,22 @@ class HEREImageService:
             return {"error": "HERE API key not configured"}
         
         try:
-            # Load disaster image
-            disaster_img = Image.open(disaster_image_path)
-            
-            # Convert to RGB if needed (remove alpha channel)
-            if disaster_img.mode == 'RGBA':
-                disaster_img = disaster_img.convert('RGB')
-            elif disaster_img.mode != 'RGB':
-                disaster_img = disaster_img.convert('RGB')
-            
+            # Load disaster image (downscaled while decoding)
+            disaster_img = self.open_image(disaster_image, min(max_side, COMPARE_MAX_SIDE_LIMIT))
             disaster_array = np.array(disaster_img)
             
-            # Get HERE reference image
-            ref_result = self.get_satellite_reference(lat, lon, zoom, 
-                                                     disaster_img.width, 
+            # Get HERE reference image (raw PNG bytes - no base64 round trip)
+            ref_result = self.get_satellite_reference(lat, lon, zoom,
+                                                     disaster_img.width,
                                                      disaster_img.height)
             
             if "error" in ref_result:
                 return ref_result
             
-            # Decode reference image
-            ref_image_data = base64.b64decode(ref_result["image_base64"])
-            ref_img = Image.open(BytesIO(ref_image_data))
+            ref_img = Image.open(BytesIO(ref_result["png"]))
             
             # Convert reference to RGB if needed
-            if ref_img.mode == 'RGBA':
-                ref_img = ref_img.convert('RGB')
-            elif ref_img.mode != 'RGB':
+            if ref_img.mode != 'RGB':
                 ref_img = ref_img.convert('RGB')
             
             ref_array = np.array(ref_img)
@@ -269,18 +350,38 @@ class HEREImageService:
                 ref_img = ref_img.resize((disaster_img.width, disaster_img.height))
                 ref_array = np.array(ref_img)
             
-            # Final check: ensure both are RGB (3 channels)
-            if len(disaster_array.shape) == 2:
-                disaster_array = np.stack([disaster_array] * 3, axis=-1)
-            if len(ref_array.shape) == 2:
-                ref_array = np.stack([ref_array] * 3, axis=-1)
+            # Register the reference onto the upload so offsets/rotation don't read as change,
+            # then compare only where the two overlap
+            overlap = None
+            alignment = {"aligned": False}
+            if COMPARE_ALIGN:
+                warped, overlap, alignment = align_images(ref_array, disaster_array)
+                if warped is not None:
+                    ref_array = warped
             
-            # Calculate change detection metrics
-            difference = np.abs(disaster_array.astype(float) - ref_array.astype(float))
-            change_percentage = (np.sum(difference > 30) / difference.size) * 100
+            # All metrics in one pass over int16 strips
+            metrics = change_metrics(disaster_array, ref_array, mask=overlap)
+            change_percentage = metrics["change_percentage"]
+            changes = classify_changes(metrics)
             
-            # Detect specific changes
-            changes = self._analyze_changes(disaster_array, ref_array)
+            # Where it changed: per-cell ratios, changed cells as georeferenced polygons
+            grid = change_grid(disaster_array, ref_array, cell=cell_size, mask=overlap)
+            size = (disaster_img.width, disaster_img.height)
+            to_lonlat = self._georeference(lat, lon, zoom, size, alignment.get("homography"))
+            cells = grid_polygons(grid, cell_size, size, to_lonlat=to_lonlat)
+            change_map = {
+                "cell_size": cell_size,
+                "rows": grid.shape[0],
+                "columns": grid.shape[1],
+                "min_ratio": CHANGE_CELL_MIN_RATIO,
+                "changed_cells": len(cells["features"]),
+                "grid": [[None if np.isnan(v) else round(float(v), 3) for v in row] for row in grid],
+                "cells": cells
+            }
+            if overlay:
+                change_map["overlay_png_base64"] = base64.b64encode(
+                    grid_overlay_png(grid, cell_size, size)
+                ).decode('utf-8')
             
             return {
                 "success": True,
@@ -288,13 +389,39 @@ class HEREImageService:
                 "change_percentage": round(change_percentage, 2),
                 "changes_detected": changes,
                 "disaster_image_size": disaster_array.shape,
+                "max_side": min(max_side, COMPARE_MAX_SIDE_LIMIT),
                 "reference_image_size": ref_array.shape,
+                "alignment": alignment,
+                "change_map": change_map,
                 "analysis": self._generate_analysis(change_percentage, changes)
             }
             
         except Exception as e:
             return {"error": f"Image comparison failed: {str(e)}"}
     
+    @staticmethod
+    def _georeference(lat: float, lon: float, zoom: int, size: Tuple[int, int],
+                      homography=None) -> Callable[[float, float], Tuple[float, float]]:
+        """
+        Image (x, y) -> (lon, lat) for an upload compared against the reference window centered on lat/lon
+        
+        Args:
+            size: (width, height) of the upload, which is also the reference window size
+            homography: Reference -> upload mapping from alignment, if it succeeded
+        """
+        width, height = size
+        center_x, center_y = lonlat_to_pixel(lon, lat, zoom)
+        left, top = round(center_x) - width // 2, round(center_y) - height // 2
+        inverse = np.linalg.inv(np.array(homography, dtype=float)) if homography else None
+        
+        def to_lonlat(x: float, y: float) -> Tuple[float, float]:
+            if inverse is not None:
+                x, y, w = inverse @ (x, y, 1.0)
+                x, y = x / w, y / w
+            return pixel_to_lonlat(left + x, top + y, zoom)
+        
+        return to_lonlat
+    
     def _analyze_changes(self, disaster_img: np.ndarray, ref_img: np.ndarray) -> Dict:
         """
         Analyze specific types of changes between images
@@ -306,46 +433,7 @@ class HEREImageService:
         Returns:
             Dict with detected changes
         """
-        changes = {
-            "water_increase": False,
-            "vegetation_loss": False,
-            "infrastructure_damage": False,
-            "color_shift_detected": False
-        }
-        
-        # Convert to grayscale for analysis
-        if len(disaster_img.shape) == 3:
-            disaster_gray = np.mean(disaster_img, axis=2)
-            ref_gray = np.mean(ref_img, axis=2)
-        else:
-            disaster_gray = disaster_img
-            ref_gray = ref_img
-        
-        # Detect water (darker areas in disaster image)
-        water_threshold = -20
-        water_change = np.mean(disaster_gray - ref_gray)
-        if water_change < water_threshold:
-            changes["water_increase"] = True
-        
-        # Detect vegetation loss (color analysis if RGB)
-        if len(disaster_img.shape) == 3 and disaster_img.shape[2] >= 3:
-            # Green channel analysis
-            green_loss = np.mean(ref_img[:,:,1]) - np.mean(disaster_img[:,:,1])
-            if green_loss > 10:
-                changes["vegetation_loss"] = True
-        
-        # Detect infrastructure damage (edge/texture changes)
-        edge_change = np.std(disaster_gray) - np.std(ref_gray)
-        if abs(edge_change) > 15:
-            changes["infrastructure_damage"] = True
-        
-        # Overall color shift
-        if len(disaster_img.shape) == 3:
-            color_diff = np.mean(np.abs(disaster_img - ref_img))
-            if color_diff > 25:
-                changes["color_shift_detected"] = True
-        
-        return changes
+        return classify_changes(change_metrics(disaster_img, ref_img))
     
     def _generate_analysis(self, change_pct: float, changes: Dict) -> str:
         """Generate human-readable analysis"""
@@ -376,7 +464,8 @@ class HEREImageService:
         lat: float,
         lon: float,
         radius_km: float = 1.0,
-        zoom: int = 14
+        zoom: int = 14,
+        encoding: Optional[str] = None
     ) -> Optional[Dict]:
         """
         Get reference images for area comparison (before/after disaster)
@@ -386,6 +475,7 @@ class HEREImageService:
             lon: Center longitude
             radius_km: Radius to cover in kilometers
             zoom: Zoom level
+            encoding: "base64" to embed the image; otherwise only its metadata is returned
             
         Returns:
             Dict with reference image and area info
@@ -410,6 +500,9 @@ class HEREImageService:
         
         if "error" in ref_image:
             return ref_image
+        png = ref_image.pop("png")
+        if encoding == "base64":
+            ref_image["image_base64"] = base64.b64encode(png).decode('utf-8')
         
         return {
             "success": True,
@@ -419,3 +512,67 @@ class HEREImageService:
             "reference_image": ref_image,
             "coverage_area_km2": round(np.pi * radius_km * radius_km, 2)
         }
+
+# Benchmark: python here_image_service.py [iterations]
+if __name__ == "__main__":
+    import sys
+    import time
+    import tempfile
+    import threading
+    import http.server
+    from serialization import dumps
+
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    class TileHandler(http.server.BaseHTTPRequestHandler):
+        """Local stand-in for the HERE tile API: noisy photo-like tiles"""
+        def do_GET(self):
+            rng = np.random.default_rng(abs(hash(self.path)) % (2 ** 32))
+            base = np.linspace(60, 190, 256, dtype=np.float32)[None, :, None]
+            pixels = np.clip(base + rng.normal(0, 25, (256, 256, 3)), 0, 255).astype(np.uint8)
+            buffer = BytesIO()
+            Image.fromarray(pixels).save(buffer, format="PNG")
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.end_headers()
+            self.wfile.write(buffer.getvalue())
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), TileHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as directory:
+        service = HEREImageService()
+        service.api_key = "benchmark"
+        service.tile_url = f"http://127.0.0.1:{server.server_port}/{{z}}/{{x}}/{{y}}.png"
+        service._cache = ImageCache(path=os.path.join(directory, "images.sqlite"))
+
+        def timed(fn) -> Tuple[float, int]:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                size = fn()
+            return (time.perf_counter() - start) / iterations * 1000, size
+
+        print("\n" + "="*60)
+        print(f"REFERENCE IMAGE BENCHMARK ({iterations} warm requests each)")
+        print("="*60 + "\n")
+        print(f"{'size':>9} | {'path':>20} | {'ms/request':>10} | {'payload KB':>10}")
+        for width in (512, 1024):
+            args = (19.076, 72.8777, 15, width, width, "satellite.day")
+            service.get_reference_png(*args)  # warm the tile and PNG caches
+
+            paths = [
+                ("base64 JSON", lambda: len(dumps(service.get_reference_image(*args)))),
+                ("raw PNG", lambda: len(service.get_reference_png(*args)["png"])),
+                ("compare: b64 decode", lambda: np.asarray(Image.open(BytesIO(base64.b64decode(
+                    service.get_reference_image(*args)["image_base64"]))).convert("RGB")).size),
+                ("compare: raw decode", lambda: np.asarray(Image.open(BytesIO(
+                    service.get_reference_png(*args)["png"])).convert("RGB")).size),
+            ]
+            for name, fn in paths:
+                ms, size = timed(fn)
+                payload = f"{size / 1024:>10.1f}" if "compare" not in name else f"{'-':>10}"
+                print(f"{width:>4}x{width:<4} | {name:>20} | {ms:>10.2f} | {payload}")
+    server.shutdown()
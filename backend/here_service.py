@@ -4,12 +4,45 @@ Provides routing, isoline, and geocoding services for disaster response
 """
 
 import os
+import re
+import math
+import time
+import unicodedata
 import requests
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
 from dotenv import load_dotenv
 
+from http_client import here_http
+from image_cache import BlobCache
+from rate_limiter import RateLimitedError, here_limiter
+from route_cache import RouteCache, compact_isolines, expand_isolines, route_bbox
+from serialization import dumps, loads
+
 load_dotenv()
 
+# Geocoding results (forward by normalized address, reverse by geohash cell); "not found" is cached briefly
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH") or \
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "here_cache", "geocode.sqlite")
+GEOCODE_TTL_SECONDS = float(os.getenv("GEOCODE_CACHE_TTL_HOURS", "720")) * 3600
+GEOCODE_NEGATIVE_TTL_SECONDS = float(os.getenv("GEOCODE_NEGATIVE_TTL_HOURS", "6")) * 3600
+# Geohash length of reverse-geocode cells (7 is about 150 m x 150 m)
+REVERSE_GEOHASH_PRECISION = int(os.getenv("REVERSE_GEOHASH_PRECISION", "7"))
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Routes and isolines: endpoints snapped to geohash cells (8 is about 38 m x 19 m), cached while traffic is fresh
+ROUTE_GEOHASH_PRECISION = int(os.getenv("ROUTE_GEOHASH_PRECISION", "8"))
+ROUTE_CACHE_TTL_SECONDS = float(os.getenv("ROUTE_CACHE_TTL_SECONDS", "300"))
+ISOLINE_CACHE_TTL_SECONDS = float(os.getenv("ISOLINE_CACHE_TTL_SECONDS", "600"))
+ROUTE_CACHE_ENTRIES = int(os.getenv("ROUTE_CACHE_ENTRIES", "2048"))
+# Batch geocoding: distinct addresses looked up at once (the shared geocode budget paces them), and a
+# safety deadline - lookups not started by then come back "deferred" instead of holding the request open
+GEOCODE_BATCH_CONCURRENCY = int(os.getenv("GEOCODE_BATCH_CONCURRENCY", "8"))
+GEOCODE_BATCH_DEADLINE_SECONDS = float(os.getenv("GEOCODE_BATCH_DEADLINE_SECONDS", "300"))
+
+# A 429 whose Retry-After is at most this many seconds is waited out and retried
+RATE_LIMIT_MAX_WAIT = float(os.getenv("HERE_RATE_LIMIT_MAX_WAIT", "5"))
+RATE_LIMIT_RETRIES = 2
+
 class HEREService:
     """HERE API service for disaster intelligence"""
     
@@ -18,11 +51,45 @@ class HEREService:
         self.geocoding_base = "https://geocode.search.hereapi.com/v1"
         self.routing_base = "https://router.hereapi.com/v8"
         self.isoline_base = "https://isoline.router.hereapi.com/v8"
+        self.limiter = here_limiter
+        self.http = here_http
+        self._geocode_cache = BlobCache(
+            path=GEOCODE_CACHE_PATH,
+            memory_bytes=8 * 1024 * 1024,
+            disk_bytes=128 * 1024 * 1024,
+            ttl_seconds=GEOCODE_TTL_SECONDS,
+            table="geocode"
+        )
+        self._negative_hits = 0
+        self._route_cache = RouteCache(max_entries=ROUTE_CACHE_ENTRIES, ttl_seconds=ROUTE_CACHE_TTL_SECONDS)
         
     def is_configured(self) -> bool:
         """Check if HERE API key is configured"""
         return bool(self.api_key and self.api_key != "YOUR_HERE_API_KEY_HERE")
     
+    def _get(self, endpoint: str, url: str, params: Dict, timeout: float) -> requests.Response:
+        """
+        Rate-limited GET over the pooled session
+        
+        Connection errors and 5xx are retried with backoff by the session. A 429 slows
+        the endpoint down; short Retry-After waits are sat out (the limiter pauses the
+        bucket) and retried, longer ones raise RateLimitedError.
+        """
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            self.limiter.acquire_sync(self.api_key, endpoint)
+            response = self.http.get(endpoint, url, params=params, timeout=timeout)
+            retry_after = self.limiter.feedback(self.api_key, endpoint, response)
+            if retry_after is None:
+                break
+            if attempt == RATE_LIMIT_RETRIES or retry_after > RATE_LIMIT_MAX_WAIT:
+                raise RateLimitedError(endpoint, retry_after)
+        response.raise_for_status()
+        return response
+    
+    def http_stats(self) -> Dict:
+        """Upstream calls, retries and latency per endpoint"""
+        return self.http.stats()
+    
     def geocode(self, address: str) -> Optional[Dict]:
         """
         Convert address to coordinates
@@ -31,11 +98,19 @@ class HEREService:
             address: Address string (e.g., "Connaught Place, Delhi")
             
         Returns:
-            Dict with lat, lon, and formatted address
+            Dict with lat, lon, and formatted address ("cached": True when served from cache)
         """
         if not self.is_configured():
             return {"error": "HERE API key not configured"}
         
+        key = normalize_address(address or "")
+        if not key:
+            # Blank or punctuation-only - nothing to look up, and nothing to cache under
+            return {"error": "Address is required", "status": "invalid"}
+        return self._cached_lookup(f"geocode/{key}", lambda: self._geocode(address))
+    
+    def _geocode(self, address: str) -> Dict:
+        """Uncached forward geocoding"""
         try:
             url = f"{self.geocoding_base}/geocode"
             params = {
@@ -43,8 +118,7 @@ class HEREService:
                 "apiKey": self.api_key
             }
             
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
+            response = self._get("geocode", url, params, timeout=10)
             data = response.json()
             
             if data.get("items") and len(data["items"]) > 0:
@@ -58,8 +132,10 @@ class HEREService:
                     "type": item.get("resultType", "")
                 }
             
-            return {"error": "Location not found"}
+            return {"error": "Location not found", "status": "not_found"}
             
+        except RateLimitedError as e:
+            return e.as_result()
         except Exception as e:
             return {"error": f"Geocoding failed: {str(e)}"}
     
@@ -72,11 +148,16 @@ class HEREService:
             lon: Longitude
             
         Returns:
-            Dict with address information
+            Dict with address information (shared by every point in the same geohash cell)
         """
         if not self.is_configured():
             return {"error": "HERE API key not configured"}
         
+        cell = geohash(lat, lon, REVERSE_GEOHASH_PRECISION)
+        return self._cached_lookup(f"revgeocode/{cell}", lambda: self._reverse_geocode(lat, lon))
+    
+    def _reverse_geocode(self, lat: float, lon: float) -> Dict:
+        """Uncached reverse geocoding"""
         try:
             url = f"{self.geocoding_base}/revgeocode"
             params = {
@@ -84,8 +165,7 @@ class HEREService:
                 "apiKey": self.api_key
             }
             
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
+            response = self._get("revgeocode", url, params, timeout=10)
             data = response.json()
             
             if data.get("items") and len(data["items"]) > 0:
@@ -97,11 +177,133 @@ class HEREService:
                     "country": item.get("address", {}).get("countryName", "")
                 }
             
-            return {"error": "Address not found"}
+            return {"error": "Address not found", "status": "not_found"}
             
+        except RateLimitedError as e:
+            return e.as_result()
         except Exception as e:
             return {"error": f"Reverse geocoding failed: {str(e)}"}
     
+    def _cached_lookup(self, key: str, lookup) -> Dict:
+        """
+        Serve a geocoding result from cache, or look it up and cache it
+        
+        Found results live for GEOCODE_TTL_SECONDS and "not found" for
+        GEOCODE_NEGATIVE_TTL_SECONDS; errors (rate limits, timeouts) are never cached.
+        """
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        return self._fetch(key, lookup)
+    
+    def _cached(self, key: str) -> Optional[Dict]:
+        """Cached geocoding result, or None"""
+        data = self._geocode_cache.get(key)
+        if data is None:
+            return None
+        result = loads(data)
+        if result.get("status") == "not_found":
+            self._negative_hits += 1
+        return {**result, "cached": True}
+    
+    def _fetch(self, key: str, lookup) -> Dict:
+        """Look a result up and cache it (found or not found)"""
+        result = lookup()
+        if "error" not in result:
+            self._geocode_cache.put(key, dumps(result))
+        elif result.get("status") == "not_found":
+            self._geocode_cache.put(key, dumps(result), ttl_seconds=GEOCODE_NEGATIVE_TTL_SECONDS)
+        return result
+    
+    def geocode_cache_stats(self) -> Dict:
+        """Geocoding cache hit ratio (negative hits included), evictions and sizes"""
+        return {**self._geocode_cache.stats(), "negative_hits": self._negative_hits}
+    
+    def geocode_batch(self, addresses: List[Optional[str]],
+                      concurrency: int = GEOCODE_BATCH_CONCURRENCY,
+                      deadline_seconds: float = GEOCODE_BATCH_DEADLINE_SECONDS) -> Dict:
+        """
+        Geocode many addresses in one call
+        
+        Addresses are deduplicated by normalized form, cache hits are served directly and
+        all misses are looked up concurrently within the shared geocode rate budget. Misses
+        not yet started when the deadline passes (upstream far slower than its budget) come
+        back with status "deferred"; the rest are cached, so resending resolves those.
+        
+        Args:
+            addresses: Addresses (None or blank entries, e.g. posts without a place, are skipped)
+            concurrency: Distinct addresses looked up at once
+            deadline_seconds: Seconds after which lookups still queued are deferred
+            
+        Returns:
+            Dict with one result per input address, in input order, and counts
+        """
+        if not self.is_configured():
+            return {"error": "HERE API key not configured"}
+        
+        keys = [normalize_address(address) if address else "" for address in addresses]
+        unique: Dict[str, str] = {}
+        for address, key in zip(addresses, keys):
+            if key:
+                unique.setdefault(key, address)
+        
+        resolved: Dict[str, Dict] = {}
+        misses: Dict[str, str] = {}
+        for key, address in unique.items():
+            cached = self._cached(f"geocode/{key}")
+            if cached is not None:
+                resolved[key] = cached
+            else:
+                misses[key] = address
+        
+        deadline = time.monotonic() + deadline_seconds
+        
+        def lookup(item: Tuple[str, str]) -> Dict:
+            key, address = item
+            if time.monotonic() > deadline:
+                return {"error": "Deferred - batch deadline reached, send it again to resolve", "status": "deferred"}
+            return self._fetch(f"geocode/{key}", lambda: self._geocode(address))
+        
+        if misses:
+            with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(misses)))) as pool:
+                resolved.update(zip(misses, pool.map(lookup, misses.items())))
+        
+        results = [
+            {"query": address, **resolved[key]} if key
+            else {"query": address, "error": "Address is required", "status": "invalid"}
+            for address, key in zip(addresses, keys)
+        ]
+        lookups = resolved.values()
+        return {
+            "success": True,
+            "results": results,
+            "count": len(results),
+            "unique": len(unique),
+            "cached": sum(1 for result in lookups if result.get("cached")),
+            "resolved": sum(1 for result in lookups if "error" not in result),
+            "not_found": sum(1 for result in lookups if result.get("status") == "not_found"),
+            "rate_limited": sum(1 for result in lookups if result.get("status") == "rate_limited"),
+            "deferred": sum(1 for result in lookups if result.get("status") == "deferred")
+        }
+    
+    def warm_geocode_cache(self, places: Iterable[str]) -> Dict:
+        """
+        Preload forward geocodes (e.g. DataGenerator.locations)
+        
+        Returns:
+            Counts of places already cached, fetched and failed
+        """
+        counts = {"cached": 0, "fetched": 0, "failed": 0}
+        for place in places:
+            result = self.geocode(place)
+            if result.get("cached"):
+                counts["cached"] += 1
+            elif "error" in result and result.get("status") != "not_found":
+                counts["failed"] += 1
+            else:
+                counts["fetched"] += 1
+        return counts
+    
     def calculate_route(self, origin: Tuple[float, float], 
                        destination: Tuple[float, float],
                        transport_mode: str = "car") -> Dict:
@@ -115,10 +317,26 @@ class HEREService:
             
         Returns:
             Dict with route information including polyline, distance, duration
+            ("cached": True when served from the route cache)
         """
         if not self.is_configured():
             return {"error": "HERE API key not configured"}
         
+        key = (f"route/{transport_mode}/{geohash(*origin, ROUTE_GEOHASH_PRECISION)}/"
+               f"{geohash(*destination, ROUTE_GEOHASH_PRECISION)}")
+        cached = self._route_cache.get(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+        
+        result = self._calculate_route(origin, destination, transport_mode)
+        if result.get("success"):
+            # A copy, so callers decorating the result (evacuation_info) don't change the cache
+            self._route_cache.put(key, dict(result), route_bbox(origin, destination))
+        return result
+    
+    def _calculate_route(self, origin: Tuple[float, float], destination: Tuple[float, float],
+                         transport_mode: str) -> Dict:
+        """Uncached routing"""
         try:
             url = f"{self.routing_base}/routes"
             params = {
@@ -129,8 +347,7 @@ class HEREService:
                 "apiKey": self.api_key
             }
             
-            response = requests.get(url, params=params, timeout=15)
-            response.raise_for_status()
+            response = self._get("routes", url, params, timeout=15)
             data = response.json()
             
             if data.get("routes") and len(data["routes"]) > 0:
@@ -156,6 +373,8 @@ class HEREService:
             
             return {"error": "No route found"}
             
+        except RateLimitedError as e:
+            return e.as_result()
         except Exception as e:
             return {"error": f"Route calculation failed: {str(e)}"}
     
@@ -173,11 +392,27 @@ class HEREService:
             transport_mode: "car", "truck", "pedestrian", "bicycle"
             
         Returns:
-            Dict with isoline polygons for each range
+            Dict with isoline polygons for each range ("cached": True when served from the route cache)
         """
         if not self.is_configured():
             return {"error": "HERE API key not configured"}
         
+        key = (f"isoline/{transport_mode}/{range_type}/{','.join(map(str, range_values))}/"
+               f"{geohash(*origin, ROUTE_GEOHASH_PRECISION)}")
+        cached = self._route_cache.get(key)
+        if cached is not None:
+            return {**expand_isolines(cached), "cached": True}
+        
+        result = self._calculate_isoline(origin, range_type, range_values, transport_mode)
+        if result.get("success"):
+            compact, bbox = compact_isolines(result)
+            if bbox is not None:
+                self._route_cache.put(key, compact, bbox, ttl_seconds=ISOLINE_CACHE_TTL_SECONDS)
+        return result
+    
+    def _calculate_isoline(self, origin: Tuple[float, float], range_type: str, range_values: List[int],
+                           transport_mode: str) -> Dict:
+        """Uncached isoline calculation"""
         try:
             url = f"{self.isoline_base}/isolines"
             
@@ -192,8 +427,7 @@ class HEREService:
                 "apiKey": self.api_key
             }
             
-            response = requests.get(url, params=params, timeout=15)
-            response.raise_for_status()
+            response = self._get("isolines", url, params, timeout=15)
             data = response.json()
             
             if data.get("isolines"):
@@ -232,9 +466,28 @@ class HEREService:
             
             return {"error": "No isolines calculated"}
             
+        except RateLimitedError as e:
+            return e.as_result()
         except Exception as e:
             return {"error": f"Isoline calculation failed: {str(e)}"}
     
+    def invalidate_routes(self, zones: Iterable[Dict]) -> int:
+        """
+        Drop cached routes and isolines crossing disaster zones (new or changed ones)
+        
+        Args:
+            zones: Zone records with coordinates and affected_area_km2
+            
+        Returns:
+            Number of cached results dropped
+        """
+        areas = [area for area in map(zone_area, zones) if area is not None]
+        return self._route_cache.invalidate_areas(areas)
+    
+    def route_cache_stats(self) -> Dict:
+        """Route/isoline cache hit ratio, invalidations and size"""
+        return self._route_cache.stats()
+    
     def calculate_evacuation_route(self, disaster_zone: Tuple[float, float],
                                    shelter: Tuple[float, float]) -> Dict:
         """
@@ -358,3 +611,159 @@ class HEREService:
             return []
         
         return coordinates
+
+def zone_area(zone: Dict) -> Optional[Tuple[float, float, float]]:
+    """(lat, lon, radius_km) circle of a zone's affected area (1 km radius when unknown), or None"""
+    coordinates = zone.get("coordinates") or {}
+    if "lat" not in coordinates or "lon" not in coordinates:
+        return None
+    radius_km = math.sqrt(float(zone.get("affected_area_km2") or math.pi) / math.pi)
+    return coordinates["lat"], coordinates["lon"], radius_km
+
+def changed_zones(diff: Dict, previous: Dict[str, Dict]) -> List[Dict]:
+    """
+    Zones of a layer diff that may change which roads are blocked
+    
+    Added zones, plus updated zones whose area or severity changed (a new
+    last_updated alone doesn't count). A zone that moved or resized is returned
+    with its old record as well: routes planned around the old footprint are stale too.
+    
+    Args:
+        diff: LayerBroadcaster.publish() result for the zones layer
+        previous: Zone records by id before that publish
+    """
+    zones = list(diff["added"].values())
+    for zone_id, zone in diff["updated"].items():
+        old = previous.get(zone_id)
+        if old is None:
+            zones.append(zone)
+        elif zone_area(zone) != zone_area(old):
+            zones.extend((zone, old))
+        elif zone.get("severity") != old.get("severity"):
+            zones.append(zone)
+    return zones
+
+def normalize_address(address: str) -> str:
+    """Cache key form of an address: Unicode-normalized, case-folded, punctuation and spacing collapsed"""
+    text = unicodedata.normalize("NFKC", address).casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+def geohash(lat: float, lon: float, precision: int = REVERSE_GEOHASH_PRECISION) -> str:
+    """Geohash of a point (nearby points share a prefix)"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+# Benchmark: python here_service.py (pooled session vs a new connection per call, local stub server)
+if __name__ == "__main__":
+    import json
+    import shutil
+    import ssl
+    import subprocess
+    import tempfile
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    from rate_limiter import RateLimiter
+    
+    failures = {"left": 0}
+    
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+        
+        def do_GET(self):
+            if failures["left"] > 0:
+                failures["left"] -= 1
+                status, body = 503, b"{}"
+            else:
+                status = 200
+                body = json.dumps({"items": [{"position": {"lat": 19.07, "lng": 72.87},
+                                              "address": {"label": "Mumbai"}}]}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    def serve(tls_dir: Optional[str] = None) -> Tuple[ThreadingHTTPServer, str]:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        scheme = "http"
+        if tls_dir:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(os.path.join(tls_dir, "cert.pem"), os.path.join(tls_dir, "key.pem"))
+            server.socket = context.wrap_socket(server.socket, server_side=True)
+            scheme = "https"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server, f"{scheme}://127.0.0.1:{server.server_port}/v1"
+    
+    def self_signed_cert() -> Optional[str]:
+        """Throwaway localhost certificate (HERE is HTTPS, where the handshake dominates)"""
+        if not shutil.which("openssl"):
+            return None
+        directory = tempfile.mkdtemp()
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1",
+             "-addext", "subjectAltName=IP:127.0.0.1",
+             "-keyout", os.path.join(directory, "key.pem"), "-out", os.path.join(directory, "cert.pem")],
+            check=True, capture_output=True
+        )
+        return directory
+    
+    calls = int(os.getenv("BENCHMARK_CALLS", "500"))
+    print("=" * 60)
+    print(f"HERE HTTP CLIENT BENCHMARK ({calls} geocode calls, local stub)")
+    print("=" * 60)
+    
+    for tls_dir in [None] + [directory for directory in [self_signed_cert()] if directory]:
+        server, base = serve(tls_dir)
+        verify = os.path.join(tls_dir, "cert.pem") if tls_dir else True
+        here_http.close()
+        
+        service = HEREService()
+        service.api_key = "benchmark"
+        service.geocoding_base = base
+        service.limiter = RateLimiter(1e6, 1e6, {}, default_budget=(1e6, 1e6))
+        service._geocode_cache = BlobCache(path=None, memory_bytes=0)  # time the upstream path, not the cache
+        service.http.session.verify = verify
+        service.http.session.trust_env = False  # REQUESTS_CA_BUNDLE would override verify
+        print(f"\n{base.split(':')[0].upper()}")
+        
+        start = time.perf_counter()
+        for _ in range(calls):
+            requests.get(f"{base}/geocode", params={"q": "Mumbai", "apiKey": "benchmark"}, timeout=10,
+                         verify=verify).json()
+        fresh = time.perf_counter() - start
+        print(f"new connection per call: {fresh:.3f}s ({fresh / calls * 1000:.2f} ms/call)")
+        
+        start = time.perf_counter()
+        for _ in range(calls):
+            service.geocode("Mumbai")
+        pooled = time.perf_counter() - start
+        print(f"pooled session:          {pooled:.3f}s ({pooled / calls * 1000:.2f} ms/call, {fresh / pooled:.1f}x)")
+        
+        failures["left"] = 2
+        result = service.geocode("Mumbai")
+        print(f"after two 503s:          {'ok' if 'lat' in result else result}")
+        server.shutdown()
+    
+    print(f"\ntimings: {service.http_stats()}")
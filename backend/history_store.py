@@ -0,0 +1,246 @@
+"""
+Time-window history store
+Append-only, time-indexed log of layer snapshots with delta encoding between ticks
+"""
+
+import os
+import json
+import bisect
+import time
+import threading
+from datetime import datetime
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+class _LayerLog:
+    """
+    Index of one layer's ticks: keyframes hold full state, other ticks hold deltas
+
+    With a directory the entries stay on disk and only (day, byte offset) is kept per tick.
+    """
+
+    def __init__(self):
+        self.times: List[float] = []                  # epoch seconds, strictly increasing
+        self.offsets: List[Tuple[str, int]] = []      # (day file, byte offset) of each entry
+        self.entries: List[Dict] = []                 # memory only: {"k": records} or {"a", "c", "r"} deltas
+        self.keyframes: List[int] = []                # indices of the ticks that are keyframes
+        self.state: Dict[str, Dict] = {}              # state as of the last tick (for computing deltas)
+
+class HistoryStore:
+    """Append-only snapshot history for replaying map layers on the TimeSlider"""
+
+    def __init__(self, directory: Optional[str] = None, keyframe_interval: int = 60,
+                 retention_days: int = 30):
+        """
+        Args:
+            directory: Where to persist the append-only logs (None = memory only)
+            keyframe_interval: Store a full snapshot every N ticks, deltas in between
+            retention_days: Ticks older than this are dropped
+        """
+        self.directory = directory
+        self.keyframe_interval = keyframe_interval
+        self.retention_seconds = retention_days * 86400
+        self._layers: Dict[str, _LayerLog] = {}
+        # record() runs in a worker thread while frames() replays
+        self._lock = threading.Lock()
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load()
+
+    def record(self, layer: str, records: List[Dict], timestamp: Optional[float] = None) -> Dict:
+        """
+        Append a snapshot of a layer
+
+        Args:
+            layer: Layer name (e.g. "zones", "flood_areas", "alerts")
+            records: Records with an "id" field
+            timestamp: Tick time as epoch seconds (default: now)
+
+        Returns:
+            The stored entry (keyframe or delta)
+        """
+        timestamp = timestamp if timestamp is not None else time.time()
+        snapshot = {str(record["id"]): record for record in records if "id" in record}
+        with self._lock:
+            log = self._layers.setdefault(layer, _LayerLog())
+            if log.times and timestamp <= log.times[-1]:
+                raise ValueError(f"History for '{layer}' is append-only; {timestamp} is not after {log.times[-1]}")
+
+            # Keyframe on a fixed cadence and at each day rollover (one self-contained file per day)
+            new_day = not log.times or self._day(timestamp) != self._day(log.times[-1])
+            if new_day or len(log.times) - log.keyframes[-1] >= self.keyframe_interval:
+                entry = {"k": snapshot}
+            else:
+                entry = self._delta(log.state, snapshot)
+
+            self._append(layer, log, timestamp, entry)
+            log.state = snapshot
+            self._expire(layer, log, timestamp)
+        return entry
+
+    def frames(self, layer: str, start: float, end: float, step: float,
+               max_frames: int = 500) -> Dict:
+        """
+        Downsampled replay of a layer between two times
+
+        Each frame is the layer state as of the latest tick at or before the frame time.
+
+        Args:
+            layer: Layer name
+            start: Window start (epoch seconds)
+            end: Window end (epoch seconds)
+            step: Seconds between frames (widened if the window would exceed max_frames)
+            max_frames: Upper bound on returned frames
+
+        Returns:
+            Dict with frames and the effective step
+        """
+        step = max(step, (end - start) / max(max_frames - 1, 1), 1)
+        frames = []
+        with self._lock:
+            log = self._layers.get(layer)
+            if not log or not log.times or end < start:
+                return {"layer": layer, "step_seconds": step, "frames": frames}
+
+            files: Dict[str, BinaryIO] = {}
+            try:
+                state: Dict[str, Dict] = {}
+                current = -1
+                frame_count = int((end - start) / step + 1e-9) + 1
+                for index in range(frame_count):
+                    frame_time = min(start + index * step, end)
+                    target = bisect.bisect_right(log.times, frame_time) - 1
+                    if target >= 0:
+                        # Jump to the nearest keyframe when it is ahead of the replay cursor
+                        keyframe = log.keyframes[bisect.bisect_right(log.keyframes, target) - 1]
+                        if keyframe > current:
+                            state = dict(self._entry(layer, log, keyframe, files)["k"])
+                            current = keyframe
+                        while current < target:
+                            current += 1
+                            self._apply(state, self._entry(layer, log, current, files))
+                        frames.append({
+                            "timestamp": datetime.fromtimestamp(log.times[current]).isoformat(),
+                            "records": list(state.values()),
+                            "count": len(state)
+                        })
+            finally:
+                for f in files.values():
+                    f.close()
+
+        return {"layer": layer, "step_seconds": step, "frames": frames}
+
+    @staticmethod
+    def _delta(previous: Dict[str, Dict], current: Dict[str, Dict]) -> Dict:
+        """Field-level delta between two snapshots"""
+        added, changed = {}, {}
+        for record_id, record in current.items():
+            old = previous.get(record_id)
+            if old is None or old.keys() != record.keys():
+                added[record_id] = record
+            elif old != record:
+                changed[record_id] = {k: v for k, v in record.items() if old[k] != v}
+        removed = [record_id for record_id in previous if record_id not in current]
+        return {"a": added, "c": changed, "r": removed}
+
+    @staticmethod
+    def _apply(state: Dict[str, Dict], entry: Dict):
+        """Apply one tick to a replay state (records are replaced, never mutated)"""
+        if "k" in entry:
+            state.clear()
+            state.update(entry["k"])
+            return
+        for record_id in entry["r"]:
+            state.pop(record_id, None)
+        state.update(entry["a"])
+        for record_id, fields in entry["c"].items():
+            state[record_id] = {**state[record_id], **fields}
+
+    @staticmethod
+    def _day(timestamp: float) -> str:
+        return datetime.fromtimestamp(timestamp).strftime("%Y%m%d")
+
+    def _path(self, layer: str, day: str) -> str:
+        return os.path.join(self.directory, layer, f"{day}.jsonl")
+
+    def _append(self, layer: str, log: _LayerLog, timestamp: float, entry: Dict):
+        if "k" in entry:
+            log.keyframes.append(len(log.times))
+        log.times.append(timestamp)
+
+        if not self.directory:
+            log.entries.append(entry)
+            return
+        day = self._day(timestamp)
+        os.makedirs(os.path.join(self.directory, layer), exist_ok=True)
+        line = json.dumps({"t": timestamp, **entry}, separators=(",", ":"), default=str) + "\n"
+        with open(self._path(layer, day), "ab") as f:
+            offset = f.tell()
+            f.write(line.encode())
+        log.offsets.append((day, offset))
+
+    def _entry(self, layer: str, log: _LayerLog, index: int, files: Dict[str, BinaryIO]) -> Dict:
+        """Read one tick's entry (day files are opened once per replay)"""
+        if not self.directory:
+            return log.entries[index]
+        day, offset = log.offsets[index]
+        f = files.get(day)
+        if f is None:
+            f = files[day] = open(self._path(layer, day), "rb")
+        f.seek(offset)
+        entry = json.loads(f.readline())
+        entry.pop("t", None)
+        return entry
+
+    def _expire(self, layer: str, log: _LayerLog, now: float):
+        """Drop ticks older than retention, keeping the keyframe the window replays from"""
+        cutoff = now - self.retention_seconds
+        first_kept = bisect.bisect_left(log.times, cutoff)
+        position = bisect.bisect_right(log.keyframes, first_kept) - 1
+        if position <= 0:
+            return
+        drop = log.keyframes[position]
+        del log.times[:drop]
+        del log.offsets[:drop]
+        del log.entries[:drop]
+        log.keyframes = [k - drop for k in log.keyframes[position:]]
+
+        if self.directory:
+            # Only this layer's files - other layers may still index theirs
+            cutoff_day = self._day(cutoff)
+            layer_dir = os.path.join(self.directory, layer)
+            for name in os.listdir(layer_dir):
+                if name.endswith(".jsonl") and name[:-6] < cutoff_day:
+                    os.remove(os.path.join(layer_dir, name))
+
+    def _load(self):
+        """Replay persisted day files (each one starts with a keyframe)"""
+        cutoff_day = self._day(time.time() - self.retention_seconds)
+        for layer in sorted(os.listdir(self.directory)):
+            layer_dir = os.path.join(self.directory, layer)
+            if not os.path.isdir(layer_dir):
+                continue
+            log = self._layers.setdefault(layer, _LayerLog())
+            for name in sorted(os.listdir(layer_dir)):
+                if not name.endswith(".jsonl") or name[:-6] < cutoff_day:
+                    continue
+                day = name[:-6]
+                offset = 0
+                with open(os.path.join(layer_dir, name), "rb") as f:
+                    for line in f:
+                        line_offset, offset = offset, offset + len(line)
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue  # torn write at the end of a file
+                        timestamp = entry.pop("t")
+                        if "k" not in entry and not log.keyframes:
+                            continue
+                        if "k" in entry:
+                            log.keyframes.append(len(log.times))
+                        log.times.append(timestamp)
+                        log.offsets.append((day, line_offset))
+                        # Only the latest state stays in memory (the base for the next delta)
+                        self._apply(log.state, entry)
+            if log.times:
+                print(f"✅ Loaded {len(log.times)} history ticks for {layer}")
@@ -0,0 +1,111 @@
+"""
+Pooled HTTP client for upstream APIs
+One keep-alive session per process with retry/backoff on transient failures and per-endpoint timing
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 429s are not retried here - the rate limiter owns those (see RateLimiter.feedback)
+RETRY_STATUSES = (500, 502, 503, 504)
+
+class UpstreamRetry(Retry):
+    """Retry that honours Retry-After on 503 only, leaving 429 to the caller"""
+    RETRY_AFTER_STATUS_CODES = frozenset({503})
+
+class HTTPClient:
+    """requests.Session with a shared connection pool, retries and latency metrics"""
+
+    def __init__(self, pool_size: int = 20, retries: int = 3, backoff: float = 0.3):
+        """
+        Args:
+            pool_size: Keep-alive connections kept per host
+            retries: Retries on connection errors and 5xx responses
+            backoff: Exponential backoff factor between retries (seconds)
+        """
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self._session: Optional[requests.Session] = None
+        self._session_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict] = {}
+
+    @property
+    def session(self) -> requests.Session:
+        """Per-process session (a forked worker must not share its parent's sockets)"""
+        if self._session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    self._session, self._session_pid = self._build_session(), os.getpid()
+        return self._session
+
+    def _build_session(self) -> requests.Session:
+        retry = UpstreamRetry(
+            total=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def get(self, endpoint: str, url: str, params: Optional[Dict] = None, timeout: float = 10) -> requests.Response:
+        """GET through the pooled session, timed under endpoint"""
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, timeout=timeout)
+        except requests.exceptions.RequestException:
+            self._record(endpoint, time.perf_counter() - start, retries=self.retries, failed=True)
+            raise
+        history = response.raw.retries.history if getattr(response.raw, "retries", None) else ()
+        self._record(endpoint, time.perf_counter() - start, retries=len(history), failed=response.status_code >= 500)
+        return response
+
+    def stats(self) -> Dict:
+        """Calls, failures, retries and latency per endpoint"""
+        with self._lock:
+            return {
+                endpoint: {
+                    "calls": metrics["calls"],
+                    "failed": metrics["failed"],
+                    "retries": metrics["retries"],
+                    "avg_ms": round(metrics["total_seconds"] / metrics["calls"] * 1000, 2),
+                    "max_ms": round(metrics["max_seconds"] * 1000, 2)
+                }
+                for endpoint, metrics in self._metrics.items()
+            }
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _record(self, endpoint: str, elapsed: float, retries: int, failed: bool):
+        with self._lock:
+            metrics = self._metrics.setdefault(
+                endpoint, {"calls": 0, "failed": 0, "retries": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            metrics["calls"] += 1
+            metrics["failed"] += failed
+            metrics["retries"] += retries
+            metrics["total_seconds"] += elapsed
+            metrics["max_seconds"] = max(metrics["max_seconds"], elapsed)
+
+# Shared by HEREService and HEREImageService
+here_http = HTTPClient(
+    pool_size=int(os.getenv("HERE_HTTP_POOL_SIZE", "20")),
+    retries=int(os.getenv("HERE_HTTP_RETRIES", "3")),
+    backoff=float(os.getenv("HERE_HTTP_BACKOFF", "0.3"))
+)
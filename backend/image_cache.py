@@ -0,0 +1,265 @@
+"""
+Two-tier blob cache
+Bounded in-memory LRU over a SQLite blob store shared by every worker process;
+each entry carries its own expiry time (reference imagery, geocoding results)
+"""
+
+import os
+import re
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "here_cache", "images.sqlite")
+
+# Another process may write the same SQLite file - re-read the real totals this often
+DISK_RESYNC_SECONDS = 60
+# Eviction frees down to this fraction of disk_bytes, so a full cache doesn't evict on every put
+DISK_EVICT_TARGET = 0.9
+
+TABLE_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+class BlobCache:
+    """Bytes by key, with LRU + expiry eviction in both tiers"""
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH, memory_bytes: int = 64 * 1024 * 1024,
+                 disk_bytes: int = 512 * 1024 * 1024, ttl_seconds: float = 7 * 24 * 3600,
+                 table: str = "blobs"):
+        """
+        Args:
+            path: SQLite file (None keeps the cache in memory only)
+            memory_bytes: Size bound of the in-process tier
+            disk_bytes: Size bound of the SQLite tier
+            ttl_seconds: Default lifetime of an entry
+            table: SQLite table holding the entries (one file may hold several caches)
+        """
+        if not TABLE_NAME.match(table):
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.path = path
+        self.table = table
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._memory_size = 0
+        # One lock per tier - memory hits never wait behind SQLite I/O
+        self._memory_lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_pid: Optional[int] = None
+        # Running totals of the SQLite tier, re-read every DISK_RESYNC_SECONDS
+        self._disk_entries = 0
+        self._disk_size = 0
+        self._disk_synced = 0.0
+        self.metrics = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0,
+            "memory_evictions": 0, "disk_evictions": 0, "writes": 0
+        }
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Cached bytes for a key, or None"""
+        now = time.time()
+        expired = False
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                data, expires_at = entry
+                if now < expires_at:
+                    self._memory.move_to_end(key)
+                    self.metrics["memory_hits"] += 1
+                    return data
+                self._drop_memory(key)
+                expired = True
+
+        with self._disk_lock:
+            row = self._disk_get(key)
+            if row is not None:
+                data, expires_at = row
+                if now < expires_at:
+                    self.metrics["disk_hits"] += 1
+                else:
+                    self._disk_delete(key)
+                    row = None
+                    expired = True
+            if row is None:
+                self.metrics["expired" if expired else "misses"] += 1
+                return None
+
+        with self._memory_lock:
+            self._put_memory(key, data, expires_at)
+        return data
+
+    def put(self, key: str, data: bytes, ttl_seconds: Optional[float] = None):
+        """
+        Store bytes in both tiers
+
+        Args:
+            ttl_seconds: Lifetime of this entry instead of the default (e.g. negative results)
+        """
+        now = time.time()
+        expires_at = now + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._memory_lock:
+            self._put_memory(key, data, expires_at)
+            self.metrics["writes"] += 1
+        with self._disk_lock:
+            connection = self._db()
+            if connection is None:
+                return
+            try:
+                row = connection.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                connection.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, data, size, expires_at, accessed) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, sqlite3.Binary(data), len(data), expires_at, now)
+                )
+                if row is None:
+                    self._disk_entries += 1
+                self._disk_size += len(data) - (row[0] if row else 0)
+                if now - self._disk_synced > DISK_RESYNC_SECONDS:
+                    self._expire_disk(connection, now)
+                    self._sync_disk_totals(connection, now)
+                if self._disk_size > self.disk_bytes:
+                    self._evict_disk(connection)
+                connection.commit()
+            except sqlite3.Error as e:
+                print(f"❌ Error writing {self.table} cache: {e}")
+
+    def stats(self) -> Dict:
+        """Hit ratio, evictions and tier sizes"""
+        hits = self.metrics["memory_hits"] + self.metrics["disk_hits"]
+        lookups = hits + self.metrics["misses"] + self.metrics["expired"]
+        with self._memory_lock:
+            memory_entries, memory_size = len(self._memory), self._memory_size
+        with self._disk_lock:
+            connection = self._db()
+            if connection is not None:
+                self._sync_disk_totals(connection, time.time())
+            disk_entries, disk_size = self._disk_entries, self._disk_size
+        return {
+            **self.metrics,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": memory_entries,
+            "memory_bytes": memory_size,
+            "disk_entries": disk_entries,
+            "disk_bytes": disk_size
+        }
+
+    def _put_memory(self, key: str, data: bytes, expires_at: float):
+        if len(data) > self.memory_bytes:
+            return
+        self._drop_memory(key)
+        self._memory[key] = (data, expires_at)
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, (old, _) = self._memory.popitem(last=False)
+            self._memory_size -= len(old)
+            self.metrics["memory_evictions"] += 1
+
+    def _drop_memory(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_size -= len(entry[0])
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        """Per-process connection (a forked worker must not reuse its parent's)"""
+        if not self.path:
+            return None
+        if self._connection is None or self._connection_pid != os.getpid():
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                columns = {row[1] for row in connection.execute(f"PRAGMA table_info({self.table})")}
+                if columns and "expires_at" not in columns:
+                    # Written before entries carried their own expiry - it is only a cache
+                    print(f"🧹 Rebuilding {self.table} cache in {self.path}")
+                    connection.execute(f"DROP TABLE {self.table}")
+                connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                    "key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, "
+                    "expires_at REAL NOT NULL, accessed REAL NOT NULL)"
+                )
+                connection.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed)")
+                connection.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_expires_at ON {self.table} (expires_at)")
+                connection.commit()
+            except sqlite3.Error as e:
+                print(f"❌ Error opening {self.table} cache {self.path}: {e}")
+                self.path = None
+                return None
+            self._connection, self._connection_pid = connection, os.getpid()
+            self._sync_disk_totals(connection, time.time())
+        return self._connection
+
+    def _disk_get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        connection = self._db()
+        if connection is None:
+            return None
+        try:
+            row = connection.execute(
+                f"SELECT data, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                connection.execute(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (time.time(), key))
+                connection.commit()
+                return bytes(row[0]), row[1]
+        except sqlite3.Error as e:
+            print(f"❌ Error reading {self.table} cache: {e}")
+        return None
+
+    def _disk_delete(self, key: str):
+        connection = self._db()
+        if connection is None:
+            return
+        try:
+            row = connection.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                connection.commit()
+                self._disk_entries -= 1
+                self._disk_size -= row[0]
+        except sqlite3.Error as e:
+            print(f"❌ Error expiring {self.table} cache entry: {e}")
+
+    def _sync_disk_totals(self, connection: sqlite3.Connection, now: float):
+        """Re-read entry count and bytes (other processes write to the same file)"""
+        self._disk_entries, self._disk_size = connection.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+        ).fetchone()
+        self._disk_synced = now
+
+    def _expire_disk(self, connection: sqlite3.Connection, now: float):
+        expired = connection.execute(
+            f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,)
+        ).rowcount
+        self.metrics["disk_evictions"] += max(expired, 0)
+
+    def _evict_disk(self, connection: sqlite3.Connection):
+        """Drop expired rows, then least recently accessed rows down to the eviction target"""
+        now = time.time()
+        self._expire_disk(connection, now)
+        self._sync_disk_totals(connection, now)
+        excess = self._disk_size - int(self.disk_bytes * DISK_EVICT_TARGET)
+        while excess > 0:
+            rows = connection.execute(
+                f"SELECT key, size FROM {self.table} ORDER BY accessed LIMIT 256"
+            ).fetchall()
+            if not rows:
+                break
+            for key, row_size in rows:
+                if excess <= 0:
+                    break
+                connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                excess -= row_size
+                self._disk_entries -= 1
+                self._disk_size -= row_size
+                self.metrics["disk_evictions"] += 1
+
+class ImageCache(BlobCache):
+    """Reference imagery PNG bytes by key"""
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH, memory_bytes: int = 64 * 1024 * 1024,
+                 disk_bytes: int = 512 * 1024 * 1024, ttl_seconds: float = 7 * 24 * 3600):
+        super().__init__(path, memory_bytes, disk_bytes, ttl_seconds, table="images")
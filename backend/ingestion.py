@@ -0,0 +1,272 @@
+"""
+Bulk ingestion of disaster records into PostGIS
+Batches FIRMS/USGS/social rows into INSERT ... ON CONFLICT upserts or COPY + merge
+"""
+
+import json
+import math
+import time
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+from sqlalchemy import bindparam, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database import async_engine, DisasterZone, SocialMediaPost
+
+ZONE_FIELDS = {'id', 'name', 'coordinates', 'severity', 'damage_score', 'affected_area_km2', 'last_updated'}
+POST_FIELDS = {'id', 'text', 'urgency', 'priority_score', 'location', 'coordinates', 'verified', 'timestamp'}
+
+class BulkIngestor:
+    """Bulk upsert of disaster zones and social posts, geometry built server-side"""
+
+    def __init__(self, engine=async_engine, batch_size: int = 5000):
+        self.engine = engine
+        self.batch_size = batch_size
+
+    async def upsert_zones(self, zones: List[Dict], method: str = "upsert") -> Dict:
+        """
+        Insert or update disaster zones (API dict format)
+
+        Args:
+            zones: Zone dicts as produced by RealDataFetcher / DataGenerator
+            method: "upsert" (batched INSERT ... ON CONFLICT) or "copy" (COPY into staging + merge)
+
+        Returns:
+            Dict with row count, elapsed seconds and rows/sec
+        """
+        rows = [self._zone_row(zone) for zone in zones if zone.get('id')]
+        return await self._ingest(DisasterZone.__table__, rows, method)
+
+    async def upsert_social_posts(self, posts: List[Dict], method: str = "upsert") -> Dict:
+        """Insert or update social media posts (API dict format)"""
+        rows = [self._social_post_row(post) for post in posts if post.get('id')]
+        return await self._ingest(SocialMediaPost.__table__, rows, method)
+
+    async def _ingest(self, table, rows: List[Dict], method: str) -> Dict:
+        """Deduplicate by record id and write rows with the requested method"""
+        # A merge can't touch the same key twice in one statement - last record wins
+        rows = list({row['id']: row for row in rows}.values())
+
+        start = time.perf_counter()
+        if method == "copy":
+            batches = await self._copy_merge(table, rows)
+        elif method == "upsert":
+            batches = await self._batched_upsert(table, rows)
+        else:
+            raise ValueError(f"Unknown ingestion method: {method}")
+        elapsed = time.perf_counter() - start
+
+        stats = {
+            "table": table.name,
+            "method": method,
+            "rows": len(rows),
+            "batches": batches,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(len(rows) / elapsed) if elapsed > 0 else 0
+        }
+        print(f"✅ Ingested {stats['rows']} rows into {table.name} via {method} ({stats['rows_per_sec']:,} rows/sec)")
+        return stats
+
+    def _upsert_statement(self, table):
+        """Build one INSERT ... ON CONFLICT (<primary key>) DO UPDATE reused for every batch"""
+        columns = self._data_columns(table)
+        key_columns = self._key_columns(table)
+        # Bind names are prefixed - plain column names are reserved inside VALUES
+        values = {name: bindparam(f"p_{name}") for name in columns}
+        values['location'] = func.ST_SetSRID(
+            func.ST_MakePoint(bindparam("p_lon"), bindparam("p_lat")), 4326
+        )
+        stmt = pg_insert(table).values(values)
+        updates = {name: stmt.excluded[name] for name in columns + ['location'] if name not in key_columns}
+        return stmt.on_conflict_do_update(index_elements=key_columns, set_=updates)
+
+    async def _batched_upsert(self, table, rows: List[Dict]) -> int:
+        """executemany the prepared upsert in batches, one transaction per batch"""
+        if not rows:
+            return 0
+        stmt = self._upsert_statement(table)
+        partition_column = self._partition_column(table)
+        stale_rows = None
+        if partition_column:
+            stale_rows = text(
+                f"DELETE FROM {table.name} AS t "
+                f"USING unnest(CAST(:ids AS text[]), CAST(:keys AS timestamp[])) AS b(id, key) "
+                f"WHERE t.id = b.id AND t.{partition_column} <> b.key"
+            )
+        batches = 0
+        for offset in range(0, len(rows), self.batch_size):
+            batch = [
+                {f"p_{key}": value for key, value in row.items()}
+                for row in rows[offset:offset + self.batch_size]
+            ]
+            async with self.engine.begin() as conn:
+                if stale_rows is not None:
+                    await conn.execute(stale_rows, {
+                        "ids": [row["p_id"] for row in batch],
+                        "keys": [row[f"p_{partition_column}"] for row in batch]
+                    })
+                await conn.execute(stmt, batch)
+            batches += 1
+        return batches
+
+    async def _copy_merge(self, table, rows: List[Dict]) -> int:
+        """COPY rows into a temp staging table, then merge with one INSERT ... SELECT"""
+        if not rows:
+            return 0
+        columns = self._data_columns(table)
+        key_columns = self._key_columns(table)
+        staging = f"{table.name}_staging"
+        column_list = ", ".join(columns)
+        updates = ", ".join(
+            f"{name} = EXCLUDED.{name}" for name in columns + ['location'] if name not in key_columns
+        )
+        json_columns = {c.name for c in table.columns if c.type.__class__.__name__ == 'JSON'}
+
+        async with self.engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            async with driver.transaction():
+                await driver.execute(
+                    f"CREATE TEMP TABLE {staging} (LIKE {table.name} INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                for offset in range(0, len(rows), self.batch_size):
+                    records = [
+                        tuple(
+                            json.dumps(row[name], default=str) if name in json_columns and row[name] is not None
+                            else row[name]
+                            for name in columns
+                        )
+                        for row in rows[offset:offset + self.batch_size]
+                    ]
+                    await driver.copy_records_to_table(staging, records=records, columns=columns)
+                partition_column = self._partition_column(table)
+                if partition_column:
+                    await driver.execute(
+                        f"DELETE FROM {table.name} AS t USING {staging} AS s "
+                        f"WHERE t.id = s.id AND t.{partition_column} <> s.{partition_column}"
+                    )
+                await driver.execute(
+                    f"INSERT INTO {table.name} ({column_list}, location) "
+                    f"SELECT {column_list}, ST_SetSRID(ST_MakePoint(lon, lat), 4326) FROM {staging} "
+                    f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {updates}"
+                )
+        return math.ceil(len(rows) / self.batch_size)
+
+    @staticmethod
+    def _key_columns(table) -> List[str]:
+        # Partitioned tables key on (id, timestamp)
+        return [column.name for column in table.primary_key.columns]
+
+    @classmethod
+    def _partition_column(cls, table) -> Optional[str]:
+        """
+        Primary key column besides id on partitioned tables (None otherwise)
+
+        Postgres can't enforce a unique id across partitions, so a record whose
+        timestamp changed would conflict on nothing and land as a second row.
+        Writers delete the id's rows under other timestamps in the same
+        transaction as the upsert - one row per id as long as all writes go
+        through this class.
+        """
+        if not table.dialect_options["postgresql"].get("partition_by"):
+            return None
+        others = [name for name in cls._key_columns(table) if name != 'id']
+        return others[0] if others else None
+
+    @staticmethod
+    def _data_columns(table) -> List[str]:
+        return [column.name for column in table.columns if column.name != 'location']
+
+    def _zone_row(self, zone: Dict) -> Dict:
+        coordinates = zone.get('coordinates') or {}
+        return {
+            'id': str(zone['id']),
+            'name': zone.get('name'),
+            'severity': zone.get('severity'),
+            'damage_score': zone.get('damage_score'),
+            'affected_area_km2': zone.get('affected_area_km2'),
+            'lat': coordinates.get('lat'),
+            'lon': coordinates.get('lon'),
+            'last_updated': self._parse_timestamp(zone.get('last_updated')),
+            'metadata_json': {k: v for k, v in zone.items() if k not in ZONE_FIELDS}
+        }
+
+    def _social_post_row(self, post: Dict) -> Dict:
+        coordinates = post.get('coordinates') or {}
+        return {
+            'id': str(post['id']),
+            'text': post.get('text'),
+            'urgency': post.get('urgency'),
+            'priority_score': post.get('priority_score'),
+            'location_name': post.get('location'),
+            'lat': coordinates.get('lat'),
+            'lon': coordinates.get('lon'),
+            'verified': bool(post.get('verified', False)),
+            'timestamp': self._parse_timestamp(post.get('timestamp')),
+            'analysis_json': {k: v for k, v in post.items() if k not in POST_FIELDS}
+        }
+
+    @staticmethod
+    def _parse_timestamp(value) -> datetime:
+        """Parse ISO or RFC 822 (RSS) timestamps into naive UTC datetimes"""
+        parsed: Optional[datetime] = None
+        if isinstance(value, datetime):
+            parsed = value
+        elif isinstance(value, str):
+            try:
+                parsed = datetime.fromisoformat(value)
+            except ValueError:
+                try:
+                    parsed = parsedate_to_datetime(value)
+                except (TypeError, ValueError):
+                    parsed = None
+        if parsed is None:
+            return datetime.utcnow()
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+
+# Benchmark: python ingestion.py [rows]
+if __name__ == "__main__":
+    import sys
+    import random
+    from database import init_db
+
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    def synthetic_zones(n: int) -> List[Dict]:
+        now = datetime.now().isoformat()
+        return [{
+            "id": f"bench_{i}",
+            "name": f"Benchmark zone {i}",
+            "coordinates": {"lat": 19.0 + random.uniform(-1, 1), "lon": 72.8 + random.uniform(-1, 1)},
+            "severity": random.choice(["critical", "high", "medium", "low"]),
+            "damage_score": round(random.random(), 2),
+            "affected_area_km2": round(random.uniform(0.5, 50), 1),
+            "last_updated": now,
+            "source": "benchmark"
+        } for i in range(n)]
+
+    async def run_benchmark():
+        ingestor = BulkIngestor()
+        zones = synthetic_zones(row_count)
+
+        print("\n" + "="*60)
+        print(f"BULK INGESTION BENCHMARK ({row_count:,} rows)")
+        print("="*60 + "\n")
+
+        for method in ("upsert", "copy"):
+            # First pass inserts, second pass exercises the conflict/update path
+            inserted = await ingestor.upsert_zones(zones, method=method)
+            updated = await ingestor.upsert_zones(zones, method=method)
+            print(f"{method:>6}: insert {inserted['rows_per_sec']:>9,} rows/sec | "
+                  f"update {updated['rows_per_sec']:>9,} rows/sec")
+
+        async with ingestor.engine.begin() as conn:
+            await conn.execute(DisasterZone.__table__.delete().where(DisasterZone.id.like("bench_%")))
+        await ingestor.engine.dispose()
+
+    init_db()
+    asyncio.run(run_benchmark())
@@ -0,0 +1,229 @@
+"""
+Layer delta streaming
+Pushes added/updated/removed records to dashboard clients over Server-Sent Events
+"""
+
+import time
+import uuid
+import asyncio
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+from serialization import dumps
+
+def _merge_diffs(older: Dict, newer: Dict) -> Dict:
+    """Coalesce two consecutive diffs of the same layer into one"""
+    added = dict(older["added"])
+    updated = dict(older["updated"])
+    removed = dict.fromkeys(older["removed"])
+
+    for record_id in newer["removed"]:
+        if added.pop(record_id, None) is None:
+            updated.pop(record_id, None)
+            removed[record_id] = None
+    for record_id, record in newer["added"].items():
+        if record_id in removed:
+            # Removed then re-added within the window - the client still holds it
+            del removed[record_id]
+            updated[record_id] = record
+        else:
+            added[record_id] = record
+    for record_id, record in newer["updated"].items():
+        if record_id in added:
+            added[record_id] = record
+        else:
+            updated[record_id] = record
+
+    return {
+        "layer": newer["layer"],
+        "cursor": newer["cursor"],
+        "timestamp": newer["timestamp"],
+        "added": added,
+        "updated": updated,
+        "removed": list(removed)
+    }
+
+class StreamSubscription:
+    """One connected client: at most one pending (coalesced) diff per layer"""
+
+    def __init__(self, layers: Iterable[str]):
+        self.layers = set(layers)
+        self.pending: Dict[str, Dict] = {}
+        self.snapshots: Dict[str, Dict] = {}
+        self.coalesced = 0
+        self._wakeup = asyncio.Event()
+
+    def offer(self, diff: Dict):
+        """Queue a diff, merging into any diff the client hasn't received yet"""
+        layer = diff["layer"]
+        if layer not in self.layers:
+            return
+        if layer in self.snapshots:
+            # A full snapshot is still queued - fold the diff into it
+            snapshot = self.snapshots[layer]
+            records = snapshot["records"]
+            for record_id in diff["removed"]:
+                records.pop(record_id, None)
+            records.update(diff["added"])
+            records.update(diff["updated"])
+            snapshot["cursor"] = diff["cursor"]
+        elif layer in self.pending:
+            self.pending[layer] = _merge_diffs(self.pending[layer], diff)
+            self.coalesced += 1
+        else:
+            self.pending[layer] = diff
+        self._wakeup.set()
+
+    def offer_snapshot(self, layer: str, records: Dict[str, Dict], cursor: int, timestamp: float):
+        """Queue a full layer snapshot (initial sync or resume gap)"""
+        self.pending.pop(layer, None)
+        self.snapshots[layer] = {
+            "layer": layer,
+            "cursor": cursor,
+            "timestamp": timestamp,
+            "records": dict(records)
+        }
+        self._wakeup.set()
+
+    async def next_batch(self, timeout: float, coalesce_window: float) -> List[Dict]:
+        """Wait for pending events, give rapid follow-ups a moment to coalesce, then drain"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        if coalesce_window > 0:
+            await asyncio.sleep(coalesce_window)
+        self._wakeup.clear()
+
+        batch = [dict(snapshot, type="snapshot") for snapshot in self.snapshots.values()]
+        batch += [dict(diff, type="delta") for diff in self.pending.values()]
+        # Ascending cursors so the browser's Last-Event-ID is the newest one sent
+        batch.sort(key=lambda event: event["cursor"])
+        self.snapshots = {}
+        self.pending = {}
+        return batch
+
+class LayerBroadcaster:
+    """Computes per-layer diffs between snapshots and fans them out to subscribers"""
+
+    def __init__(self, history_size: int = 512, heartbeat_seconds: float = 15.0,
+                 coalesce_window: float = 0.5):
+        """
+        Args:
+            history_size: Diffs kept for resume-from-cursor after a reconnect
+            heartbeat_seconds: Idle interval before a keep-alive comment is sent
+            coalesce_window: Seconds to wait for follow-up updates before flushing
+        """
+        # Cursors are only meaningful within one server process
+        self.stream_id = uuid.uuid4().hex[:8]
+        self.heartbeat_seconds = heartbeat_seconds
+        self.coalesce_window = coalesce_window
+        self.cursor = 0
+        self._state: Dict[str, Dict[str, Dict]] = {}
+        self._layer_cursor: Dict[str, int] = {}
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+
+    def records(self, layer: str) -> Dict[str, Dict]:
+        """Current records of a layer by id"""
+        return dict(self._state.get(layer, {}))
+
+    def publish(self, layer: str, records: List[Dict]) -> Optional[Dict]:
+        """
+        Replace a layer's snapshot and push the diff to subscribers
+
+        Returns:
+            The diff, or None when nothing changed
+        """
+        current = {str(record["id"]): record for record in records if "id" in record}
+        previous = self._state.get(layer, {})
+
+        added = {k: v for k, v in current.items() if k not in previous}
+        updated = {k: v for k, v in current.items() if k in previous and previous[k] != v}
+        removed = [k for k in previous if k not in current]
+        self._state[layer] = current
+        if not (added or updated or removed):
+            return None
+
+        self.cursor += 1
+        self._layer_cursor[layer] = self.cursor
+        diff = {
+            "layer": layer,
+            "cursor": self.cursor,
+            "timestamp": time.time(),
+            "added": added,
+            "updated": updated,
+            "removed": removed
+        }
+        self._history.append(diff)
+        for subscription in self._subscribers:
+            subscription.offer(diff)
+        return diff
+
+    def subscribe(self, layers: Iterable[str], last_event_id: Optional[str] = None) -> StreamSubscription:
+        """
+        Register a client, resuming from last_event_id when the gap is still buffered
+
+        Layers the client can't resume get a full snapshot instead.
+        """
+        subscription = StreamSubscription(layers)
+        resume_from = self._parse_event_id(last_event_id)
+        oldest = self._history[0]["cursor"] if self._history else self.cursor + 1
+
+        for layer in subscription.layers:
+            layer_cursor = self._layer_cursor.get(layer, 0)
+            if resume_from is not None and resume_from >= layer_cursor:
+                continue  # client is already up to date for this layer
+            if resume_from is not None and resume_from >= oldest - 1:
+                continue  # gap is replayed from history below
+            if layer in self._state:
+                subscription.offer_snapshot(layer, self._state[layer], self.cursor, time.time())
+
+        if resume_from is not None and resume_from >= oldest - 1:
+            for diff in self._history:
+                if diff["cursor"] > resume_from:
+                    subscription.offer(diff)
+
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: StreamSubscription):
+        self._subscribers.discard(subscription)
+
+    async def events(self, subscription: StreamSubscription):
+        """Yield SSE-formatted messages (bytes) for one subscription"""
+        yield b"retry: 3000\n\n"
+        while True:
+            batch = await subscription.next_batch(self.heartbeat_seconds, self.coalesce_window)
+            if not batch:
+                yield b": keep-alive\n\n"
+                continue
+            for event in batch:
+                event_type = event.pop("type")
+                if event_type == "snapshot":
+                    event["records"] = list(event["records"].values())
+                else:
+                    event["added"] = list(event["added"].values())
+                    event["updated"] = list(event["updated"].values())
+                header = f"id: {self.stream_id}:{event['cursor']}\nevent: {event_type}\ndata: "
+                yield header.encode() + dumps(event) + b"\n\n"
+
+    def stats(self) -> Dict:
+        """Subscriber and coalescing counters"""
+        return {
+            "stream_id": self.stream_id,
+            "cursor": self.cursor,
+            "subscribers": len(self._subscribers),
+            "buffered_diffs": len(self._history),
+            "coalesced_diffs": sum(s.coalesced for s in self._subscribers)
+        }
+
+    def _parse_event_id(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Cursor from '<stream_id>:<cursor>'; None if missing or from another process"""
+        if not last_event_id or ":" not in last_event_id:
+            return None
+        stream_id, _, cursor = last_event_id.partition(":")
+        if stream_id != self.stream_id or not cursor.isdigit():
+            return None
+        cursor = int(cursor)
+        return cursor if cursor <= self.cursor else None
@@ -1,10 +1,13 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, Response
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import uvicorn
 import os
+import math
+import hashlib
+from urllib.parse import urlencode
 from datetime import datetime
 import asyncio
 import threading
@@ -13,13 +16,28 @@ from datetime import datetime, timedelta
 from damage_detector import DamageDetector
 from social_analyzer import SocialMediaAnalyzer
 from data_generator import DataGenerator
-from here_service import HEREService
-from here_image_service import HEREImageService
-from map_exporter import MapExporter
+from here_service import HEREService, changed_zones
+from here_image_service import COMPARE_MAX_SIDE, COMPARE_MAX_SIDE_LIMIT, HEREImageService
+from rate_limiter import here_limiter
+from map_exporter import MapExporter, gzip_stream
+from geo_formats import PYARROW_AVAILABLE, PYOGRIO_AVAILABLE
 from real_data_fetcher import RealDataFetcher
 from social_media_scraper import SocialMediaScraper
+from repository import DisasterRepository
+from ingestion import BulkIngestor
+from partitions import run_partition_maintenance
+from history_store import HistoryStore
+from layer_stream import LayerBroadcaster
+from report_jobs import ReportJobQueue
+from area_survey import DEFAULT_IMAGERY_DIR, AreaSurvey
+from serialization import BODY_SENT_HOOK, FastJSONResponse, CompressionMiddleware, dumps
+from snapshots import SnapshotStore, etag_matches
+from database import async_engine
 
-app = FastAPI(title="DIMP - Disaster Intelligence Mapping Platform")
+app = FastAPI(
+    title="DIMP - Disaster Intelligence Mapping Platform",
+    default_response_class=FastJSONResponse
+)
 
 # CORS middleware
 app.add_middleware(
@@ -30,6 +48,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Brotli/gzip for large layer payloads (the SSE stream must stay unbuffered;
+# exports pick their own compression - see the gzip parameter)
+app.add_middleware(
+    CompressionMiddleware,
+    exclude_paths=[r"^/api/stream$", r"^/api/export/", r"^/api/here/reference-image\.png$",
+                   r"^/api/here/area-survey$"]
+)
+
 # Initialize modules
 damage_detector = DamageDetector()
 social_analyzer = SocialMediaAnalyzer()
@@ -38,7 +64,51 @@ real_data_fetcher = RealDataFetcher()  # Real-time data from NASA/USGS
 social_media_scraper = SocialMediaScraper()  # Real social media scraper
 here_service = HEREService()
 here_image_service = HEREImageService()
-map_exporter = MapExporter()
+
+# Geocode the DataGenerator neighborhoods into the cache at startup
+GEOCODE_WARMUP = os.getenv("GEOCODE_WARMUP", "true").lower() == "true"
+
+# Largest address list accepted by /api/here/geocode/batch
+GEOCODE_BATCH_MAX = int(os.getenv("GEOCODE_BATCH_MAX", "1000"))
+
+# Image uploads are read in chunks and refused once they pass this size
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "20")) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 256 * 1024
+map_exporter = MapExporter(image_service=here_image_service)
+# Batch area surveys: concurrent reference fetches, change detection in worker processes
+area_survey = AreaSurvey(
+    here_image_service,
+    workers=int(os.getenv("SURVEY_WORKERS", "2")),
+    fetch_concurrency=int(os.getenv("SURVEY_FETCH_CONCURRENCY", "8")),
+    max_cells=int(os.getenv("SURVEY_MAX_CELLS", "256")),
+    imagery_dir=os.getenv("SURVEY_IMAGERY_DIR") or DEFAULT_IMAGERY_DIR,
+    align=os.getenv("COMPARE_ALIGN", "true").lower() == "true"
+)
+
+# Serve map layers from PostGIS when enabled (otherwise sample/real-time generators)
+USE_DATABASE = os.getenv("USE_DATABASE", "false").lower() == "true"
+repository = DisasterRepository() if USE_DATABASE else None
+ingestor = BulkIngestor() if USE_DATABASE else None
+# Alerts and social posts are partitioned by day - only read the recent window
+FEED_WINDOW_HOURS = 24
+
+# Layers are refreshed in the background; each refresh is recorded for the
+# TimeSlider and pushed to /api/stream subscribers as a diff
+LAYER_REFRESH_SECONDS = int(os.getenv("LAYER_REFRESH_SECONDS", "60"))
+HISTORY_LAYERS = ("zones", "flood_areas", "alerts")
+STREAM_LAYERS = ("zones", "flood_areas", "alerts", "social_feed")
+broadcaster = LayerBroadcaster()
+history_store = HistoryStore(
+    directory=os.getenv("HISTORY_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "history_data")),
+    retention_days=int(os.getenv("HISTORY_RETENTION_DAYS", "30"))
+)
+# Polled endpoints are served from versioned snapshots of each refresh (ETag / 304)
+snapshot_store = SnapshotStore()
+# PDF reports render in worker processes; artifacts are cached per data snapshot
+report_jobs = ReportJobQueue(
+    cache_dir=os.getenv("REPORT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_cache")),
+    workers=int(os.getenv("REPORT_WORKERS", "2"))
+)
 
 # Cache for social media data
 social_media_cache = {
@@ -61,7 +131,7 @@ def fetch_social_media_background():
             real_posts = real_social.get('posts', [])
             
             # Update cache
-            social_media_cache["posts"] = real_posts
+            social_media_cache["posts"] = tag_real_time(real_posts)
             social_media_cache["last_updated"] = datetime.now()
             social_media_cache["is_fetching"] = False
             
@@ -74,6 +144,166 @@ def fetch_social_media_background():
         # Wait 60 seconds before next fetch
         threading.Event().wait(60)
 
+async def ingest_disaster_data_background():
+    """Background task to bulk-load real-time + simulation records into PostGIS"""
+    while True:
+        try:
+            # Network fetches are blocking - keep them off the event loop
+            real_data = await asyncio.to_thread(real_data_fetcher.get_all_real_data)
+            zones = tag_real_time(real_data['zones']) + data_generator.generate_disaster_zones()
+            await ingestor.upsert_zones(zones)
+            
+            posts = social_media_cache.get("posts", []) + data_generator.generate_social_feed()
+            await ingestor.upsert_social_posts(posts)
+        except Exception as e:
+            print(f"❌ Error ingesting disaster data: {e}")
+        
+        await asyncio.sleep(60)
+
+async def collect_layers() -> dict:
+    """Current state of the replayable map layers"""
+    if repository:
+        since = datetime.utcnow() - timedelta(hours=FEED_WINDOW_HOURS)
+        zones = await repository.get_disaster_zones()
+        flood_areas = await repository.get_flood_areas()
+        alerts = await repository.get_alerts(since=since)
+        social_feed = await repository.get_social_posts(since=since)
+        infrastructure = await repository.get_infrastructure()
+        displacement = await repository.get_displacement()
+    else:
+        real_data = await asyncio.to_thread(real_data_fetcher.get_all_real_data)
+        zones = tag_real_time(real_data['zones']) + data_generator.generate_disaster_zones()
+        flood_areas = data_generator.generate_flood_areas()
+        alerts = data_generator.generate_alerts()
+        social_feed = social_media_cache.get("posts", []) + data_generator.generate_social_feed()
+        infrastructure = data_generator.generate_infrastructure_damage()
+        displacement = data_generator.generate_displacement_data()
+    return {
+        "zones": zones,
+        "flood_areas": flood_areas,
+        "alerts": alerts,
+        "social_feed": social_feed,
+        "infrastructure": infrastructure,
+        "displacement": displacement
+    }
+
+def tag_real_time(records: List[dict]) -> List[dict]:
+    """Mark fetched/scraped records so counts can tell them from generated samples (kept through PostGIS)"""
+    return [{**record, "real_time": True} for record in records]
+
+def disaster_zones_payload(zones: List[dict]) -> dict:
+    """Response body of /api/disaster-zones (real-time records are tagged by tag_real_time)"""
+    real_zones = [zone for zone in zones if zone.get('real_time')]
+    return {
+        "zones": zones,
+        "count": len(zones),
+        "real_count": len(real_zones),
+        "simulation_count": len(zones) - len(real_zones),
+        "sources": sorted({zone['source'] for zone in real_zones if zone.get('source')}) + ["Mumbai Simulation"],
+        "last_updated": max((zone['last_updated'] for zone in zones if zone.get('last_updated')), default=None),
+        "note": "Served from PostGIS" if repository else "Real-time data from NASA/USGS + Mumbai simulation scenarios"
+    }
+
+def social_feed_payload(posts: List[dict]) -> dict:
+    """Response body of /api/social-feed (scraped posts are tagged by tag_real_time)"""
+    real_count = sum(1 for post in posts if post.get('real_time'))
+    last_updated = social_media_cache.get("last_updated")
+    return {
+        "posts": posts,
+        "count": len(posts),
+        "real_count": real_count,
+        "sample_count": len(posts) - real_count,
+        "sources": ["Reddit", "Twitter (Nitter)", "News RSS", "Sample Data"],
+        "cache_status": {
+            "last_updated": last_updated.isoformat() if last_updated else None,
+            "is_fetching": social_media_cache.get("is_fetching", False),
+            "refresh_interval": "60 seconds"
+        }
+    }
+
+def statistics_payload(layers: dict) -> dict:
+    """Response body of /api/statistics (calculated from the current layers)"""
+    zones = layers['zones']
+    infrastructure = layers['infrastructure']
+    displacement = layers['displacement']
+    alerts = layers['alerts']
+    
+    total_affected_area = sum(zone.get('affected_area_km2') or 0 for zone in zones)
+    damaged_buildings = sum(1 for infra in infrastructure if infra.get('type') == 'building' and not infra.get('operational', True))
+    displaced_population = sum(disp.get('displaced_count') or 0 for disp in displacement)
+    rescue_operations = sum(1 for alert in alerts if alert.get('category') == 'rescue' and alert.get('status') == 'active')
+    emergency_shelters = sum(1 for disp in displacement if (disp.get('shelter_capacity') or 0) > 0)
+    
+    return {
+        "total_affected_area_km2": round(total_affected_area, 1),
+        "damaged_buildings": damaged_buildings,
+        "flooded_zones": len(layers['flood_areas']),
+        "displaced_population": displaced_population,
+        "rescue_operations_active": rescue_operations,
+        "emergency_shelters": emergency_shelters,
+        "last_updated": datetime.now().isoformat()
+    }
+
+# Snapshot endpoints: name -> (records key, payload builder for bbox-filtered views)
+SNAPSHOT_ENDPOINTS = {
+    "disaster-zones": ("zones", disaster_zones_payload),
+    "social-feed": ("posts", social_feed_payload),
+    "statistics": (None, None)
+}
+
+def publish_snapshots(layers: dict):
+    """Version the polled endpoints' payloads (unchanged content keeps its ETag)"""
+    snapshot_store.put("disaster-zones", disaster_zones_payload(layers['zones']))
+    snapshot_store.put("social-feed", social_feed_payload(layers['social_feed']), ignore=("cache_status",))
+    snapshot_store.put("statistics", statistics_payload(layers), ignore=("last_updated",))
+    # Report input - its digest keys the cached PDF artifacts
+    snapshot_store.put("pdf-report", {
+        layer: layers[layer] for layer in ("zones", "flood_areas", "infrastructure", "displacement", "alerts")
+    })
+
+async def refresh_layers_background():
+    """Background task: snapshot the layers, append to history and push diffs to streams"""
+    while True:
+        try:
+            layers = await collect_layers()
+            for layer in HISTORY_LAYERS:
+                # Serializing and appending the tick is blocking file I/O
+                await asyncio.to_thread(history_store.record, layer, layers[layer])
+            for layer in STREAM_LAYERS:
+                previous = broadcaster.records(layer) if layer == "zones" else None
+                diff = broadcaster.publish(layer, layers[layer])
+                if previous is not None and diff:
+                    # New, moved or escalated zones may block roads: drop routes/isolines that cross them.
+                    # Simulated zones are regenerated at random every tick, so only real-time ones count
+                    changed = [zone for zone in changed_zones(diff, previous) if zone.get('real_time')]
+                    dropped = here_service.invalidate_routes(changed)
+                    if dropped:
+                        print(f"🧹 Dropped {dropped} cached routes/isolines crossing {len(changed)} changed zones")
+            publish_snapshots(layers)
+        except Exception as e:
+            print(f"❌ Error refreshing layers: {e}")
+        
+        await asyncio.sleep(LAYER_REFRESH_SECONDS)
+
+async def partition_maintenance_background():
+    """Background retention job: create upcoming daily partitions, drop expired ones"""
+    while True:
+        try:
+            await asyncio.to_thread(run_partition_maintenance)
+        except Exception as e:
+            print(f"❌ Partition maintenance failed: {e}")
+        
+        await asyncio.sleep(3600)
+
+async def warm_geocode_cache():
+    """Preload geocodes of the neighborhoods dispatchers look up most"""
+    try:
+        counts = await asyncio.to_thread(here_service.warm_geocode_cache, data_generator.locations)
+        print(f"✅ Geocode cache warmed: {counts['fetched']} fetched, {counts['cached']} already cached, "
+              f"{counts['failed']} failed")
+    except Exception as e:
+        print(f"❌ Error warming geocode cache: {e}")
+
 # Start background thread on startup
 @app.on_event("startup")
 async def startup_event():
@@ -82,6 +312,126 @@ async def startup_event():
     # Disabled to prevent slow startup - uncomment to enable real social media scraping
     # thread = threading.Thread(target=fetch_social_media_background, daemon=True)
     # thread.start()
+    
+    if GEOCODE_WARMUP and here_service.is_configured():
+        asyncio.create_task(warm_geocode_cache())
+    
+    print(f"🕒 Refreshing layers (history + stream) every {LAYER_REFRESH_SECONDS} seconds")
+    asyncio.create_task(refresh_layers_background())
+    
+    if USE_DATABASE:
+        print("🗄️  Bulk ingestion into PostGIS every 60 seconds")
+        asyncio.create_task(ingest_disaster_data_background())
+        asyncio.create_task(partition_maintenance_background())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled database and HTTP connections, report and survey workers"""
+    report_jobs.shutdown()
+    area_survey.shutdown()
+    here_service.http.close()
+    if USE_DATABASE:
+        await async_engine.dispose()
+
+def _parse_bbox(bbox: Optional[str]):
+    """Parse a 'west,south,east,north' query parameter"""
+    if not bbox:
+        return None
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be 'west,south,east,north'")
+    return (west, south, east, north)
+
+def _filter_bbox(records: List[dict], bbox) -> List[dict]:
+    """Apply a bbox filter to generated records (PostGIS does this when enabled)"""
+    if not bbox:
+        return records
+    west, south, east, north = bbox
+    return [
+        r for r in records
+        if r.get('coordinates')
+        and south <= r['coordinates']['lat'] <= north
+        and west <= r['coordinates']['lon'] <= east
+    ]
+
+async def _get_snapshot(name: str):
+    """Current snapshot of an endpoint (built now if the first refresh hasn't run yet)"""
+    snapshot = snapshot_store.get(name)
+    if snapshot is None:
+        publish_snapshots(await collect_layers())
+        snapshot = snapshot_store.get(name)
+    return snapshot
+
+EXPORT_LAYERS = ("zones", "flood_areas", "infrastructure", "displacement", "alerts", "social_posts")
+
+def _export_layer(layer: str) -> str:
+    if layer not in EXPORT_LAYERS:
+        raise HTTPException(status_code=400, detail=f"Unknown layer '{layer}'. Use one of: {', '.join(EXPORT_LAYERS)}")
+    return layer
+
+def _export_source(layer: str):
+    """Records of a layer for export - streamed from PostGIS when enabled"""
+    if repository:
+        return repository.stream(layer)
+    generators = {
+        "zones": data_generator.generate_disaster_zones,
+        "flood_areas": data_generator.generate_flood_areas,
+        "infrastructure": data_generator.generate_infrastructure_damage,
+        "displacement": data_generator.generate_displacement_data,
+        "alerts": data_generator.generate_alerts,
+        "social_posts": data_generator.generate_social_feed
+    }
+    return generators[layer]()
+
+def _export_response(chunks, filename: str, media_type: str, gzip: bool) -> StreamingResponse:
+    """Stream an export as an attachment, optionally gzipped on the fly"""
+    if gzip:
+        chunks = gzip_stream(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+async def _snapshot_response(request: Request, name: str, bbox=None) -> Response:
+    """
+    Serve a snapshot endpoint with a weak ETag (the same for every content encoding)
+    
+    A matching If-None-Match is answered with 304 before any body is built or
+    serialized; full bodies are serialized once per snapshot version (and bbox).
+    """
+    snapshot = await _get_snapshot(name)
+    records_key, builder = SNAPSHOT_ENDPOINTS[name]
+    variant = ",".join(f"{v:g}" for v in bbox) if bbox and records_key else None
+    etag = snapshot.variant_etag(variant) if variant else snapshot.etag
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "X-Snapshot-Version": str(snapshot.version)
+    }
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        body = snapshot.get_variant(variant) if variant else snapshot.body
+        saved = snapshot.wire_size(etag) or (len(body) if body is not None else None)
+        snapshot_store.record(name, True, saved)
+        # The compressor adds Vary to the bodies it encodes; a 304 must repeat it
+        headers["Vary"] = "Accept-Encoding"
+        return Response(status_code=304, headers=headers)
+    
+    if variant:
+        body = snapshot.get_variant(variant)
+        if body is None:
+            body = dumps(builder(_filter_bbox(snapshot.payload[records_key], bbox)))
+            snapshot.put_variant(variant, body)
+    else:
+        body = snapshot.body
+    snapshot_store.record(name, False)
+    # Counted once CompressionMiddleware has sent the (possibly compressed) body
+    setattr(request.state, BODY_SENT_HOOK, lambda size: snapshot_store.record_sent(name, snapshot, etag, size))
+    return Response(content=body, media_type="application/json", headers=headers)
 
 # Models
 class SocialMediaPost(BaseModel):
@@ -105,6 +455,9 @@ class IsolineRequest(BaseModel):
 class GeocodeRequest(BaseModel):
     address: str
 
+class BatchGeocodeRequest(BaseModel):
+    addresses: List[Optional[str]]
+
 class AlertResponse(BaseModel):
     id: str
     type: str
@@ -122,44 +475,39 @@ async def root():
     }
 
 @app.get("/api/disaster-zones")
-async def get_disaster_zones():
+async def get_disaster_zones(request: Request, bbox: Optional[str] = None):
     """Get disaster data - REAL (NASA/USGS) + Mumbai Simulation"""
-    # Get REAL disasters from NASA/USGS
-    real_data = real_data_fetcher.get_all_real_data()
-    
-    # Get Mumbai simulation data
-    mumbai_zones = data_generator.generate_disaster_zones()
-    
-    # Combine both
-    all_zones = real_data['zones'] + mumbai_zones
-    
-    return {
-        "zones": all_zones, 
-        "count": len(all_zones),
-        "real_count": len(real_data['zones']),
-        "simulation_count": len(mumbai_zones),
-        "sources": real_data.get('sources', []) + ["Mumbai Simulation"],
-        "last_updated": real_data.get('last_updated'),
-        "note": "Real-time data from NASA/USGS + Mumbai simulation scenarios"
-    }
+    return await _snapshot_response(request, "disaster-zones", _parse_bbox(bbox))
 
 @app.get("/api/flood-areas")
-async def get_flood_areas():
+async def get_flood_areas(bbox: Optional[str] = None):
     """Get flood-affected areas"""
-    flood_areas = data_generator.generate_flood_areas()
-    return {"flood_areas": flood_areas, "count": len(flood_areas)}
+    box = _parse_bbox(bbox)
+    if repository:
+        flood_areas = await repository.get_flood_areas(bbox=box)
+    else:
+        flood_areas = _filter_bbox(data_generator.generate_flood_areas(), box)
+    return FastJSONResponse({"flood_areas": flood_areas, "count": len(flood_areas)})
 
 @app.get("/api/infrastructure-damage")
-async def get_infrastructure_damage():
+async def get_infrastructure_damage(bbox: Optional[str] = None):
     """Get damaged infrastructure locations"""
-    infrastructure = data_generator.generate_infrastructure_damage()
-    return {"infrastructure": infrastructure, "count": len(infrastructure)}
+    box = _parse_bbox(bbox)
+    if repository:
+        infrastructure = await repository.get_infrastructure(bbox=box)
+    else:
+        infrastructure = _filter_bbox(data_generator.generate_infrastructure_damage(), box)
+    return FastJSONResponse({"infrastructure": infrastructure, "count": len(infrastructure)})
 
 @app.get("/api/population-displacement")
-async def get_population_displacement():
+async def get_population_displacement(bbox: Optional[str] = None):
     """Get population displacement data"""
-    displacement = data_generator.generate_displacement_data()
-    return {"displacement_zones": displacement, "count": len(displacement)}
+    box = _parse_bbox(bbox)
+    if repository:
+        displacement = await repository.get_displacement(bbox=box)
+    else:
+        displacement = _filter_bbox(data_generator.generate_displacement_data(), box)
+    return FastJSONResponse({"displacement_zones": displacement, "count": len(displacement)})
 
 @app.post("/api/analyze-image")
 async def analyze_image(file: UploadFile = File(...)):
@@ -185,36 +533,108 @@ async def analyze_social_media(post: SocialMediaPost):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/social-feed")
-async def get_social_feed():
+async def get_social_feed(request: Request, bbox: Optional[str] = None):
     """Get analyzed social media feed - REAL + SAMPLE DATA (cached)"""
-    # Get cached real data (fetched in background every 60 seconds)
-    real_posts = social_media_cache.get("posts", [])
-    last_updated = social_media_cache.get("last_updated")
+    return await _snapshot_response(request, "social-feed", _parse_bbox(bbox))
+
+@app.get("/api/alerts")
+async def get_alerts(bbox: Optional[str] = None):
+    """Get real-time disaster alerts"""
+    box = _parse_bbox(bbox)
+    if repository:
+        since = datetime.utcnow() - timedelta(hours=FEED_WINDOW_HOURS)
+        alerts = await repository.get_alerts(bbox=box, since=since)
+    else:
+        alerts = _filter_bbox(data_generator.generate_alerts(), box)
+    return FastJSONResponse({"alerts": alerts, "count": len(alerts)})
+
+@app.get("/api/history")
+async def get_history(
+    layer: str,
+    from_time: Optional[datetime] = Query(None, alias="from"),
+    to_time: Optional[datetime] = Query(None, alias="to"),
+    step: int = 60
+):
+    """
+    Replay a layer over a time window (downsampled frames for the TimeSlider)
     
-    # Get sample data
-    sample_posts = data_generator.generate_social_feed()
+    Query params:
+        layer: zones, flood_areas or alerts
+        from: Window start (ISO 8601, default: 24 hours before 'to')
+        to: Window end (ISO 8601, default: now)
+        step: Seconds between frames
+    """
+    if layer not in HISTORY_LAYERS:
+        raise HTTPException(status_code=400, detail=f"Unknown layer '{layer}'. Use one of: {', '.join(HISTORY_LAYERS)}")
+    if step <= 0:
+        raise HTTPException(status_code=400, detail="step must be positive")
     
-    # Combine both
-    all_posts = real_posts + sample_posts
+    to_time = to_time or datetime.now()
+    from_time = from_time or to_time - timedelta(hours=24)
     
-    return {
-        "posts": all_posts,
-        "count": len(all_posts),
-        "real_count": len(real_posts),
-        "sample_count": len(sample_posts),
-        "sources": ["Reddit", "Twitter (Nitter)", "News RSS", "Sample Data"],
-        "cache_status": {
-            "last_updated": last_updated.isoformat() if last_updated else None,
-            "is_fetching": social_media_cache.get("is_fetching", False),
-            "refresh_interval": "60 seconds"
-        }
-    }
+    # Frames are replayed from the day files on disk
+    result = await asyncio.to_thread(history_store.frames, layer, from_time.timestamp(), to_time.timestamp(), step)
+    result["from"] = from_time.isoformat()
+    result["to"] = to_time.isoformat()
+    result["frame_count"] = len(result["frames"])
+    return FastJSONResponse(result)
 
-@app.get("/api/alerts")
-async def get_alerts():
-    """Get real-time disaster alerts"""
-    alerts = data_generator.generate_alerts()
-    return {"alerts": alerts, "count": len(alerts)}
+@app.get("/api/stream")
+async def stream_layers(request: Request, layers: Optional[str] = None, cursor: Optional[str] = None):
+    """
+    Server-Sent Events push of layer diffs (added, updated and removed records)
+    
+    Query params:
+        layers: Comma-separated subset of zones, flood_areas, alerts, social_feed (default: all)
+        cursor: Last event id received - resumes without a full resync (the
+                browser sends it as the Last-Event-ID header on reconnect)
+    """
+    requested = [layer.strip() for layer in layers.split(",")] if layers else list(STREAM_LAYERS)
+    unknown = [layer for layer in requested if layer not in STREAM_LAYERS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown layers: {', '.join(unknown)}")
+    
+    subscription = broadcaster.subscribe(requested, cursor or request.headers.get("last-event-id"))
+    
+    async def event_source():
+        try:
+            async for message in broadcaster.events(subscription):
+                if await request.is_disconnected():
+                    break
+                yield message
+        finally:
+            broadcaster.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/stream/stats")
+async def get_stream_stats():
+    """Connected stream clients and coalescing counters"""
+    return broadcaster.stats()
+
+@app.get("/api/nearby")
+async def get_nearby(layer: str, lat: float, lon: float, radius_m: float = 1000, limit: int = 100):
+    """Get records of one layer within radius_m meters of a point (PostGIS ST_DWithin)"""
+    if not repository:
+        raise HTTPException(status_code=503, detail="Database not enabled (set USE_DATABASE=true)")
+    
+    readers = {
+        "zones": repository.get_disaster_zones,
+        "flood_areas": repository.get_flood_areas,
+        "infrastructure": repository.get_infrastructure,
+        "displacement": repository.get_displacement,
+        "alerts": repository.get_alerts,
+        "social_posts": repository.get_social_posts
+    }
+    if layer not in readers:
+        raise HTTPException(status_code=400, detail=f"Unknown layer '{layer}'. Use one of: {', '.join(readers)}")
+    
+    records = await readers[layer](near=(lat, lon, radius_m), limit=limit)
+    return FastJSONResponse({"layer": layer, "records": records, "count": len(records)})
 
 @app.get("/api/social-feed-sample")
 async def get_social_feed_sample():
@@ -242,33 +662,14 @@ async def get_social_feed_real():
         }
 
 @app.get("/api/statistics")
-async def get_statistics():
+async def get_statistics(request: Request):
     """Get disaster statistics dashboard - DYNAMIC (calculated from real data)"""
-    # Fetch actual data
-    zones = data_generator.generate_disaster_zones()
-    flood_areas = data_generator.generate_flood_areas()
-    infrastructure = data_generator.generate_infrastructure_damage()
-    displacement = data_generator.generate_displacement_data()
-    alerts = data_generator.generate_alerts()
-    
-    # Calculate statistics dynamically
-    total_affected_area = sum(zone.get('affected_area_km2', 0) for zone in zones)
-    damaged_buildings = sum(1 for infra in infrastructure if infra.get('type') == 'building' and not infra.get('operational', True))
-    flooded_zones = len(flood_areas)
-    displaced_population = sum(disp.get('displaced_count', 0) for disp in displacement)
-    rescue_operations = sum(1 for alert in alerts if alert.get('category') == 'rescue' and alert.get('status') == 'active')
-    emergency_shelters = sum(1 for disp in displacement if disp.get('shelter_capacity', 0) > 0)
-    
-    stats = {
-        "total_affected_area_km2": round(total_affected_area, 1),
-        "damaged_buildings": damaged_buildings,
-        "flooded_zones": flooded_zones,
-        "displaced_population": displaced_population,
-        "rescue_operations_active": rescue_operations,
-        "emergency_shelters": emergency_shelters,
-        "last_updated": datetime.now().isoformat()
-    }
-    return stats
+    return await _snapshot_response(request, "statistics")
+
+@app.get("/api/snapshots/stats")
+async def get_snapshot_stats():
+    """Per-endpoint ETag hit (304) ratio and bytes saved for polling dashboards"""
+    return snapshot_store.stats()
 
 @app.get("/api/here-config")
 async def get_here_config():
@@ -284,16 +685,58 @@ async def get_here_config():
         "available_features": ["routing", "isoline", "geocoding", "reverse_geocoding"] if here_service.is_configured() else []
     }
 
+def _here_result(result: dict) -> dict:
+    """Raise HERE service errors as HTTP errors (429 with Retry-After when upstream throttled us)"""
+    if "error" in result:
+        if result.get("status") == "rate_limited":
+            raise HTTPException(
+                status_code=429, detail=result["error"],
+                headers={"Retry-After": str(math.ceil(result["retry_after"]))}
+            )
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@app.get("/api/here/rate-limits")
+async def get_here_rate_limits():
+    """HERE request queue wait, 429 backoffs and current rates per endpoint"""
+    return here_limiter.stats()
+
+@app.get("/api/here/http-stats")
+async def get_here_http_stats():
+    """HERE calls, retries and latency per endpoint (pooled keep-alive session)"""
+    return here_service.http_stats()
+
 @app.post("/api/here/geocode")
 async def geocode_address(request: GeocodeRequest):
     """Convert address to coordinates"""
     if not here_service.is_configured():
         raise HTTPException(status_code=503, detail="HERE API not configured")
     
-    result = here_service.geocode(request.address)
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    return result
+    result = await asyncio.to_thread(here_service.geocode, request.address)
+    return _here_result(result)
+
+@app.post("/api/here/geocode/batch")
+async def geocode_batch(request: BatchGeocodeRequest):
+    """
+    Geocode many addresses at once (e.g. the locations extracted from a social feed)
+    
+    Duplicates are looked up once, cached addresses are served from the cache and the
+    rest run concurrently within the HERE rate limits. Results follow input order; each
+    one carries its own error when it could not be resolved. Lookups still queued after
+    GEOCODE_BATCH_DEADLINE_SECONDS come back with status "deferred" (counted in "deferred").
+    """
+    if not here_service.is_configured():
+        raise HTTPException(status_code=503, detail="HERE API not configured")
+    if len(request.addresses) > GEOCODE_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {GEOCODE_BATCH_MAX} addresses per batch")
+    
+    result = await asyncio.to_thread(here_service.geocode_batch, request.addresses)
+    return _here_result(result)
+
+@app.get("/api/here/geocode/cache/stats")
+async def get_geocode_cache_stats():
+    """Geocoding cache hit ratio (forward and reverse), negative hits and sizes"""
+    return await asyncio.to_thread(here_service.geocode_cache_stats)
 
 @app.get("/api/here/reverse-geocode")
 async def reverse_geocode(lat: float, lon: float):
@@ -301,10 +744,8 @@ async def reverse_geocode(lat: float, lon: float):
     if not here_service.is_configured():
         raise HTTPException(status_code=503, detail="HERE API not configured")
     
-    result = here_service.reverse_geocode(lat, lon)
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    return result
+    result = await asyncio.to_thread(here_service.reverse_geocode, lat, lon)
+    return _here_result(result)
 
 @app.post("/api/here/route")
 async def calculate_route(request: RouteRequest):
@@ -312,15 +753,13 @@ async def calculate_route(request: RouteRequest):
     if not here_service.is_configured():
         raise HTTPException(status_code=503, detail="HERE API not configured")
     
-    result = here_service.calculate_route(
+    result = await asyncio.to_thread(
+        here_service.calculate_route,
         origin=(request.origin_lat, request.origin_lon),
         destination=(request.destination_lat, request.destination_lon),
         transport_mode=request.transport_mode
     )
-    
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    return result
+    return _here_result(result)
 
 @app.post("/api/here/evacuation-route")
 async def calculate_evacuation_route(request: RouteRequest):
@@ -328,14 +767,12 @@ async def calculate_evacuation_route(request: RouteRequest):
     if not here_service.is_configured():
         raise HTTPException(status_code=503, detail="HERE API not configured")
     
-    result = here_service.calculate_evacuation_route(
+    result = await asyncio.to_thread(
+        here_service.calculate_evacuation_route,
         disaster_zone=(request.origin_lat, request.origin_lon),
         shelter=(request.destination_lat, request.destination_lon)
     )
-    
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    return result
+    return _here_result(result)
 
 @app.post("/api/here/isoline")
 async def calculate_isoline(request: IsolineRequest):
@@ -346,16 +783,19 @@ async def calculate_isoline(request: IsolineRequest):
     # Convert minutes to seconds
     range_seconds = [m * 60 for m in request.range_minutes]
     
-    result = here_service.calculate_isoline(
+    result = await asyncio.to_thread(
+        here_service.calculate_isoline,
         origin=(request.origin_lat, request.origin_lon),
         range_type="time",
         range_values=range_seconds,
         transport_mode=request.transport_mode
     )
-    
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    return result
+    return _here_result(result)
+
+@app.get("/api/here/route-cache/stats")
+async def get_route_cache_stats():
+    """Route and isoline cache hit ratio, zone invalidations and size"""
+    return here_service.route_cache_stats()
 
 @app.get("/api/here/rescue-coverage")
 async def get_rescue_coverage(lat: float, lon: float):
@@ -363,156 +803,279 @@ async def get_rescue_coverage(lat: float, lon: float):
     if not here_service.is_configured():
         raise HTTPException(status_code=503, detail="HERE API not configured")
     
-    # Force reload of here_service module
-    import importlib
-    import here_service as hs_module
-    importlib.reload(hs_module)
-    temp_service = hs_module.HEREService()
-    
-    result = temp_service.get_rescue_coverage(
+    result = await asyncio.to_thread(
+        here_service.get_rescue_coverage,
         rescue_station=(lat, lon)
     )
-    
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    return result
+    return _here_result(result)
+
+async def _submit_report_job() -> dict:
+    """Queue a PDF report for the current data snapshot"""
+    report = await _get_snapshot("pdf-report")
+    statistics = (await _get_snapshot("statistics")).payload
+    return report_jobs.submit(report.digest, report.payload, statistics)
+
+def _report_file_response(job: dict) -> FileResponse:
+    return FileResponse(
+        report_jobs.artifact_path(job["snapshot"]),
+        media_type="application/pdf",
+        filename=f"disaster_report_{datetime.fromtimestamp(job['finished']).strftime('%Y%m%d_%H%M%S')}.pdf"
+    )
 
 @app.get("/api/export/pdf")
 async def export_pdf():
-    """Export disaster report as PDF"""
-    try:
-        # Gather all data
-        disaster_data = {
-            'zones': data_generator.generate_disaster_zones(),
-            'flood_areas': data_generator.generate_flood_areas(),
-            'infrastructure': data_generator.generate_infrastructure_damage(),
-            'displacement': data_generator.generate_displacement_data(),
-            'alerts': data_generator.generate_alerts()
-        }
-        
-        statistics = {
-            "total_affected_area_km2": 245.7,
-            "damaged_buildings": 1247,
-            "flooded_zones": 18,
-            "displaced_population": 12500,
-            "rescue_operations_active": 23,
-            "emergency_shelters": 15,
-            "last_updated": datetime.now().isoformat()
-        }
-        
-        pdf_bytes = map_exporter.generate_pdf_report(disaster_data, statistics)
-        
-        return Response(
-            content=pdf_bytes,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename=disaster_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            }
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"PDF generation failed: {str(e)}")
+    """Export disaster report as PDF (waits for the render job; cached per data snapshot)"""
+    job = await report_jobs.wait(await _submit_report_job())
+    if job["status"] != "done":
+        raise HTTPException(status_code=500, detail=f"PDF generation failed: {job['error']}")
+    return _report_file_response(job)
+
+@app.post("/api/export/pdf/jobs", status_code=202)
+async def create_pdf_job():
+    """Start rendering the PDF report; poll GET /api/export/pdf/jobs/{job_id} for the file"""
+    job = await _submit_report_job()
+    return {**report_jobs.public(job), "url": f"/api/export/pdf/jobs/{job['job_id']}"}
+
+@app.get("/api/export/pdf/jobs/{job_id}")
+async def get_pdf_job(job_id: str):
+    """Download a finished report (202 with the job status while it is still rendering)"""
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown report job")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"PDF generation failed: {job['error']}")
+    if job["status"] != "done":
+        return JSONResponse(status_code=202, content=report_jobs.public(job))
+    if not os.path.exists(report_jobs.artifact_path(job["snapshot"])):
+        raise HTTPException(status_code=410, detail="Report evicted from cache - submit a new job")
+    return _report_file_response(job)
 
 @app.get("/api/export/json")
-async def export_json():
-    """Export all disaster data as JSON"""
-    try:
-        disaster_data = {
-            'zones': data_generator.generate_disaster_zones(),
-            'flood_areas': data_generator.generate_flood_areas(),
-            'infrastructure': data_generator.generate_infrastructure_damage(),
-            'displacement': data_generator.generate_displacement_data(),
-            'alerts': data_generator.generate_alerts(),
-            'social_feed': data_generator.generate_social_feed(),
-            'statistics': {
-                "total_affected_area_km2": 245.7,
-                "damaged_buildings": 1247,
-                "flooded_zones": 18,
-                "displaced_population": 12500,
-                "rescue_operations_active": 23,
-                "emergency_shelters": 15,
-                "last_updated": datetime.now().isoformat()
-            },
-            'exported_at': datetime.now().isoformat()
-        }
-        
-        json_bytes = map_exporter.generate_json_export(disaster_data)
-        
-        return Response(
-            content=json_bytes,
-            media_type="application/json",
-            headers={
-                "Content-Disposition": f"attachment; filename=disaster_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            }
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"JSON export failed: {str(e)}")
+async def export_json(gzip: bool = False):
+    """Export all disaster data as JSON (streamed; gzip=true for a .json.gz file)"""
+    statistics = (await _get_snapshot("statistics")).payload
+    sections = {
+        'zones': _export_source("zones"),
+        'flood_areas': _export_source("flood_areas"),
+        'infrastructure': _export_source("infrastructure"),
+        'displacement': _export_source("displacement"),
+        'alerts': _export_source("alerts"),
+        'social_feed': _export_source("social_posts"),
+        'statistics': statistics,
+        'exported_at': datetime.now().isoformat()
+    }
+    return _export_response(
+        map_exporter.stream_json_export(sections),
+        f"disaster_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+        "application/json",
+        gzip
+    )
 
 @app.get("/api/export/csv")
-async def export_csv():
-    """Export disaster zones as CSV"""
-    try:
-        zones = data_generator.generate_disaster_zones()
-        csv_bytes = map_exporter.generate_csv_export(zones)
-        
-        return Response(
-            content=csv_bytes,
-            media_type="text/csv",
-            headers={
-                "Content-Disposition": f"attachment; filename=disaster_zones_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            }
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"CSV export failed: {str(e)}")
+async def export_csv(gzip: bool = False):
+    """Export disaster zones as CSV (streamed; gzip=true for a .csv.gz file)"""
+    return _export_response(
+        map_exporter.stream_csv_export(_export_source("zones")),
+        f"disaster_zones_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        "text/csv",
+        gzip
+    )
+
+@app.get("/api/export/geojson")
+async def export_geojson(layer: Optional[str] = None, gzip: bool = False):
+    """
+    Export layers as a GeoJSON FeatureCollection (streamed)
+    
+    Query params:
+        layer: One of zones, flood_areas, infrastructure, displacement, alerts,
+               social_posts (default: all, tagged with a 'layer' property)
+        gzip: Return a .geojson.gz file
+    """
+    layers = [_export_layer(layer)] if layer else list(EXPORT_LAYERS)
+    return _export_response(
+        map_exporter.stream_geojson_export({name: _export_source(name) for name in layers}),
+        f"disaster_{layer or 'layers'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.geojson",
+        "application/geo+json",
+        gzip
+    )
+
+@app.get("/api/export/geoparquet")
+async def export_geoparquet(layer: str = "zones"):
+    """Export one layer as GeoParquet (WKB points, bbox covering column, zstd)"""
+    if not PYARROW_AVAILABLE:
+        raise HTTPException(status_code=503, detail="GeoParquet export requires pyarrow")
+    content = await map_exporter.generate_geoparquet_export(_export_source(_export_layer(layer)))
+    return Response(
+        content=content,
+        media_type="application/vnd.apache.parquet",
+        headers={
+            "Content-Disposition": f"attachment; filename=disaster_{layer}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet"
+        }
+    )
+
+@app.get("/api/export/flatgeobuf")
+async def export_flatgeobuf(layer: str = "zones"):
+    """Export one layer as FlatGeobuf with a spatial index"""
+    if not (PYARROW_AVAILABLE and PYOGRIO_AVAILABLE):
+        raise HTTPException(status_code=503, detail="FlatGeobuf export requires pyarrow and pyogrio")
+    content = await map_exporter.generate_flatgeobuf_export(_export_source(_export_layer(layer)), layer)
+    return Response(
+        content=content,
+        media_type="application/flatgeobuf",
+        headers={
+            "Content-Disposition": f"attachment; filename=disaster_{layer}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.fgb"
+        }
+    )
 
 # ============================================================================
 # HERE Map Image API - Cartographic Reference Images
 # ============================================================================
 
+def _reference_png_url(lat: float, lon: float, zoom: int, width: int, height: int, map_type: str) -> str:
+    query = urlencode({"lat": lat, "lon": lon, "zoom": zoom, "width": width, "height": height, "map_type": map_type})
+    return f"/api/here/reference-image.png?{query}"
+
 @app.get("/api/here/reference-image")
-async def get_reference_image(lat: float, lon: float, zoom: int = 15, map_type: str = "satellite.day"):
+async def get_reference_image(lat: float, lon: float, zoom: int = 15, map_type: str = "satellite.day",
+                              width: int = Query(512, ge=16, le=2048), height: int = Query(512, ge=16, le=2048),
+                              encoding: Optional[str] = None):
     """
-    Get HERE cartographic reference image for a location
+    Get HERE cartographic reference image metadata for a location
     
     Query params:
         lat: Latitude
         lon: Longitude
         zoom: Zoom level (1-20, default 15)
         map_type: normal.day, satellite.day, terrain.day, hybrid.day
+        encoding: "base64" to embed the image in the JSON; by default the
+                  response links to /api/here/reference-image.png instead
     """
-    result = here_image_service.get_reference_image(lat, lon, zoom, map_type=map_type)
+    if encoding == "base64":
+        return await asyncio.to_thread(here_image_service.get_reference_image, lat, lon, zoom, width, height, map_type)
+    
+    result = await asyncio.to_thread(here_image_service.get_reference_png, lat, lon, zoom, width, height, map_type)
+    if result.pop("png", None) is not None:
+        result["image_url"] = _reference_png_url(lat, lon, zoom, width, height, map_type)
     return result
 
+@app.get("/api/here/reference-image.png")
+async def get_reference_image_png(request: Request, lat: float, lon: float, zoom: int = 15,
+                                  map_type: str = "satellite.day",
+                                  width: int = Query(512, ge=16, le=2048), height: int = Query(512, ge=16, le=2048)):
+    """HERE reference image as PNG bytes (cacheable by browsers and proxies)"""
+    if not here_image_service.is_configured():
+        raise HTTPException(status_code=503, detail="HERE API not configured")
+    
+    result = await asyncio.to_thread(here_image_service.get_reference_png, lat, lon, zoom, width, height, map_type)
+    if "png" not in result:
+        _here_result(result)
+        raise HTTPException(status_code=502, detail=result.get("error", "Reference image unavailable"))
+    
+    png = result["png"]
+    headers = {
+        "ETag": f'"{hashlib.blake2b(png, digest_size=12).hexdigest()}"',
+        "Cache-Control": "public, max-age=86400"
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=png, media_type="image/png", headers=headers)
+
+@app.get("/api/here/cache/stats")
+async def get_here_image_cache_stats():
+    """Reference image cache hit ratio, evictions and tier sizes"""
+    return here_image_service.cache_stats()
+
+async def _read_upload(request: Request, file: UploadFile, limit: int) -> bytes:
+    """Read an upload into memory, refusing it with 413 as soon as it passes the limit"""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit + 64 * 1024:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {limit // (1024 * 1024)} MB")
+    
+    buffer = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        buffer.extend(chunk)
+        if len(buffer) > limit:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {limit // (1024 * 1024)} MB")
+    return bytes(buffer)
+
 @app.post("/api/here/compare-disaster-image")
-async def compare_disaster_image(file: UploadFile = File(...), lat: float = 0, lon: float = 0, zoom: int = 15):
+async def compare_disaster_image(request: Request, file: UploadFile = File(...), lat: float = 0, lon: float = 0,
+                                 zoom: int = 15, cell_size: int = Query(32, ge=8, le=512), overlay: bool = False,
+                                 max_side: int = Query(COMPARE_MAX_SIDE, ge=64, le=COMPARE_MAX_SIDE_LIMIT)):
     """
     Compare uploaded disaster image with HERE reference cartographic image
     
     Form data:
-        file: Disaster image file
+        file: Disaster image file (at most MAX_UPLOAD_MB)
         lat: Location latitude
         lon: Location longitude
         zoom: Zoom level for reference
+    
+    Query params:
+        cell_size: Change map cell size in pixels
+        overlay: Include the change map as a base64 PNG overlay
+        max_side: Longest side the image is compared at (default COMPARE_MAX_SIDE, at most
+                  COMPARE_MAX_SIDE_LIMIT; e.g. 3840 keeps a 4K frame at full resolution)
     """
+    content = await _read_upload(request, file, MAX_UPLOAD_BYTES)
     try:
-        # Save uploaded file temporarily
-        temp_path = f"/tmp/disaster_{datetime.now().timestamp()}.jpg"
-        with open(temp_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        # Compare with HERE reference
-        result = here_image_service.compare_disaster_image(temp_path, lat, lon, zoom)
-        
-        # Clean up
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        
-        return result
+        # Decoded straight from memory - no temp files
+        return await asyncio.to_thread(here_image_service.compare_disaster_image, content, lat, lon, zoom,
+                                       cell_size, overlay, max_side)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Image comparison failed: {str(e)}")
 
+@app.post("/api/here/area-survey")
+async def run_area_survey(request: Request, south: float, west: float, north: float, east: float,
+                          zoom: int = Query(16, ge=1, le=20), cell_px: int = Query(512, ge=128, le=1024),
+                          top: int = Query(20, ge=1, le=256), event: Optional[str] = None,
+                          file: Optional[UploadFile] = File(None)):
+    """
+    Survey a bounding box cell by cell against reference imagery
+    
+    Post-event imagery is either an uploaded image covering exactly the bbox, or a
+    stored tile set named by event. Streams newline-delimited JSON: a "survey" line,
+    one "cell" line per finished cell (with its rank so far), then a "ranking" line
+    with the most-changed cells.
+    
+    Query params:
+        south, west, north, east: Bounding box
+        zoom: Zoom level of the reference imagery
+        cell_px: Cell size in pixels at that zoom
+        top: Cells in the final ranking
+        event: Stored post-event imagery (<SURVEY_IMAGERY_DIR>/<event>/<z>/<x>/<y>.png)
+    
+    Form data:
+        file: Post-event image of the bbox (at most MAX_UPLOAD_MB)
+    """
+    if not here_image_service.is_configured():
+        raise HTTPException(status_code=503, detail="HERE API key not configured")
+    if (file is None) == (event is None):
+        raise HTTPException(status_code=400, detail="Provide either an uploaded image or an event")
+    try:
+        survey = area_survey.grid(south, west, north, east, zoom, cell_px)
+        if event is not None:
+            post_source = area_survey.stored_source(area_survey.validate_event(event), survey)
+        else:
+            content = await _read_upload(request, file, MAX_UPLOAD_BYTES)
+            image = await asyncio.to_thread(here_image_service.open_image, content,
+                                            max(survey["width"], survey["height"]))
+            post_source = area_survey.upload_source(image, survey)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (ValueError, OSError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def lines():
+        async for item in area_survey.run(survey, post_source, top):
+            yield dumps(item) + b"\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/api/here/area-comparison")
-async def get_area_comparison(lat: float, lon: float, radius_km: float = 1.0, zoom: int = 14):
+async def get_area_comparison(lat: float, lon: float, radius_km: float = 1.0, zoom: int = 14,
+                              encoding: Optional[str] = None):
     """
     Get reference images for area comparison (before/after disaster)
     
@@ -521,8 +1084,11 @@ async def get_area_comparison(lat: float, lon: float, radius_km: float = 1.0, zo
         lon: Center longitude
         radius_km: Radius to cover in kilometers
         zoom: Zoom level
+        encoding: "base64" to embed the reference image; by default it is linked as a PNG
     """
-    result = here_image_service.get_area_comparison(lat, lon, radius_km, zoom)
+    result = await asyncio.to_thread(here_image_service.get_area_comparison, lat, lon, radius_km, zoom, encoding)
+    if result.get("success"):
+        result["reference_image"]["image_url"] = _reference_png_url(lat, lon, zoom, 1024, 1024, "satellite.day")
     return result
 
 if __name__ == "__main__":
@@ -7,21 +7,109 @@ from reportlab.lib.pagesizes import letter, A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from reportlab.lib import colors
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import (
+    BaseDocTemplate, Flowable, Frame, Image, LongTable, NextPageTemplate, PageBreak, PageTemplate, Paragraph,
+    TableStyle
+)
+from reportlab.platypus.flowables import HRFlowable
 from datetime import datetime
-from typing import Dict, List
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Union
 import io
-import json
+import csv
+import zlib
+import asyncio
+import os
+
+from serialization import dumps
+from here_image_service import HEREImageService
+from static_maps import DEFAULT_CACHE_DIR, StaticMapRenderer
+import geo_formats
+
+# Streamed exports are flushed to the client in chunks of about this size
+STREAM_CHUNK_BYTES = 64 * 1024
+
+REPORT_MARGIN = 0.75 * inch
+# Rows per LongTable - sections longer than this are split into consecutive tables
+TABLE_CHUNK_ROWS = 500
+# Section map image: pixel size (rendered at ~160 dpi) and size on the page
+SECTION_MAP_PIXELS = (1080, 560)
+SECTION_MAP_WIDTH = 6.75 * inch
+SEVERITY_COLORS = {
+    'critical': '#dc2626',
+    'high': '#ea580c',
+    'medium': '#f59e0b',
+    'low': '#84cc16'
+}
+
+# Report sections: (data key, title, accent color, column headers, column widths in inches)
+REPORT_SECTIONS = [
+    ('zones', "Disaster Zones", '#ef4444',
+     ['Name', 'Severity', 'Damage', 'Area (km²)', 'Latitude', 'Longitude', 'Last Updated'],
+     [1.7, 0.75, 0.6, 0.75, 0.8, 0.8, 1.35]),
+    ('flood_areas', "Flood-Affected Areas", '#3b82f6',
+     ['Location', 'Status', 'Water (m)', 'Population', 'Latitude', 'Longitude'],
+     [1.9, 0.9, 0.8, 0.95, 1.1, 1.1]),
+    ('infrastructure', "Infrastructure Damage", '#f59e0b',
+     ['Type', 'Name', 'Damage', 'Status', 'Priority'],
+     [1.0, 2.4, 1.0, 1.4, 0.95]),
+    ('alerts', "Active Alerts", '#dc2626',
+     ['Type', 'Severity', 'Status', 'Description'],
+     [1.0, 0.8, 0.8, 4.15]),
+]
+
+class _DeferredTable(Flowable):
+    """Placeholder that builds its table when the layout reaches it, then delegates"""
+    
+    def __init__(self, build):
+        super().__init__()
+        self._build = build
+        self._table = None
+    
+    def _get(self):
+        if self._table is None:
+            self._table = self._build()
+        return self._table
+    
+    def wrap(self, availWidth, availHeight):
+        self.width, self.height = self._get().wrap(availWidth, availHeight)
+        return self.width, self.height
+    
+    def split(self, availWidth, availHeight):
+        return self._get().split(availWidth, availHeight)
+    
+    def drawOn(self, canvas, x, y, _sW=0):
+        self._get().drawOn(canvas, x, y, _sW)
 
 class MapExporter:
     """Export disaster maps to PDF and images"""
     
-    def __init__(self):
+    def __init__(self, static_maps: StaticMapRenderer = None, image_service: HEREImageService = None):
+        """
+        Args:
+            static_maps: Section map renderer (built from image_service when omitted)
+            image_service: Reference imagery source - pass the process's shared instance so
+                its cache (and the SQLite tier's running size) isn't duplicated
+        """
         self.page_width, self.page_height = A4
+        self.heading_style = ParagraphStyle(
+            "SectionHeading", parent=getSampleStyleSheet()["Heading1"],
+            fontName="Helvetica-Bold", fontSize=20, textColor=colors.HexColor('#1e293b'), spaceAfter=6
+        )
+        # Shared by every section map; STATIC_MAP_OFFLINE=true renders blank (or locally tiled) basemaps
+        self.static_maps = static_maps or StaticMapRenderer(
+            image_service=image_service or HEREImageService(),
+            cache_dir=os.getenv("STATIC_MAP_CACHE_DIR") or DEFAULT_CACHE_DIR,
+            offline=os.getenv("STATIC_MAP_OFFLINE", "false").lower() == "true"
+        )
         
     def generate_pdf_report(self, disaster_data: Dict, statistics: Dict) -> bytes:
         """
         Generate comprehensive PDF report
         
+        Every record is listed: sections are platypus LongTables that paginate
+        automatically and repeat their header row on each page.
+        
         Args:
             disaster_data: Dict with zones, floods, infrastructure, etc.
             statistics: Dict with summary statistics
@@ -30,40 +118,156 @@ class MapExporter:
             PDF bytes
         """
         buffer = io.BytesIO()
-        c = canvas.Canvas(buffer, pagesize=A4)
-        
-        # Title Page
-        self._draw_title_page(c, statistics)
-        c.showPage()
-        
-        # Summary Page
-        self._draw_summary_page(c, statistics, disaster_data)
-        c.showPage()
-        
-        # Disaster Zones Detail
-        if disaster_data.get('zones'):
-            self._draw_zones_page(c, disaster_data['zones'])
-            c.showPage()
-        
-        # Flood Areas Detail
-        if disaster_data.get('flood_areas'):
-            self._draw_floods_page(c, disaster_data['flood_areas'])
-            c.showPage()
-        
-        # Infrastructure Damage
-        if disaster_data.get('infrastructure'):
-            self._draw_infrastructure_page(c, disaster_data['infrastructure'])
-            c.showPage()
-        
-        # Alerts Page
-        if disaster_data.get('alerts'):
-            self._draw_alerts_page(c, disaster_data['alerts'])
-            c.showPage()
-        
-        c.save()
-        buffer.seek(0)
+        doc = BaseDocTemplate(
+            buffer, pagesize=A4,
+            leftMargin=REPORT_MARGIN, rightMargin=REPORT_MARGIN,
+            topMargin=inch, bottomMargin=inch,
+            title="Disaster Assessment Report", author="DIMP"
+        )
+        frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id="body")
+        doc.addPageTemplates([
+            PageTemplate("title", [frame], onPage=lambda c, d: self._draw_title_page(c, statistics)),
+            PageTemplate("summary", [frame], onPage=lambda c, d: self._draw_summary_page(c, statistics, disaster_data)),
+            PageTemplate("body", [frame], onPage=self._draw_body_page)
+        ])
+        
+        # Title and summary pages are canvas-drawn; sections flow from page 3 on
+        story = [NextPageTemplate("summary"), PageBreak(), NextPageTemplate("body"), PageBreak()]
+        for key, title, accent, headers, widths in REPORT_SECTIONS:
+            records = disaster_data.get(key)
+            if records:
+                story.extend(self._section_flowables(key, title, accent, headers, widths, records))
+                story.append(PageBreak())
+        
+        doc.build(story)
         return buffer.getvalue()
     
+    def _section_flowables(self, key: str, title: str, accent: str, headers: List[str],
+                           widths: List[float], records: List[Dict]) -> List:
+        """Heading plus the section table, split into LongTable chunks"""
+        flowables = [
+            Paragraph(f"{title} ({len(records):,})", self.heading_style),
+            HRFlowable(width="100%", thickness=2, color=colors.HexColor(accent), spaceAfter=0.15*inch)
+        ]
+        section_map = self._section_map(accent, records)
+        if section_map:
+            flowables.append(section_map)
+        # Chunking bounds the work of each split (a single 10k-row table is
+        # re-measured on every page it breaks across); chunks are built only
+        # when the layout reaches them, so one chunk's cells are alive at a time
+        for offset in range(0, len(records), TABLE_CHUNK_ROWS):
+            flowables.append(_DeferredTable(
+                lambda offset=offset: self._section_table(key, accent, headers, widths,
+                                                          records[offset:offset + TABLE_CHUNK_ROWS])
+            ))
+        return flowables
+    
+    def _section_map(self, accent: str, records: List[Dict]):
+        """Static map of the section's records, colored by severity (None if nothing is located)"""
+        def color_for(record: Dict) -> str:
+            level = record.get('severity') or record.get('damage_level') or record.get('status')
+            return SEVERITY_COLORS.get(str(level).lower(), accent)
+        
+        try:
+            width, height = SECTION_MAP_PIXELS
+            png = self.static_maps.render(records, color_for, width, height)
+        except Exception as e:
+            print(f"❌ Error rendering section map: {e}")
+            return None
+        if not png:
+            return None
+        image = Image(io.BytesIO(png), width=SECTION_MAP_WIDTH, height=SECTION_MAP_WIDTH * height / width)
+        image.spaceAfter = 0.2 * inch
+        return image
+    
+    def _section_table(self, key: str, accent: str, headers: List[str], widths: List[float],
+                       records: List[Dict]) -> LongTable:
+        """LongTable for one chunk of a section, header row repeated on every page"""
+        row_builder = getattr(self, f"_{key}_row")
+        severity_column = headers.index("Severity") if "Severity" in headers else None
+        rows = [row_builder(record) for record in records]
+        style = [
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor('#1e293b')),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+            ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 8),
+            ("FONT", (0, 1), (-1, -1), "Helvetica", 8),
+            ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor('#f1f5f9')]),
+            ("LINEBELOW", (0, 0), (-1, 0), 1, colors.HexColor(accent)),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("TOPPADDING", (0, 0), (-1, -1), 2),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
+        ]
+        if severity_column is not None:
+            for index, row in enumerate(rows, start=1):
+                color = SEVERITY_COLORS.get(str(row[severity_column]).lower())
+                if color:
+                    style.append(("TEXTCOLOR", (severity_column, index), (severity_column, index),
+                                  colors.HexColor(color)))
+        return LongTable(
+            [headers] + rows,
+            colWidths=[w * inch for w in widths],
+            repeatRows=1,
+            style=TableStyle(style)
+        )
+    
+    @staticmethod
+    def _clip(value, length: int) -> str:
+        text = "" if value is None else str(value)
+        return text if len(text) <= length else text[:length - 1] + "…"
+    
+    @staticmethod
+    def _coordinate(record: Dict, axis: str) -> str:
+        coordinates = record.get('coordinates') or {}
+        return f"{coordinates[axis]:.4f}" if coordinates.get(axis) is not None else ""
+    
+    def _zones_row(self, zone: Dict) -> List:
+        return [
+            self._clip(zone.get('name', 'Unknown'), 28),
+            str(zone.get('severity', 'N/A')).capitalize(),
+            f"{zone.get('damage_score') or 0:.2f}",
+            zone.get('affected_area_km2', 0),
+            self._coordinate(zone, 'lat'),
+            self._coordinate(zone, 'lon'),
+            self._clip(zone.get('last_updated', ''), 19)
+        ]
+    
+    def _flood_areas_row(self, flood: Dict) -> List:
+        return [
+            self._clip(flood.get('location') or flood.get('area_name', 'Unknown Area'), 28),
+            str(flood.get('severity') or flood.get('status', '')).capitalize(),
+            f"{flood.get('water_level_m', flood.get('water_level_meters')) or 0:.1f}",
+            f"{flood.get('affected_population', 0):,}",
+            self._coordinate(flood, 'lat'),
+            self._coordinate(flood, 'lon')
+        ]
+    
+    def _infrastructure_row(self, infra: Dict) -> List:
+        operational = infra.get('operational')
+        return [
+            str(infra.get('type', 'Unknown')).capitalize(),
+            self._clip(infra.get('name', 'N/A'), 32),
+            str(infra.get('damage_level', '')).capitalize(),
+            infra.get('status') or ("" if operational is None else "Operational" if operational else "Down"),
+            str(infra.get('priority', '')).capitalize()
+        ]
+    
+    def _alerts_row(self, alert: Dict) -> List:
+        return [
+            str(alert.get('type', 'Alert')).upper(),
+            str(alert.get('severity', 'Unknown')).capitalize(),
+            alert.get('status', 'Unknown'),
+            self._clip(alert.get('description', 'No description'), 70)
+        ]
+    
+    def _draw_body_page(self, c: canvas.Canvas, doc):
+        """Running header and page number on section pages"""
+        c.saveState()
+        c.setFont("Helvetica", 9)
+        c.setFillColor(colors.grey)
+        c.drawString(REPORT_MARGIN, self.page_height - 0.6*inch, "DIMP - Disaster Assessment Report")
+        c.drawRightString(self.page_width - REPORT_MARGIN, 0.5*inch, f"Page {c.getPageNumber()}")
+        c.restoreState()
+    
     def _draw_title_page(self, c: canvas.Canvas, statistics: Dict):
         """Draw title page"""
         # Header
@@ -165,13 +369,7 @@ class MapExporter:
         
         c.setFont("Helvetica", 11)
         for severity, count in severity_counts.items():
-            color_map = {
-                'critical': '#dc2626',
-                'high': '#ea580c',
-                'medium': '#f59e0b',
-                'low': '#84cc16'
-            }
-            c.setFillColor(colors.HexColor(color_map[severity]))
+            c.setFillColor(colors.HexColor(SEVERITY_COLORS.get(severity, '#84cc16')))
             c.rect(inch + 0.2*inch, y_pos - 0.1*inch, 0.15*inch, 0.15*inch, fill=True)
             c.setFillColor(colors.black)
             c.drawString(inch + 0.5*inch, y_pos, f"{severity.capitalize()}: {count} zones")
@@ -202,155 +400,44 @@ class MapExporter:
         # Page number
         c.setFont("Helvetica", 9)
         c.setFillColor(colors.grey)
-        c.drawRightString(self.page_width - inch, 0.5*inch, "Page 2")
-    
-    def _draw_zones_page(self, c: canvas.Canvas, zones: List[Dict]):
-        """Draw disaster zones detail page"""
-        c.setFont("Helvetica-Bold", 20)
-        c.setFillColor(colors.HexColor('#1e293b'))
-        c.drawString(inch, self.page_height - inch, "Disaster Zones")
-        
-        c.setStrokeColor(colors.HexColor('#ef4444'))
-        c.setLineWidth(2)
-        c.line(inch, self.page_height - 1.2*inch, self.page_width - inch, self.page_height - 1.2*inch)
-        
-        y_pos = self.page_height - 1.8*inch
-        
-        c.setFont("Helvetica", 10)
-        c.setFillColor(colors.black)
-        
-        for i, zone in enumerate(zones[:10]):  # Limit to 10 zones per page
-            if y_pos < 2*inch:
-                break
-            
-            # Zone header
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(inch, y_pos, f"{zone.get('name', 'Unknown')}")
-            y_pos -= 0.3*inch
-            
-            c.setFont("Helvetica", 10)
-            details = [
-                f"Severity: {zone.get('severity', 'N/A').capitalize()}",
-                f"Damage Score: {zone.get('damage_score', 0):.2f}",
-                f"Affected Area: {zone.get('affected_area_km2', 0)} km²",
-                f"Coordinates: {zone.get('coordinates', {}).get('lat', 0):.4f}, {zone.get('coordinates', {}).get('lon', 0):.4f}"
-            ]
-            
-            for detail in details:
-                c.drawString(inch + 0.2*inch, y_pos, f"• {detail}")
-                y_pos -= 0.25*inch
-            
-            y_pos -= 0.3*inch
-        
-        c.setFont("Helvetica", 9)
-        c.setFillColor(colors.grey)
-        c.drawRightString(self.page_width - inch, 0.5*inch, "Page 3")
+        c.drawRightString(self.page_width - inch, 0.5*inch, f"Page {c.getPageNumber()}")
     
-    def _draw_floods_page(self, c: canvas.Canvas, floods: List[Dict]):
-        """Draw flood areas detail page"""
-        c.setFont("Helvetica-Bold", 20)
-        c.setFillColor(colors.HexColor('#1e293b'))
-        c.drawString(inch, self.page_height - inch, "Flood-Affected Areas")
-        
-        c.setStrokeColor(colors.HexColor('#3b82f6'))
-        c.setLineWidth(2)
-        c.line(inch, self.page_height - 1.2*inch, self.page_width - inch, self.page_height - 1.2*inch)
-        
-        y_pos = self.page_height - 1.8*inch
-        c.setFont("Helvetica", 10)
-        c.setFillColor(colors.black)
-        
-        for flood in floods[:12]:
-            if y_pos < 2*inch:
-                break
-            
-            c.setFont("Helvetica-Bold", 11)
-            c.drawString(inch, y_pos, f"{flood.get('area_name', 'Unknown Area')}")
-            y_pos -= 0.3*inch
-            
-            c.setFont("Helvetica", 10)
-            c.drawString(inch + 0.2*inch, y_pos, 
-                        f"• Water Level: {flood.get('water_level_meters', 0):.1f}m | "
-                        f"Affected: {flood.get('affected_area_km2', 0)} km²")
-            y_pos -= 0.4*inch
-        
-        c.setFont("Helvetica", 9)
-        c.setFillColor(colors.grey)
-        c.drawRightString(self.page_width - inch, 0.5*inch, "Page 4")
-    
-    def _draw_infrastructure_page(self, c: canvas.Canvas, infrastructure: List[Dict]):
-        """Draw infrastructure damage page"""
-        c.setFont("Helvetica-Bold", 20)
-        c.setFillColor(colors.HexColor('#1e293b'))
-        c.drawString(inch, self.page_height - inch, "Infrastructure Damage")
-        
-        c.setStrokeColor(colors.HexColor('#f59e0b'))
-        c.setLineWidth(2)
-        c.line(inch, self.page_height - 1.2*inch, self.page_width - inch, self.page_height - 1.2*inch)
-        
-        y_pos = self.page_height - 1.8*inch
-        c.setFont("Helvetica", 10)
-        c.setFillColor(colors.black)
-        
-        for infra in infrastructure[:15]:
-            if y_pos < 2*inch:
-                break
-            
-            c.drawString(inch, y_pos, 
-                        f"• {infra.get('type', 'Unknown').capitalize()}: "
-                        f"{infra.get('name', 'N/A')} - "
-                        f"{infra.get('status', 'Unknown')}")
-            y_pos -= 0.3*inch
-        
-        c.setFont("Helvetica", 9)
-        c.setFillColor(colors.grey)
-        c.drawRightString(self.page_width - inch, 0.5*inch, "Page 5")
-    
-    def _draw_alerts_page(self, c: canvas.Canvas, alerts: List[Dict]):
-        """Draw active alerts page"""
-        c.setFont("Helvetica-Bold", 20)
-        c.setFillColor(colors.HexColor('#1e293b'))
-        c.drawString(inch, self.page_height - inch, "Active Alerts")
-        
-        c.setStrokeColor(colors.HexColor('#dc2626'))
-        c.setLineWidth(2)
-        c.line(inch, self.page_height - 1.2*inch, self.page_width - inch, self.page_height - 1.2*inch)
+    async def stream_json_export(self, sections: Dict[str, Any]) -> AsyncIterator[bytes]:
+        """
+        Stream a JSON export without building the document in memory
         
-        y_pos = self.page_height - 1.8*inch
-        c.setFont("Helvetica", 10)
-        c.setFillColor(colors.black)
+        Args:
+            sections: Top-level keys of the document. List/iterable/async-iterable values
+                      are written item by item as arrays; other values are written as-is.
         
-        for alert in alerts[:10]:
-            if y_pos < 2*inch:
-                break
-            
-            c.setFont("Helvetica-Bold", 11)
-            c.drawString(inch, y_pos, f"{alert.get('type', 'Alert').upper()}")
-            y_pos -= 0.3*inch
+        Yields:
+            Chunks of about STREAM_CHUNK_BYTES
+        """
+        buffer = bytearray(b"{")
+        for index, (key, value) in enumerate(sections.items()):
+            if index:
+                buffer += b","
+            buffer += dumps(key) + b":"
+            if value is None or isinstance(value, (dict, str, int, float, bool)):
+                buffer += dumps(value)
+                continue
             
-            c.setFont("Helvetica", 10)
-            c.drawString(inch + 0.2*inch, y_pos, 
-                        f"• {alert.get('description', 'No description')}")
-            y_pos -= 0.25*inch
-            c.drawString(inch + 0.2*inch, y_pos, 
-                        f"• Status: {alert.get('status', 'Unknown')} | "
-                        f"Severity: {alert.get('severity', 'Unknown')}")
-            y_pos -= 0.4*inch
-        
-        c.setFont("Helvetica", 9)
-        c.setFillColor(colors.grey)
-        c.drawRightString(self.page_width - inch, 0.5*inch, "Page 6")
+            buffer += b"["
+            first = True
+            async for item in _iterate(value):
+                if not first:
+                    buffer += b","
+                first = False
+                buffer += dumps(item)
+                if len(buffer) >= STREAM_CHUNK_BYTES:
+                    yield bytes(buffer)
+                    buffer.clear()
+            buffer += b"]"
+        buffer += b"}"
+        yield bytes(buffer)
     
-    def generate_json_export(self, disaster_data: Dict) -> bytes:
-        """Generate JSON export of all data"""
-        json_str = json.dumps(disaster_data, indent=2, default=str)
-        return json_str.encode('utf-8')
-    
-    def generate_csv_export(self, zones: List[Dict]) -> bytes:
-        """Generate CSV export of disaster zones"""
-        import csv
-        import io
-        
+    async def stream_csv_export(self, zones: Union[Iterable[Dict], AsyncIterable[Dict]]) -> AsyncIterator[bytes]:
+        """Stream disaster zones as CSV, one chunk per ~STREAM_CHUNK_BYTES of rows"""
         output = io.StringIO()
         writer = csv.writer(output)
         
@@ -358,16 +445,126 @@ class MapExporter:
         writer.writerow(['ID', 'Name', 'Severity', 'Damage Score', 'Area (km²)', 'Latitude', 'Longitude', 'Last Updated'])
         
         # Data
-        for zone in zones:
+        async for zone in _iterate(zones):
+            coordinates = zone.get('coordinates') or {}
             writer.writerow([
                 zone.get('id', ''),
                 zone.get('name', ''),
                 zone.get('severity', ''),
                 zone.get('damage_score', 0),
                 zone.get('affected_area_km2', 0),
-                zone.get('coordinates', {}).get('lat', 0),
-                zone.get('coordinates', {}).get('lon', 0),
+                coordinates.get('lat', 0),
+                coordinates.get('lon', 0),
                 zone.get('last_updated', '')
             ])
+            if output.tell() >= STREAM_CHUNK_BYTES:
+                yield output.getvalue().encode('utf-8')
+                output.seek(0)
+                output.truncate()
+        
+        yield output.getvalue().encode('utf-8')
+
+    async def stream_geojson_export(self, layers: Dict[str, Any]) -> AsyncIterator[bytes]:
+        """
+        Stream layers as one GeoJSON FeatureCollection (each feature tagged with its layer)
+        
+        Args:
+            layers: Layer name -> list, iterable or async iterable of records
+        """
+        async def features():
+            for layer, records in layers.items():
+                async for record in _iterate(records):
+                    yield geo_formats.to_feature(record, layer)
+        
+        async for chunk in self.stream_json_export({"type": "FeatureCollection", "features": features()}):
+            yield chunk
+    
+    async def generate_geoparquet_export(self, records: Union[Iterable[Dict], AsyncIterable[Dict]]) -> bytes:
+        """Generate a GeoParquet file of one layer (columnar - the layer is materialized)"""
+        records = [record async for record in _iterate(records)]
         
-        return output.getvalue().encode('utf-8')
+        def write() -> bytes:
+            sink = io.BytesIO()
+            geo_formats.write_geoparquet(geo_formats.feature_table(records), sink)
+            return sink.getvalue()
+        
+        return await asyncio.to_thread(write)
+    
+    async def generate_flatgeobuf_export(self, records: Union[Iterable[Dict], AsyncIterable[Dict]],
+                                         layer: str) -> bytes:
+        """Generate a spatially indexed FlatGeobuf file of one layer"""
+        records = [record async for record in _iterate(records)]
+        return await asyncio.to_thread(
+            lambda: geo_formats.flatgeobuf_bytes(geo_formats.feature_table(records), layer)
+        )
+
+async def _iterate(source: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    """Iterate a list, generator or async generator (e.g. a repository stream) uniformly"""
+    if hasattr(source, "__aiter__"):
+        async for item in source:
+            yield item
+    else:
+        for item in source:
+            yield item
+
+async def gzip_stream(chunks: AsyncIterable[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Gzip a byte stream on the fly (constant memory)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+# Benchmark: python map_exporter.py [rows_per_section]
+if __name__ == "__main__":
+    import sys
+    import time
+    import random
+    import resource
+    import re
+    
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    severities = ["critical", "high", "medium", "low"]
+    
+    def point():
+        return {"lat": 19.0 + random.uniform(-0.5, 0.5), "lon": 72.8 + random.uniform(-0.5, 0.5)}
+    
+    disaster_data = {
+        'zones': [{
+            "id": f"zone_{i}", "name": f"Zone {i}", "coordinates": point(),
+            "severity": random.choice(severities), "damage_score": random.random(),
+            "affected_area_km2": round(random.uniform(0.5, 50), 1), "last_updated": datetime.now().isoformat()
+        } for i in range(row_count)],
+        'flood_areas': [{
+            "id": f"flood_{i}", "location": f"Area {i}", "coordinates": point(),
+            "water_level_m": random.uniform(0.5, 3.5), "affected_population": random.randint(500, 5000),
+            "status": random.choice(["rising", "stable", "receding"])
+        } for i in range(row_count)],
+        'infrastructure': [{
+            "id": f"infra_{i}", "type": "bridge", "name": f"Bridge {i}", "damage_level": "severe",
+            "operational": random.random() > 0.5, "priority": random.choice(severities)
+        } for i in range(row_count)],
+        'alerts': [{
+            "id": f"alert_{i}", "type": "flood", "severity": random.choice(severities), "status": "active",
+            "description": "Water level rising rapidly near the main road, evacuation advised"
+        } for i in range(row_count)]
+    }
+    statistics = {"damaged_buildings": 0, "flooded_zones": row_count, "last_updated": datetime.now().isoformat()}
+    # Imports plus the input records - what rendering adds on top is the report's footprint
+    baseline_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    
+    print("\n" + "="*60)
+    print(f"PDF REPORT BENCHMARK ({row_count:,} rows x {len(disaster_data)} sections)")
+    print("="*60 + "\n")
+    
+    start = time.perf_counter()
+    pdf_bytes = MapExporter().generate_pdf_report(disaster_data, statistics)
+    elapsed = time.perf_counter() - start
+    pages = len(re.findall(rb"/Type /Page[^s]", pdf_bytes))
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    
+    print(f"Pages:     {pages:,}")
+    print(f"Size:      {len(pdf_bytes) / 1e6:.2f} MB")
+    print(f"Time:      {elapsed:.2f}s ({pages / elapsed:.1f} pages/sec)")
+    print(f"Peak RSS:  {peak_rss_mb:.0f} MB ({peak_rss_mb - baseline_rss_mb:.0f} MB for rendering)")
@@ -0,0 +1,38 @@
+"""Spatial (GiST) and temporal (B-tree/BRIN) indexes on the layer tables
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# table -> (timestamp column, index method)
+LAYER_TABLES = {
+    "disaster_zones": ("last_updated", "btree"),
+    "flood_areas": ("last_updated", "btree"),
+    "infrastructure": ("last_updated", "btree"),
+    "population_displacement": ("last_updated", "btree"),
+    "alerts": ("timestamp", "brin"),
+    "social_media_posts": ("timestamp", "brin"),
+}
+
+def upgrade():
+    for table, (column, method) in LAYER_TABLES.items():
+        # Replace the implicit geoalchemy2 index with an explicitly named one
+        op.execute(f"DROP INDEX IF EXISTS idx_{table}_location")
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_location ON {table} USING gist (location)")
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} USING {method} ({column})")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_feedback_logs_timestamp ON feedback_logs USING brin (timestamp)")
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_feedback_logs_timestamp")
+    for table, (column, _) in LAYER_TABLES.items():
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_{column}")
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_location")
+        op.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_location ON {table} USING gist (location)")
@@ -0,0 +1,115 @@
+"""Range-partition social_media_posts, alerts and feedback_logs by day
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+from datetime import datetime, timedelta
+from alembic import op
+from sqlalchemy import text
+
+from partitions import (
+    PARTITIONED_TABLES, RETENTION_DAYS, DAYS_AHEAD,
+    create_partition_sql, create_default_partition_sql
+)
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# table -> indexes recreated on the partitioned parent
+TABLE_INDEXES = {
+    "social_media_posts": [
+        "CREATE INDEX ix_social_media_posts_id ON social_media_posts (id)",
+        "CREATE INDEX ix_social_media_posts_location ON social_media_posts USING gist (location)",
+        "CREATE INDEX ix_social_media_posts_timestamp ON social_media_posts USING brin (timestamp)",
+    ],
+    "alerts": [
+        "CREATE INDEX ix_alerts_id ON alerts (id)",
+        "CREATE INDEX ix_alerts_location ON alerts USING gist (location)",
+        "CREATE INDEX ix_alerts_timestamp ON alerts USING brin (timestamp)",
+    ],
+    "feedback_logs": [
+        "CREATE INDEX ix_feedback_logs_id ON feedback_logs (id)",
+        "CREATE INDEX ix_feedback_logs_timestamp ON feedback_logs USING brin (timestamp)",
+    ],
+}
+
+def _is_partitioned(conn, table: str) -> bool:
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table JOIN pg_class ON pg_partitioned_table.partrelid = pg_class.oid "
+        "WHERE pg_class.relname = :table"
+    ), {"table": table}).scalar())
+
+def _drop_indexes(table: str):
+    for statement in TABLE_INDEXES[table]:
+        op.execute(f"DROP INDEX IF EXISTS {statement.split()[2]}")
+    op.execute(f"DROP INDEX IF EXISTS idx_{table}_location")
+
+def upgrade():
+    conn = op.get_bind()
+    today = datetime.utcnow().date()
+
+    for table in PARTITIONED_TABLES:
+        if _is_partitioned(conn, table):
+            continue
+        legacy = f"{table}_legacy"
+
+        # Move the plain table aside (names of its PK and indexes must be freed)
+        op.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        op.execute(f"ALTER TABLE {legacy} RENAME CONSTRAINT {table}_pkey TO {legacy}_pkey")
+        _drop_indexes(table)
+        if table == "feedback_logs":
+            # Keep the id sequence alive when the legacy table is dropped
+            op.execute("ALTER SEQUENCE feedback_logs_id_seq OWNED BY NONE")
+
+        # Partition key must be NOT NULL and part of the primary key
+        op.execute(f"UPDATE {legacy} SET timestamp = now() WHERE timestamp IS NULL")
+        op.execute(f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (timestamp)")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN timestamp SET NOT NULL")
+        op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, timestamp)")
+
+        # Daily partitions for the retained history and the days ahead, default for the rest
+        oldest = conn.execute(text(f"SELECT min(timestamp) FROM {legacy}")).scalar()
+        first_day = max(oldest.date(), today - timedelta(days=RETENTION_DAYS)) if oldest else today
+        day = first_day
+        while day <= today + timedelta(days=DAYS_AHEAD):
+            op.execute(create_partition_sql(table, day))
+            day += timedelta(days=1)
+        op.execute(create_default_partition_sql(table))
+
+        op.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+        for statement in TABLE_INDEXES[table]:
+            op.execute(statement)
+        op.execute(f"DROP TABLE {legacy}")
+        if table == "feedback_logs":
+            op.execute("ALTER SEQUENCE feedback_logs_id_seq OWNED BY feedback_logs.id")
+
+def downgrade():
+    conn = op.get_bind()
+
+    for table in PARTITIONED_TABLES:
+        if not _is_partitioned(conn, table):
+            continue
+        partitioned = f"{table}_partitioned"
+
+        op.execute(f"ALTER TABLE {table} RENAME TO {partitioned}")
+        op.execute(f"ALTER TABLE {partitioned} RENAME CONSTRAINT {table}_pkey TO {partitioned}_pkey")
+        _drop_indexes(table)
+        if table == "feedback_logs":
+            op.execute("ALTER SEQUENCE feedback_logs_id_seq OWNED BY NONE")
+
+        # Back to a plain table keyed on id - keep the latest version of each record
+        op.execute(f"CREATE TABLE {table} (LIKE {partitioned} INCLUDING DEFAULTS)")
+        op.execute(
+            f"INSERT INTO {table} SELECT DISTINCT ON (id) * FROM {partitioned} "
+            f"ORDER BY id, timestamp DESC"
+        )
+        op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id)")
+        for statement in TABLE_INDEXES[table]:
+            op.execute(statement)
+        op.execute(f"DROP TABLE {partitioned} CASCADE")
+        if table == "feedback_logs":
+            op.execute("ALTER SEQUENCE feedback_logs_id_seq OWNED BY feedback_logs.id")
@@ -0,0 +1,162 @@
+"""
+Daily range partitions for the high-volume tables
+Creates upcoming partitions, drops expired ones and checks that queries hit the indexes
+"""
+
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+from sqlalchemy import text
+
+from database import engine
+
+PARTITIONED_TABLES = ("social_media_posts", "alerts", "feedback_logs")
+RETENTION_DAYS = int(os.getenv("PARTITION_RETENTION_DAYS", "30"))
+DAYS_AHEAD = int(os.getenv("PARTITION_DAYS_AHEAD", "7"))
+
+def partition_name(table: str, day: date) -> str:
+    """Name of the partition holding one day of a table"""
+    return f"{table}_p{day.strftime('%Y%m%d')}"
+
+def create_partition_sql(table: str, day: date) -> str:
+    """DDL for the [day, day + 1) partition of a table"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, day)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+    )
+
+def create_default_partition_sql(table: str) -> str:
+    """DDL for the catch-all partition (late or future-dated records)"""
+    return f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"
+
+def ensure_partitions(days_ahead: int = DAYS_AHEAD, days_back: int = 0, bind=engine) -> List[str]:
+    """
+    Create daily partitions from today - days_back through today + days_ahead
+
+    Args:
+        days_ahead: Number of future days to pre-create
+        days_back: Number of past days to backfill
+        bind: Engine to run against
+
+    Returns:
+        List of partition names that now exist for the window
+    """
+    today = datetime.utcnow().date()
+    created = []
+    with bind.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            conn.execute(text(create_default_partition_sql(table)))
+            for offset in range(-days_back, days_ahead + 1):
+                day = today + timedelta(days=offset)
+                try:
+                    with conn.begin_nested():
+                        conn.execute(text(create_partition_sql(table, day)))
+                    created.append(partition_name(table, day))
+                except Exception as e:
+                    # Rows for this day already sit in the default partition
+                    print(f"⚠️  Could not create {partition_name(table, day)}: {e}")
+    return created
+
+def drop_old_partitions(retention_days: int = RETENTION_DAYS, bind=engine) -> List[str]:
+    """
+    Drop daily partitions older than the retention window
+
+    Expired rows that landed in the default partition are deleted as well.
+
+    Returns:
+        List of dropped partition names
+    """
+    cutoff = datetime.utcnow().date() - timedelta(days=retention_days)
+    dropped = []
+    with bind.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            rows = conn.execute(text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+                "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+                "WHERE parent.relname = :table"
+            ), {"table": table}).scalars().all()
+
+            prefix = f"{table}_p"
+            for name in rows:
+                if not name.startswith(prefix):
+                    continue
+                try:
+                    day = datetime.strptime(name[len(prefix):], "%Y%m%d").date()
+                except ValueError:
+                    continue
+                if day < cutoff:
+                    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                    conn.execute(text(f"DROP TABLE {name}"))
+                    dropped.append(name)
+
+            conn.execute(
+                text(f"DELETE FROM {table}_default WHERE timestamp < :cutoff"),
+                {"cutoff": cutoff}
+            )
+
+    if dropped:
+        print(f"🗑️  Dropped {len(dropped)} expired partitions (older than {cutoff})")
+    return dropped
+
+def run_partition_maintenance() -> Dict:
+    """Retention job: pre-create upcoming partitions and drop expired ones"""
+    created = ensure_partitions()
+    dropped = drop_old_partitions()
+    return {"created": created, "dropped": dropped}
+
+# Representative layer queries: index name -> (query, indexed column)
+PLAN_CHECKS = {
+    "ix_disaster_zones_location": (
+        "SELECT id FROM disaster_zones "
+        "WHERE ST_Intersects(location, ST_MakeEnvelope(72.8, 18.9, 73.0, 19.2, 4326))",
+        "location"
+    ),
+    "ix_disaster_zones_last_updated": (
+        "SELECT id FROM disaster_zones WHERE last_updated >= now() - interval '1 hour'",
+        "last_updated"
+    ),
+    "ix_alerts_location": (
+        "SELECT id FROM alerts "
+        "WHERE ST_DWithin(location, ST_SetSRID(ST_MakePoint(72.87, 19.07), 4326), 0.01)",
+        "location"
+    ),
+    "ix_social_media_posts_timestamp": (
+        "SELECT id FROM social_media_posts WHERE timestamp >= now() - interval '1 hour'",
+        "timestamp"
+    ),
+}
+
+def check_query_plans(bind=engine) -> Dict[str, bool]:
+    """
+    EXPLAIN the representative layer queries and report whether each uses its index
+
+    Sequential scans are disabled for the check so small tables still show
+    whether the planner *can* use the index.
+    """
+    results = {}
+    with bind.connect() as conn:
+        conn.execute(text("SET enable_seqscan = off"))
+        for index_name, (query, column) in PLAN_CHECKS.items():
+            plan = "\n".join(conn.execute(text(f"EXPLAIN {query}")).scalars().all())
+            # Partitions inherit the index under derived names (alerts_p20250101_location_idx)
+            results[index_name] = "Index" in plan and (
+                index_name in plan or f"_{column}_idx" in plan
+            )
+        conn.execute(text("RESET enable_seqscan"))
+    return results
+
+if __name__ == "__main__":
+    import sys
+
+    if "--check-plans" in sys.argv:
+        print("\n" + "="*60)
+        print("QUERY PLAN CHECKS")
+        print("="*60 + "\n")
+        results = check_query_plans()
+        for index_name, used in results.items():
+            print(f"{'✓' if used else '✗'} {index_name}")
+        sys.exit(0 if all(results.values()) else 1)
+
+    result = run_partition_maintenance()
+    print(f"Partitions ensured: {len(result['created'])}, dropped: {len(result['dropped'])}")
@@ -0,0 +1,195 @@
+"""
+Token-bucket rate limiting for upstream APIs
+Per-API-key and per-endpoint budgets with burst capacity and 429 Retry-After backoff
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+class RateLimitedError(Exception):
+    """Upstream answered 429"""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(f"{endpoint} rate limited, retry after {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+    def as_result(self) -> Dict:
+        return {
+            "error": "Rate limit reached. Please wait and try again. HERE API limits requests per second.",
+            "retry_after": self.retry_after,
+            "status": "rate_limited"
+        }
+
+class TokenBucket:
+    """Refills at `rate` tokens/s up to `burst`; callers reserve a token and wait out any deficit"""
+
+    def __init__(self, rate: float, burst: float):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token now and return how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            # A negative balance queues callers behind each other in reservation order
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def throttled(self, retry_after: float):
+        """Upstream said 429: pause for Retry-After and halve the rate"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            self.rate = max(self.base_rate / 10, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def succeeded(self):
+        """Recover the rate additively after a backoff"""
+        if self.rate < self.base_rate:
+            with self._lock:
+                self.rate = min(self.base_rate, self.rate + self.base_rate / 20)
+
+class RateLimiter:
+    """Token buckets per API key (overall budget) and per (API key, endpoint)"""
+
+    def __init__(self, key_rate: float, key_burst: float, budgets: Dict[str, Tuple[float, float]],
+                 default_budget: Tuple[float, float] = (5.0, 5.0)):
+        """
+        Args:
+            key_rate: Requests per second allowed for one API key across endpoints
+            key_burst: Burst capacity of the per-key bucket
+            budgets: Endpoint -> (requests per second, burst)
+            default_budget: Budget for endpoints not listed
+        """
+        self.key_rate = key_rate
+        self.key_burst = key_burst
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict] = {}
+
+    @staticmethod
+    def _key_id(api_key: str) -> str:
+        # Metrics and bucket keys never hold the key itself
+        return hashlib.blake2b(api_key.encode(), digest_size=4).hexdigest() if api_key else "anonymous"
+
+    def _bucket(self, key_id: str, endpoint: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get((key_id, endpoint))
+            if bucket is None:
+                rate, burst = (self.key_rate, self.key_burst) if endpoint == "*" else \
+                    self.budgets.get(endpoint, self.default_budget)
+                bucket = self._buckets[(key_id, endpoint)] = TokenBucket(rate, burst)
+            return bucket
+
+    def _reserve(self, api_key: str, endpoint: str) -> float:
+        key_id = self._key_id(api_key)
+        return max(self._bucket(key_id, "*").reserve(), self._bucket(key_id, endpoint).reserve())
+
+    async def acquire(self, api_key: str, endpoint: str) -> float:
+        """Wait (without blocking the event loop) until a request may be sent; returns the wait"""
+        wait = self._reserve(api_key, endpoint)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._record(endpoint, wait)
+        return wait
+
+    def acquire_sync(self, api_key: str, endpoint: str) -> float:
+        """Blocking acquire for worker threads and processes - never call on the event loop"""
+        wait = self._reserve(api_key, endpoint)
+        if wait > 0:
+            time.sleep(wait)
+        self._record(endpoint, wait)
+        return wait
+
+    def feedback(self, api_key: str, endpoint: str, response) -> Optional[float]:
+        """
+        Adjust the endpoint's rate from an upstream response
+
+        Returns:
+            Retry-After seconds when the response was a 429, else None
+        """
+        key_id = self._key_id(api_key)
+        bucket = self._bucket(key_id, endpoint)
+        if response.status_code != 429:
+            bucket.succeeded()
+            return None
+        retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+        bucket.throttled(retry_after)
+        with self._lock:
+            self._metrics.setdefault(endpoint, self._empty_metrics())["throttled"] += 1
+        print(f"⚠️ HERE {endpoint} rate limited - backing off {retry_after:.1f}s at {bucket.rate:.2f} req/s")
+        return retry_after
+
+    def stats(self) -> Dict:
+        """Queue wait and throttling per endpoint, with the current rates"""
+        with self._lock:
+            endpoints = {}
+            for endpoint, metrics in self._metrics.items():
+                requests = metrics["requests"]
+                endpoints[endpoint] = {
+                    **metrics,
+                    "total_wait_seconds": round(metrics["total_wait_seconds"], 3),
+                    "max_wait_seconds": round(metrics["max_wait_seconds"], 3),
+                    "avg_wait_seconds": round(metrics["total_wait_seconds"] / requests, 4) if requests else 0.0
+                }
+            rates = {
+                f"{key_id}:{endpoint}": round(bucket.rate, 3)
+                for (key_id, endpoint), bucket in self._buckets.items()
+            }
+        return {"endpoints": endpoints, "rates": rates}
+
+    @staticmethod
+    def _empty_metrics() -> Dict:
+        return {"requests": 0, "waited": 0, "total_wait_seconds": 0.0, "max_wait_seconds": 0.0, "throttled": 0}
+
+    def _record(self, endpoint: str, wait: float):
+        with self._lock:
+            metrics = self._metrics.setdefault(endpoint, self._empty_metrics())
+            metrics["requests"] += 1
+            if wait > 0:
+                metrics["waited"] += 1
+                metrics["total_wait_seconds"] += wait
+                metrics["max_wait_seconds"] = max(metrics["max_wait_seconds"], wait)
+
+def retry_after_seconds(value: Optional[str], default: float = 1.0) -> float:
+    """Retry-After header as seconds (delta-seconds or HTTP date)"""
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+# HERE budgets (requests/s, burst) - one limiter shared by HEREService and HEREImageService
+HERE_BUDGETS = {
+    "tiles": (float(os.getenv("HERE_TILE_RATE", "10")), 20),
+    "geocode": (5.0, 10),
+    "revgeocode": (5.0, 10),
+    "routes": (5.0, 5),
+    "isolines": (2.0, 4),
+}
+
+here_limiter = RateLimiter(
+    key_rate=float(os.getenv("HERE_RATE_LIMIT", "10")),
+    key_burst=float(os.getenv("HERE_RATE_BURST", "20")),
+    budgets=HERE_BUDGETS
+)
@@ -0,0 +1,155 @@
+"""
+PDF report job queue
+Renders reports in a worker pool off the event loop and caches artifacts by data snapshot
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from map_exporter import MapExporter
+
+# One per worker process, so the image cache and static-map LRU outlive a single job
+_exporter: Optional[MapExporter] = None
+
+def render_pdf_report(disaster_data: Dict, statistics: Dict) -> bytes:
+    """Worker entry point (module level so it can be sent to a process pool)"""
+    global _exporter
+    if _exporter is None:
+        _exporter = MapExporter()
+    return _exporter.generate_pdf_report(disaster_data, statistics)
+
+class ReportJobQueue:
+    """Queue of PDF render jobs with an on-disk artifact cache keyed by snapshot hash"""
+
+    def __init__(self, cache_dir: str, workers: int = 2, max_artifacts: int = 50,
+                 max_jobs: int = 256):
+        """
+        Args:
+            cache_dir: Where finished reports are kept (<snapshot key>.pdf)
+            workers: Render processes (reportlab is CPU-bound pure Python)
+            max_artifacts: Cached reports kept on disk, oldest removed first
+            max_jobs: Job records kept in memory for status lookups
+        """
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.max_artifacts = max_artifacts
+        self.max_jobs = max_jobs
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._pending: Dict[str, str] = {}  # snapshot key -> job id being rendered
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def artifact_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def submit(self, key: str, disaster_data: Dict, statistics: Dict) -> Dict:
+        """
+        Queue a report for a data snapshot
+
+        Args:
+            key: Hash of the data snapshot the report is rendered from
+            disaster_data: Layers for the report
+            statistics: Summary statistics
+
+        Returns:
+            The job - already "done" when the snapshot's report is cached, or the
+            in-flight job when the same snapshot is being rendered
+        """
+        if key in self._pending:
+            return self._jobs[self._pending[key]]
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "snapshot": key,
+            "status": "queued",
+            "cached": False,
+            "created": time.time(),
+            "finished": None,
+            "error": None
+        }
+        self._remember(job)
+
+        if os.path.exists(self.artifact_path(key)):
+            # Touch so the cache evicts least recently requested reports first
+            os.utime(self.artifact_path(key))
+            job.update(status="done", cached=True, finished=time.time())
+            return job
+
+        self._pending[key] = job["job_id"]
+        job["task"] = asyncio.create_task(self._run(job, disaster_data, statistics))
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: Dict) -> Dict:
+        """Wait for a job to finish"""
+        task = job.get("task")
+        if task:
+            await asyncio.shield(task)
+        return job
+
+    def public(self, job: Dict) -> Dict:
+        """Job fields safe to return from the API"""
+        return {k: v for k, v in job.items() if k != "task"}
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, job: Dict, disaster_data: Dict, statistics: Dict):
+        key = job["snapshot"]
+        try:
+            job["status"] = "running"
+            if self._executor is None:
+                # Spawn, not fork: a forked worker would inherit the event loop, DB pool and sockets
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            pdf_bytes = await loop.run_in_executor(self._executor, render_pdf_report, disaster_data, statistics)
+
+            # Write then rename, so a reader never sees a partial file
+            path = self.artifact_path(key)
+            temp_path = f"{path}.{job['job_id']}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(pdf_bytes)
+            os.replace(temp_path, path)
+
+            job.update(status="done", finished=time.time())
+            print(f"✅ Rendered PDF report {key[:12]} in {time.perf_counter() - start:.2f}s")
+            self._evict()
+        except Exception as e:
+            print(f"❌ PDF report job {job['job_id']} failed: {e}")
+            job.update(status="failed", error=str(e), finished=time.time())
+        finally:
+            self._pending.pop(key, None)
+            job.pop("task", None)
+
+    def _remember(self, job: Dict):
+        self._jobs[job["job_id"]] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+    def _evict(self):
+        """Keep at most max_artifacts reports, dropping the least recently used"""
+        artifacts = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir) if name.endswith(".pdf")
+        ]
+        if len(artifacts) <= self.max_artifacts:
+            return
+        artifacts.sort(key=os.path.getmtime)
+        for path in artifacts[:len(artifacts) - self.max_artifacts]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,216 @@
+"""
+Async PostGIS repository
+Reads map layers through the pooled asyncpg engine using GiST-indexed spatial filters
+"""
+
+import math
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy import select, func, cast
+from sqlalchemy.orm import defer
+from geoalchemy2 import Geography
+
+from database import (
+    AsyncSessionLocal, DisasterZone, FloodArea, Infrastructure,
+    PopulationDisplacement, Alert, SocialMediaPost
+)
+
+# (west, south, east, north) in WGS84 degrees
+BBox = Tuple[float, float, float, float]
+# (lat, lon, radius_meters)
+Near = Tuple[float, float, float]
+
+METERS_PER_DEGREE = 111320.0
+
+# Layer name -> (model, ordering column, dict mapper)
+LAYERS = {
+    "zones": (DisasterZone, "last_updated", "_zone_to_dict"),
+    "flood_areas": (FloodArea, "last_updated", "_flood_to_dict"),
+    "infrastructure": (Infrastructure, "last_updated", "_infrastructure_to_dict"),
+    "displacement": (PopulationDisplacement, "last_updated", "_displacement_to_dict"),
+    "alerts": (Alert, "timestamp", "_alert_to_dict"),
+    "social_posts": (SocialMediaPost, "timestamp", "_social_post_to_dict"),
+}
+
+class DisasterRepository:
+    """Async read access to the disaster layers stored in PostGIS"""
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+
+    async def get_disaster_zones(self, bbox: Optional[BBox] = None, near: Optional[Near] = None,
+                                 limit: Optional[int] = None) -> List[Dict]:
+        """Get disaster zones, optionally filtered by bounding box or radius"""
+        rows = await self._fetch(DisasterZone, bbox, near, DisasterZone.last_updated, limit)
+        return [self._zone_to_dict(row) for row in rows]
+
+    async def get_flood_areas(self, bbox: Optional[BBox] = None, near: Optional[Near] = None,
+                              limit: Optional[int] = None) -> List[Dict]:
+        """Get flood-affected areas"""
+        rows = await self._fetch(FloodArea, bbox, near, FloodArea.last_updated, limit)
+        return [self._flood_to_dict(row) for row in rows]
+
+    async def get_infrastructure(self, bbox: Optional[BBox] = None, near: Optional[Near] = None,
+                                 limit: Optional[int] = None) -> List[Dict]:
+        """Get damaged infrastructure"""
+        rows = await self._fetch(Infrastructure, bbox, near, Infrastructure.last_updated, limit)
+        return [self._infrastructure_to_dict(row) for row in rows]
+
+    async def get_displacement(self, bbox: Optional[BBox] = None, near: Optional[Near] = None,
+                               limit: Optional[int] = None) -> List[Dict]:
+        """Get population displacement zones"""
+        rows = await self._fetch(PopulationDisplacement, bbox, near,
+                                 PopulationDisplacement.last_updated, limit)
+        return [self._displacement_to_dict(row) for row in rows]
+
+    async def get_alerts(self, bbox: Optional[BBox] = None, near: Optional[Near] = None,
+                         limit: Optional[int] = None, since: Optional[datetime] = None) -> List[Dict]:
+        """Get alerts, newest first"""
+        rows = await self._fetch(Alert, bbox, near, Alert.timestamp, limit, since)
+        return [self._alert_to_dict(row) for row in rows]
+
+    async def get_social_posts(self, bbox: Optional[BBox] = None, near: Optional[Near] = None,
+                               limit: Optional[int] = None, since: Optional[datetime] = None) -> List[Dict]:
+        """Get analyzed social media posts, newest first"""
+        rows = await self._fetch(SocialMediaPost, bbox, near, SocialMediaPost.timestamp, limit, since)
+        return [self._social_post_to_dict(row) for row in rows]
+
+    async def stream(self, layer: str, since: Optional[datetime] = None,
+                     batch_size: int = 1000) -> AsyncIterator[Dict]:
+        """
+        Stream every record of a layer through a server-side cursor (for exports)
+
+        Args:
+            layer: One of LAYERS
+            since: Only records at or after this time
+            batch_size: Rows fetched per round trip
+
+        Yields:
+            Records in the same dict format as the get_* methods
+        """
+        model, order_name, mapper_name = LAYERS[layer]
+        stmt = self._select(model, None, None, getattr(model, order_name), None, since)
+        mapper = getattr(self, mapper_name)
+        async with self.session_factory() as session:
+            result = await session.stream_scalars(stmt.execution_options(yield_per=batch_size))
+            async for row in result:
+                yield mapper(row)
+
+    async def _fetch(self, model, bbox: Optional[BBox], near: Optional[Near], order_column,
+                     limit: Optional[int], since: Optional[datetime] = None) -> List:
+        """Run a spatially (and optionally time) filtered select for one layer"""
+        stmt = self._select(model, bbox, near, order_column, limit, since)
+        async with self.session_factory() as session:
+            result = await session.execute(stmt)
+            return result.scalars().all()
+
+    def _select(self, model, bbox: Optional[BBox], near: Optional[Near], order_column,
+                limit: Optional[int], since: Optional[datetime] = None):
+        """Build the filtered select for one layer"""
+        # Coordinates are served from lat/lon - skip decoding the geometry column
+        stmt = select(model).options(defer(model.location))
+
+        if bbox:
+            west, south, east, north = bbox
+            envelope = func.ST_MakeEnvelope(west, south, east, north, 4326)
+            stmt = stmt.where(func.ST_Intersects(model.location, envelope))
+
+        if near:
+            lat, lon, radius_m = near
+            point = func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326)
+            geography = Geography(srid=4326)
+            # Index-assisted prefilter in degrees (widened for longitude at this latitude),
+            # then the exact distance check on the spheroid
+            radius_deg = radius_m / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+            stmt = stmt.where(
+                func.ST_DWithin(model.location, point, radius_deg),
+                func.ST_DWithin(cast(model.location, geography), cast(point, geography), radius_m)
+            )
+
+        if since:
+            # Lets the planner prune daily partitions / use the timestamp index
+            stmt = stmt.where(order_column >= since)
+
+        stmt = stmt.order_by(order_column.desc())
+        if limit:
+            stmt = stmt.limit(limit)
+        return stmt
+
+    @staticmethod
+    def _coordinates(row) -> Optional[Dict]:
+        if row.lat is None or row.lon is None:
+            return None
+        return {"lat": row.lat, "lon": row.lon}
+
+    @staticmethod
+    def _isoformat(value) -> Optional[str]:
+        return value.isoformat() if value else None
+
+    def _zone_to_dict(self, row: DisasterZone) -> Dict:
+        zone = dict(row.metadata_json or {})
+        zone.update({
+            "id": row.id,
+            "name": row.name,
+            "coordinates": self._coordinates(row),
+            "severity": row.severity,
+            "damage_score": row.damage_score,
+            "affected_area_km2": row.affected_area_km2,
+            "last_updated": self._isoformat(row.last_updated)
+        })
+        return zone
+
+    def _flood_to_dict(self, row: FloodArea) -> Dict:
+        return {
+            "id": row.id,
+            "location": row.area_name,
+            "coordinates": self._coordinates(row),
+            "water_level_m": row.water_level_meters,
+            "affected_area_km2": row.affected_area_km2,
+            "severity": row.severity,
+            "timestamp": self._isoformat(row.last_updated)
+        }
+
+    def _infrastructure_to_dict(self, row: Infrastructure) -> Dict:
+        return {
+            "id": row.id,
+            "type": row.type,
+            "name": row.name,
+            "coordinates": self._coordinates(row),
+            "status": row.status,
+            "damage_level": row.damage_level,
+            "timestamp": self._isoformat(row.last_updated)
+        }
+
+    def _displacement_to_dict(self, row: PopulationDisplacement) -> Dict:
+        return {
+            "id": row.id,
+            "area": row.area_name,
+            "coordinates": self._coordinates(row),
+            "displaced_count": row.displaced_count,
+            "shelter_capacity": row.shelter_capacity
+        }
+
+    def _alert_to_dict(self, row: Alert) -> Dict:
+        return {
+            "id": row.id,
+            "type": row.type,
+            "severity": row.severity,
+            "coordinates": self._coordinates(row),
+            "description": row.description,
+            "status": row.status,
+            "timestamp": self._isoformat(row.timestamp)
+        }
+
+    def _social_post_to_dict(self, row: SocialMediaPost) -> Dict:
+        post = dict(row.analysis_json or {})
+        post.update({
+            "id": row.id,
+            "text": row.text,
+            "location": row.location_name,
+            "coordinates": self._coordinates(row),
+            "urgency": row.urgency,
+            "priority_score": row.priority_score,
+            "verified": row.verified,
+            "timestamp": self._isoformat(row.timestamp)
+        })
+        return post
@@ -0,0 +1,141 @@
+"""
+Route and isoline result cache
+In-process LRU keyed by snapped coordinates, with a traffic-freshness TTL and
+invalidation of the entries that cross newly reported disaster zones
+"""
+
+import math
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+BBox = Tuple[float, float, float, float]  # west, south, east, north
+
+# Isoline polygons are kept as int32 arrays of [lng, lat] in 1e-6 degrees (about 0.1 m)
+COORDINATE_SCALE = 1e6
+KM_PER_DEGREE = 111.32
+
+class RouteCache:
+    """Upstream routing results by key, each with the area it covers"""
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 300):
+        """
+        Args:
+            max_entries: Entries kept, least recently used dropped first
+            ttl_seconds: Default lifetime - routes follow live traffic, so keep it short
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[Dict, BBox, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidated": 0, "writes": 0}
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.metrics["misses"] += 1
+                return None
+            value, _, expires = entry
+            if time.time() > expires:
+                del self._entries[key]
+                self.metrics["expired"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.metrics["hits"] += 1
+            return value
+
+    def put(self, key: str, value: Dict, bbox: BBox, ttl_seconds: Optional[float] = None):
+        with self._lock:
+            self._entries[key] = (value, bbox, time.time() + (ttl_seconds or self.ttl_seconds))
+            self._entries.move_to_end(key)
+            self.metrics["writes"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.metrics["evictions"] += 1
+
+    def invalidate_areas(self, areas: Iterable[Tuple[float, float, float]]) -> int:
+        """
+        Drop entries whose area intersects any (lat, lon, radius_km) circle's bounding box
+
+        Returns:
+            Number of entries dropped
+        """
+        boxes = [circle_bbox(lat, lon, radius_km) for lat, lon, radius_km in areas]
+        if not boxes:
+            return 0
+        with self._lock:
+            stale = [
+                key for key, (_, bbox, _) in self._entries.items()
+                if any(intersects(bbox, box) for box in boxes)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.metrics["invalidated"] += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.metrics["invalidated"] += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit ratio, invalidations and size"""
+        with self._lock:
+            lookups = self.metrics["hits"] + self.metrics["misses"] + self.metrics["expired"]
+            return {
+                **self.metrics,
+                "hit_ratio": round(self.metrics["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries)
+            }
+
+def circle_bbox(lat: float, lon: float, radius_km: float) -> BBox:
+    lat_delta = radius_km / KM_PER_DEGREE
+    lon_delta = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return lon - lon_delta, lat - lat_delta, lon + lon_delta, lat + lat_delta
+
+def intersects(a: BBox, b: BBox) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+def route_bbox(origin: Tuple[float, float], destination: Tuple[float, float], padding_km: float = 1.0) -> BBox:
+    """Area a route between two (lat, lon) points may run through: their box, padded"""
+    west, east = sorted((origin[1], destination[1]))
+    south, north = sorted((origin[0], destination[0]))
+    # Roads detour - pad by a quarter of the span, at least padding_km
+    pad_lat = max(padding_km / KM_PER_DEGREE, (north - south) / 4)
+    pad_lon = max(padding_km / (KM_PER_DEGREE * max(math.cos(math.radians(north)), 0.01)), (east - west) / 4)
+    return west - pad_lon, south - pad_lat, east + pad_lon, north + pad_lat
+
+def compact_isolines(result: Dict) -> Tuple[Dict, Optional[BBox]]:
+    """
+    Isoline result with polygons packed as int32 arrays, and the bbox they cover
+
+    Returns:
+        (compact result, bbox or None when there are no polygon points)
+    """
+    isolines = []
+    bounds: List[np.ndarray] = []
+    for isoline in result["isolines"]:
+        polygons = [np.round(np.asarray(polygon, dtype=np.float64) * COORDINATE_SCALE).astype(np.int32)
+                    for polygon in isoline["polygons"] if len(polygon)]
+        bounds.extend(np.concatenate([polygon.min(axis=0), polygon.max(axis=0)]) for polygon in polygons)
+        isolines.append({**isoline, "polygons": polygons})
+    if not bounds:
+        return {**result, "isolines": isolines}, None
+    stacked = np.stack(bounds)
+    west, south = stacked[:, :2].min(axis=0) / COORDINATE_SCALE
+    east, north = stacked[:, 2:].max(axis=0) / COORDINATE_SCALE
+    return {**result, "isolines": isolines}, (float(west), float(south), float(east), float(north))
+
+def expand_isolines(result: Dict) -> Dict:
+    """Inverse of compact_isolines: polygons back as [[lng, lat], ...] lists"""
+    return {
+        **result,
+        "isolines": [
+            {**isoline, "polygons": [(polygon / COORDINATE_SCALE).tolist() for polygon in isoline["polygons"]]}
+            for isoline in result["isolines"]
+        ]
+    }
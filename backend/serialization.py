@@ -0,0 +1,158 @@
+"""
+Fast JSON serialization and response compression
+orjson encoding (NumPy-aware) for large layer payloads, brotli/gzip above a size threshold
+"""
+
+import os
+import re
+from typing import Any, Iterable
+
+import numpy as np
+import orjson
+from fastapi.responses import JSONResponse
+from starlette.middleware.gzip import GZipMiddleware
+
+# brotli-asgi is optional - fall back to gzip only
+try:
+    from brotli_asgi import BrotliMiddleware
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BrotliMiddleware = None
+    BROTLI_AVAILABLE = False
+
+# Bodies smaller than this are sent uncompressed (headers would eat the savings)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# request.state attribute: callable(bytes) told how many body bytes went out, after compression
+BODY_SENT_HOOK = "on_body_sent"
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def _default(obj: Any):
+    """Fallback for types orjson doesn't encode natively"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        # Non-contiguous or object arrays aren't handled by OPT_SERIALIZE_NUMPY
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    # Same behaviour as the json.dumps(default=str) calls this replaces
+    return str(obj)
+
+def dumps(content: Any) -> bytes:
+    """Encode to compact JSON bytes"""
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+def loads(data) -> Any:
+    return orjson.loads(data)
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded with orjson
+
+    Returned directly from the layer endpoints so FastAPI skips jsonable_encoder.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class CompressionMiddleware:
+    """
+    Brotli (gzip fallback) response compression above a size threshold
+
+    Streaming endpoints such as Server-Sent Events are passed through untouched -
+    a compressor would buffer events until its block fills up. Endpoints that set
+    request.state.on_body_sent are told how many body bytes actually went out.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE,
+                 exclude_paths: Iterable[str] = ()):
+        """
+        Args:
+            app: ASGI application
+            minimum_size: Smallest body (bytes) worth compressing
+            exclude_paths: Regexes of request paths that are never compressed
+        """
+        self.app = app
+        self.exclude_paths = [re.compile(pattern) for pattern in exclude_paths]
+        if BROTLI_AVAILABLE:
+            self.compressed_app = BrotliMiddleware(
+                app, quality=BROTLI_QUALITY, minimum_size=minimum_size, gzip_fallback=True
+            )
+        else:
+            self.compressed_app = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=GZIP_LEVEL)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        app = self.app if any(p.match(scope["path"]) for p in self.exclude_paths) else self.compressed_app
+        sent = 0
+
+        async def counting_send(message):
+            nonlocal sent
+            if message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    # Set by the endpoint on request.state (shared through the scope)
+                    on_body_sent = getattr(scope.get("state"), "get", lambda _: None)(BODY_SENT_HOOK)
+                    if on_body_sent:
+                        on_body_sent(sent)
+            await send(message)
+
+        await app(scope, receive, counting_send)
+
+# Benchmark: python serialization.py [max_features]
+if __name__ == "__main__":
+    import sys
+    import gzip
+    import json
+    import time
+    import random
+
+    max_features = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    def synthetic_features(n: int):
+        severities = ["critical", "high", "medium", "low"]
+        return [{
+            "id": f"zone_{i}",
+            "name": f"Zone {i}",
+            "coordinates": {"lat": 19.0 + random.uniform(-1, 1), "lon": 72.8 + random.uniform(-1, 1)},
+            "severity": random.choice(severities),
+            "damage_score": np.float32(random.random()),
+            "affected_area_km2": round(random.uniform(0.5, 50), 1),
+            "population_affected": np.int64(random.randint(0, 50000)),
+            "last_updated": "2025-01-01T00:00:00"
+        } for i in range(n)]
+
+    def timed(fn):
+        start = time.perf_counter()
+        result = fn()
+        return result, time.perf_counter() - start
+
+    def stdlib_default(obj):
+        return obj.item() if isinstance(obj, np.generic) else str(obj)
+
+    print("\n" + "="*60)
+    print("LAYER SERIALIZATION BENCHMARK")
+    print("="*60 + "\n")
+    print(f"{'features':>10} | {'json (s)':>9} | {'orjson (s)':>10} | {'raw MB':>7} | "
+          f"{'gzip MB':>7} | {'br MB':>7} | {'indent=2 MB':>11}")
+
+    n = 10_000
+    while n <= max_features:
+        payload = {"zones": synthetic_features(n), "count": n}
+        _, stdlib_seconds = timed(lambda: json.dumps(payload, default=stdlib_default).encode())
+        fast, fast_seconds = timed(lambda: dumps(payload))
+        indented = json.dumps(payload, indent=2, default=stdlib_default).encode()
+        gzipped = gzip.compress(fast, compresslevel=GZIP_LEVEL)
+        brotli_size = "-"
+        if BROTLI_AVAILABLE:
+            import brotli
+            brotli_size = f"{len(brotli.compress(fast, quality=BROTLI_QUALITY)) / 1e6:.2f}"
+        print(f"{n:>10,} | {stdlib_seconds:>9.3f} | {fast_seconds:>10.3f} | {len(fast) / 1e6:>7.2f} | "
+              f"{len(gzipped) / 1e6:>7.2f} | {brotli_size:>7} | {len(indented) / 1e6:>11.2f}")
+        n *= 10
@@ -0,0 +1,149 @@
+"""
+Versioned endpoint snapshots
+Pre-serialized GET payloads with ETags so polling clients can be answered with 304
+"""
+
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from serialization import dumps
+
+def _empty_metrics() -> Dict:
+    return {"requests": 0, "not_modified": 0, "bytes_sent": 0, "bytes_saved": 0}
+
+class Snapshot:
+    """One version of an endpoint payload, serialized once when it is published"""
+
+    def __init__(self, version: int, digest: str, payload: Dict, body: bytes, max_variants: int):
+        self.version = version
+        self.digest = digest
+        self.payload = payload
+        self.body = body
+        self.created = time.time()
+        # Weak: the compression middleware serves brotli, gzip and identity bodies under one tag
+        self.etag = f'W/"{digest}"'
+        self.max_variants = max_variants
+        # Filtered (e.g. bbox) bodies derived from this version, most recent last
+        self._variants: "OrderedDict[str, bytes]" = OrderedDict()
+        # ETag -> bytes last sent on the wire for it (after compression)
+        self._wire_sizes: "OrderedDict[str, int]" = OrderedDict()
+
+    def variant_etag(self, key: str) -> str:
+        """ETag of a filtered view - changes whenever the snapshot or the filter does"""
+        key_digest = hashlib.blake2b(key.encode(), digest_size=4).hexdigest()
+        return f'W/"{self.digest}-{key_digest}"'
+
+    def get_variant(self, key: str) -> Optional[bytes]:
+        body = self._variants.get(key)
+        if body is not None:
+            self._variants.move_to_end(key)
+        return body
+
+    def put_variant(self, key: str, body: bytes):
+        self._variants[key] = body
+        self._variants.move_to_end(key)
+        while len(self._variants) > self.max_variants:
+            self._variants.popitem(last=False)
+
+    def wire_size(self, etag: str) -> Optional[int]:
+        return self._wire_sizes.get(etag)
+
+    def set_wire_size(self, etag: str, size: int):
+        self._wire_sizes[etag] = size
+        self._wire_sizes.move_to_end(etag)
+        while len(self._wire_sizes) > self.max_variants + 1:
+            self._wire_sizes.popitem(last=False)
+
+class SnapshotStore:
+    """Latest snapshot per endpoint plus conditional-request counters"""
+
+    def __init__(self, max_variants: int = 64):
+        """
+        Args:
+            max_variants: Filtered bodies cached per snapshot version
+        """
+        self.max_variants = max_variants
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._metrics: Dict[str, Dict] = {}
+
+    def put(self, name: str, payload: Dict, ignore: Iterable[str] = ()) -> Snapshot:
+        """
+        Publish a payload, bumping the version only if its content changed
+
+        Args:
+            name: Endpoint name (e.g. "disaster-zones")
+            payload: Response dict
+            ignore: Volatile top-level keys (timestamps) left out of the change check
+
+        Returns:
+            The current snapshot (the previous one if nothing changed)
+        """
+        ignore = set(ignore)
+        stable = {key: value for key, value in payload.items() if key not in ignore}
+        digest = hashlib.blake2b(dumps(stable), digest_size=12).hexdigest()
+
+        current = self._snapshots.get(name)
+        if current and current.digest == digest:
+            return current
+
+        version = current.version + 1 if current else 1
+        snapshot = Snapshot(version, digest, payload, dumps(payload), self.max_variants)
+        self._snapshots[name] = snapshot
+        return snapshot
+
+    def get(self, name: str) -> Optional[Snapshot]:
+        return self._snapshots.get(name)
+
+    def record(self, name: str, not_modified: bool, body_size: Optional[int] = None):
+        """
+        Count one request
+
+        Args:
+            name: Endpoint name
+            not_modified: Whether it was answered with 304
+            body_size: For a 304, bytes of the body it avoided (None if unknown); bodies
+                       that are sent are counted by record_sent once they are on the wire
+        """
+        metrics = self._metrics.setdefault(name, _empty_metrics())
+        metrics["requests"] += 1
+        if not_modified:
+            metrics["not_modified"] += 1
+            metrics["bytes_saved"] += body_size or 0
+
+    def record_sent(self, name: str, snapshot: Snapshot, etag: str, size: int):
+        """Count the bytes of a body as sent (compressed, if it was)"""
+        metrics = self._metrics.setdefault(name, _empty_metrics())
+        metrics["bytes_sent"] += size
+        snapshot.set_wire_size(etag, size)
+
+    def stats(self) -> Dict:
+        """Per-endpoint 304 ratio and bytes sent vs. avoided (as sent on the wire)"""
+        result = {}
+        for name in sorted(set(self._snapshots) | set(self._metrics)):
+            metrics = self._metrics.get(name) or _empty_metrics()
+            snapshot = self._snapshots.get(name)
+            result[name] = {
+                **metrics,
+                "not_modified_ratio": round(metrics["not_modified"] / metrics["requests"], 3)
+                if metrics["requests"] else 0.0,
+                "version": snapshot.version if snapshot else None,
+                "etag": snapshot.etag if snapshot else None
+            }
+        return result
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for this header)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
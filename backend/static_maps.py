@@ -0,0 +1,146 @@
+"""
+Static map rendering for reports
+Severity-colored markers over a Web Mercator basemap built from local or HERE z/x/y tiles
+"""
+
+import os
+from collections import OrderedDict
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw
+
+from tiles import lonlat_to_pixel, mosaic
+
+MAX_ZOOM = 17
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tile_cache")
+
+def fit_zoom(points: List[Tuple[float, float]], width: int, height: int, padding: int = 40,
+             max_zoom: int = MAX_ZOOM) -> int:
+    """Highest zoom at which all (lon, lat) points fit inside the image"""
+    if len(points) < 2:
+        return min(14, max_zoom)
+    for zoom in range(max_zoom, 0, -1):
+        xs, ys = zip(*(lonlat_to_pixel(lon, lat, zoom) for lon, lat in points))
+        if max(xs) - min(xs) <= width - 2 * padding and max(ys) - min(ys) <= height - 2 * padding:
+            return zoom
+    return 1
+
+class StaticMapRenderer:
+    """Renders marker maps; decoded basemap tiles and images are kept in an in-memory LRU"""
+
+    def __init__(self, image_service=None, cache_dir: str = DEFAULT_CACHE_DIR,
+                 offline: bool = False, style: str = "normal.day", memory_items: int = 256):
+        """
+        Args:
+            image_service: HEREImageService whose tiles are used when local tiles don't cover a map
+            cache_dir: Local tiles (tiles/<style>/<z>/<x>/<y>.png)
+            offline: Never fetch - use local tiles if present, otherwise a blank basemap
+            style: Basemap style (HERE map type)
+            memory_items: Decoded tiles/images kept in memory
+        """
+        self.image_service = image_service
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.style = style
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, Image.Image]" = OrderedDict()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "fetches": 0, "blank": 0}
+
+    def render(self, records: List[Dict], color_for: Callable[[Dict], str],
+               width: int = 1080, height: int = 560) -> Optional[bytes]:
+        """
+        Render records as markers over a basemap
+
+        Args:
+            records: Records with a "coordinates" dict
+            color_for: Marker color (hex) for a record
+            width: Image width in pixels
+            height: Image height in pixels
+
+        Returns:
+            PNG bytes, or None when no record has coordinates
+        """
+        located = [r for r in records if r.get('coordinates') and r['coordinates'].get('lat') is not None]
+        if not located:
+            return None
+
+        points = [(r['coordinates']['lon'], r['coordinates']['lat']) for r in located]
+        zoom = fit_zoom(points, width, height)
+        xs, ys = zip(*(lonlat_to_pixel(lon, lat, zoom) for lon, lat in points))
+        center_x, center_y = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+        left, top = center_x - width / 2, center_y - height / 2
+
+        image = self._basemap(left, top, zoom, width, height).convert("RGB")
+        draw = ImageDraw.Draw(image)
+        radius = 7 if len(located) < 200 else 4
+        for record, x, y in zip(located, xs, ys):
+            px, py = x - left, y - top
+            draw.ellipse(
+                [px - radius, py - radius, px + radius, py + radius],
+                fill=color_for(record), outline="white", width=2 if radius > 4 else 1
+            )
+
+        buffer = BytesIO()
+        image.save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue()
+
+    def _basemap(self, left: float, top: float, zoom: int, width: int, height: int) -> Image.Image:
+        """Local tile mosaic, else a mosaic of HERE tiles, else a blank map"""
+        basemap = mosaic(left, top, zoom, width, height, self._local_tile)
+        if basemap is None and not self.offline and self.image_service and self.image_service.is_configured():
+            basemap = mosaic(left, top, zoom, width, height, self._service_tile)
+        if basemap is not None:
+            return basemap
+        self.stats["blank"] += 1
+        return self._blank(width, height)
+
+    def _local_tile(self, zoom: int, x: int, y: int) -> Optional[Image.Image]:
+        key = f"tile/{self.style}/{zoom}/{x}/{y}"
+        tile = self._from_memory(key)
+        if tile is not None:
+            return tile
+        path = os.path.join(self.cache_dir, "tiles", self.style, str(zoom), str(x), f"{y}.png")
+        if not os.path.exists(path):
+            return None
+        tile = Image.open(path).convert("RGB")
+        self.stats["disk_hits"] += 1
+        self._to_memory(key, tile)
+        return tile
+
+    def _service_tile(self, zoom: int, x: int, y: int) -> Optional[Image.Image]:
+        """HERE tile (the service caches the bytes across processes)"""
+        key = f"here/{self.style}/{zoom}/{x}/{y}"
+        tile = self._from_memory(key)
+        if tile is not None:
+            return tile
+        data = self.image_service.get_tile(zoom, x, y, map_type=self.style)
+        if data is None:
+            return None
+        self.stats["fetches"] += 1
+        tile = Image.open(BytesIO(data)).convert("RGB")
+        self._to_memory(key, tile)
+        return tile
+
+    @staticmethod
+    def _blank(width: int, height: int) -> Image.Image:
+        """Offline basemap: light background with a faint grid"""
+        image = Image.new("RGB", (width, height), color=(241, 245, 249))
+        draw = ImageDraw.Draw(image)
+        for x in range(0, width, 64):
+            draw.line([(x, 0), (x, height)], fill=(226, 232, 240), width=1)
+        for y in range(0, height, 64):
+            draw.line([(0, y), (width, y)], fill=(226, 232, 240), width=1)
+        return image
+
+    def _from_memory(self, key: str) -> Optional[Image.Image]:
+        image = self._memory.get(key)
+        if image is not None:
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+        return image
+
+    def _to_memory(self, key: str, image: Image.Image):
+        self._memory[key] = image
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
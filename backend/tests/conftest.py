@@ -0,0 +1,47 @@
+"""
+Shared fixtures
+Tests needing PostGIS run against DATABASE_URL and are skipped when it can't be reached
+"""
+
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+@pytest.fixture(scope="session")
+def postgis():
+    """Sync engine on a PostGIS database with the schema and today's partitions"""
+    from sqlalchemy import text
+    from database import Base, engine
+    from partitions import ensure_partitions
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS postgis"))
+            conn.commit()
+    except Exception as e:
+        pytest.skip(f"PostGIS not available: {e}")
+
+    Base.metadata.create_all(bind=engine)
+    ensure_partitions(days_ahead=1, days_back=1)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def async_engine(postgis):
+    """Unpooled async engine (each test runs its own event loop)"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+    from database import ASYNC_DATABASE_URL
+
+    engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+    yield engine
+    engine.sync_engine.dispose()
+
+@pytest.fixture
+def session_factory(async_engine):
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    return async_sessionmaker(async_engine, expire_on_commit=False)
@@ -0,0 +1,66 @@
+"""Reference-to-upload registration on synthetically moved imagery"""
+
+import os
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from change_detection import _plausible, align_images, change_metrics
+
+IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_images")
+
+def load(name: str) -> np.ndarray:
+    return np.array(Image.open(os.path.join(IMAGES, name)).convert("RGB"))
+
+def corner_error(homography: np.ndarray, expected: np.ndarray, width: int, height: int) -> float:
+    """Largest distance between where two homographies send the image corners"""
+    corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]]).reshape(-1, 1, 2)
+    return float(np.abs(cv2.perspectiveTransform(corners, homography)
+                        - cv2.perspectiveTransform(corners, expected)).max())
+
+@pytest.mark.parametrize("angle, scale, shift", [
+    (0.0, 1.0, (18, -11)),
+    (3.0, 1.02, (25, -15)),
+    (-6.0, 0.95, (-30, 20)),
+])
+def test_recovers_known_transform(angle, scale, shift):
+    reference = load("normal_mumbai_reference.jpg")
+    height, width = reference.shape[:2]
+    affine = cv2.getRotationMatrix2D((width / 2, height / 2), angle, scale)
+    affine[:, 2] += shift
+    target = cv2.warpAffine(reference, affine, (width, height))
+
+    warped, overlap, info = align_images(reference, target)
+
+    assert info["aligned"] and info["refined"]
+    expected = np.vstack([affine, [0, 0, 1]])
+    assert corner_error(np.array(info["homography"]), expected, width, height) < 1.5
+    # Registered imagery no longer reads as changed
+    assert change_metrics(target, warped, mask=overlap)["change_percentage"] < 0.5 * \
+        change_metrics(target, reference)["change_percentage"]
+
+def test_unrelated_images_are_not_aligned():
+    reference = load("mumbai_flood.jpg")
+    target = load("wildfire.jpg")
+    reference = cv2.resize(reference, (target.shape[1], target.shape[0]))
+    warped, overlap, info = align_images(reference, target)
+    assert warped is None and overlap is None and not info["aligned"]
+
+def test_featureless_image_is_not_aligned():
+    flat = np.full((256, 256, 3), 128, np.uint8)
+    assert align_images(flat, flat)[0] is None
+
+@pytest.mark.parametrize("homography, plausible", [
+    (np.eye(3), True),
+    (np.array([[1.1, 0.05, 12], [-0.05, 1.1, -4], [1e-4, 0, 1]]), True),
+    (np.diag([-1.0, 1.0, 1.0]), False),                        # mirrored
+    (np.diag([0.1, 0.1, 1.0]), False),                         # collapsed
+    (np.diag([3.0, 3.0, 1.0]), False),                         # blown up
+    (np.array([[1, 0, 0], [0, 1, 0], [0.01, 0, 1.0]]), False),  # extreme perspective
+    (np.array([[1, 0, 0], [0, 1, 0], [0, -0.01, 1.0]]), False),
+    (np.zeros((3, 3)), False),
+])
+def test_plausible_rejects_degenerate_fits(homography, plausible):
+    assert _plausible(homography) == plausible
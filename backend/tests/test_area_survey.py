@@ -0,0 +1,100 @@
+"""AreaSurvey.run: per-cell failures, bounded task creation and cancellation on disconnect"""
+
+import asyncio
+import threading
+import time
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from area_survey import AreaSurvey
+
+def png(size):
+    buffer = BytesIO()
+    Image.new("RGB", size, (90, 120, 60)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+class FakeImageService:
+    """Reference windows from memory, counting calls and the most fetched at once"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def get_reference_png(self, lat, lon, zoom, width, height, style):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return {"png": png((width, height)), "cached": False}
+
+@pytest.fixture
+def surveyor():
+    surveys = []
+
+    def build(service, **kwargs):
+        survey = AreaSurvey(service, workers=1, align=False, **kwargs)
+        surveys.append(survey)
+        return survey
+
+    yield build
+    for survey in surveys:
+        survey.shutdown()
+
+def collect(survey, grid, source):
+    async def run():
+        return [event async for event in survey.run(grid, source)]
+    return asyncio.run(run())
+
+def test_failing_cell_is_reported_and_others_finish(surveyor):
+    survey = surveyor(FakeImageService(), fetch_concurrency=2)
+    grid = survey.grid(19.0, 72.8, 19.01, 72.81, 16, cell_px=128)
+    broken = grid["cells"][1]["id"]
+
+    def source(cell):
+        if cell["id"] == broken:
+            raise OSError("truncated tile")
+        return np.full((cell["height"], cell["width"], 3), 100, dtype=np.uint8)
+
+    events = collect(survey, grid, source)
+
+    cells = {event["id"]: event for event in events if event["type"] == "cell"}
+    assert len(cells) == len(grid["cells"])
+    assert cells[broken]["status"] == "error"
+    assert "truncated tile" in cells[broken]["error"]
+    assert all(cell["status"] == "done" for cell_id, cell in cells.items() if cell_id != broken)
+    ranking = events[-1]
+    assert ranking["type"] == "ranking"
+    assert (ranking["surveyed"], ranking["skipped"]) == (len(grid["cells"]) - 1, 1)
+
+def test_disconnect_cancels_remaining_cells(surveyor):
+    service = FakeImageService(delay=0.05)
+    survey = surveyor(service, fetch_concurrency=2, max_cells=1024)
+    grid = survey.grid(19.0, 72.8, 19.05, 72.85, 16, cell_px=128)
+    assert len(grid["cells"]) > 100
+
+    async def first_cell_then_disconnect():
+        events = survey.run(grid, lambda cell: None)
+        async for event in events:
+            if event["type"] == "cell":
+                break
+        await events.aclose()
+        calls = service.calls
+        await asyncio.sleep(0.3)
+        return calls
+
+    calls = asyncio.run(first_cell_then_disconnect())
+
+    # Only a window of cells was ever started, fetches stayed within the limit,
+    # and nothing new started after the client went away
+    assert calls <= 2 + 2 * survey.workers + 1
+    assert service.peak <= 2
+    assert service.calls == calls
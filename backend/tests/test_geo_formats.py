@@ -0,0 +1,91 @@
+"""Columnar layer exports: column naming, GeoParquet and FlatGeobuf round trips with bbox reads"""
+
+import json
+import struct
+
+import pytest
+
+from geo_formats import (
+    PYARROW_AVAILABLE, PYOGRIO_AVAILABLE, feature_table, read_flatgeobuf_bbox, read_geoparquet_bbox,
+    write_flatgeobuf, write_geoparquet
+)
+
+pytestmark = pytest.mark.skipif(not PYARROW_AVAILABLE, reason="pyarrow not installed")
+
+def test_properties_never_overwrite_generated_columns():
+    records = [
+        {"id": "a", "coordinates": {"lat": 19.0, "lon": 72.8}, "lat": "north", "geometry": "polygon",
+         "bbox": [1, 2, 3, 4], "prop_lat": "taken"},
+        {"id": "b", "coordinates": None, "lon": 5},
+    ]
+    table = feature_table(records).to_pylist()
+
+    assert table[0]["lat"] == 19.0 and table[0]["lon"] == 72.8
+    assert table[0]["geometry"] is not None and table[1]["geometry"] is None
+    assert table[0]["prop_geometry"] == "polygon"
+    assert table[1]["prop_lon"] == 5
+    # A prefixed name that is itself a property is prefixed again
+    assert table[0]["prop_lat"] == "taken"
+    assert table[0]["prop_prop_lat"] == "north"
+    assert "prop_bbox" in table[0]
+
+# Mumbai-area grid of zones, one record without coordinates
+RECORDS = [
+    {"id": f"z{row}-{column}", "coordinates": {"lat": 18.9 + row * 0.05, "lon": 72.75 + column * 0.05},
+     "severity": ["low", "medium", "high", "critical"][(row + column) % 4], "damage_score": row * 0.1,
+     "affected_area_km2": column + 1, "verified": row % 2 == 0, "details": {"row": row}}
+    for row in range(6) for column in range(6)
+] + [{"id": "nowhere", "coordinates": None, "severity": "low"}]
+# Covers rows 1-2 and columns 2-3
+BBOX = (72.84, 18.94, 72.91, 19.01)
+
+def expected_ids(bbox):
+    west, south, east, north = bbox
+    return sorted(
+        record["id"] for record in RECORDS if record["coordinates"]
+        and west <= record["coordinates"]["lon"] <= east and south <= record["coordinates"]["lat"] <= north
+    )
+
+def test_geoparquet_round_trip(tmp_path):
+    import pyarrow.parquet as pq
+
+    path = str(tmp_path / "zones.parquet")
+    write_geoparquet(feature_table(RECORDS), path, row_group_size=8)
+
+    geo = json.loads(pq.read_schema(path).metadata[b"geo"])
+    assert geo["version"] == "1.1.0" and geo["primary_column"] == "geometry"
+    column = geo["columns"]["geometry"]
+    assert column["encoding"] == "WKB" and column["geometry_types"] == ["Point"]
+    assert column["bbox"] == pytest.approx([72.75, 18.9, 73.0, 19.15])
+    assert column["covering"]["bbox"]["xmin"] == ["bbox", "xmin"]
+    assert pq.ParquetFile(path).metadata.num_row_groups == 5
+
+    table = read_geoparquet_bbox(path, BBOX)
+    rows = {row["id"]: row for row in table.to_pylist()}
+    assert sorted(rows) == expected_ids(BBOX) == ["z1-2", "z1-3", "z2-2", "z2-3"]
+    row = rows["z2-3"]
+    assert struct.unpack("<BIdd", row["geometry"])[2:] == pytest.approx((72.9, 19.0))
+    assert (row["lon"], row["lat"]) == pytest.approx((72.9, 19.0))
+    assert row["bbox"] == pytest.approx({"xmin": 72.9, "ymin": 19.0, "xmax": 72.9, "ymax": 19.0})
+    assert (row["severity"], row["affected_area_km2"], row["verified"]) == ("medium", 4, True)
+    assert json.loads(row["details"]) == {"row": 2}
+
+    # Everything, including the record without a location, is in the file
+    assert pq.read_table(path).num_rows == len(RECORDS)
+
+@pytest.mark.skipif(not PYOGRIO_AVAILABLE, reason="pyogrio not installed")
+def test_flatgeobuf_round_trip(tmp_path):
+    import pyogrio
+
+    path = str(tmp_path / "zones.fgb")
+    write_flatgeobuf(feature_table(RECORDS), path, "zones")
+
+    info = pyogrio.read_info(path)
+    assert info["features"] == len(RECORDS) - 1
+    assert info["geometry_type"] == "Point"
+    assert info["crs"] == "EPSG:4326"
+    assert info["capabilities"]["fast_spatial_filter"]
+
+    rows = {row["id"]: row for row in read_flatgeobuf_bbox(path, BBOX).to_pylist()}
+    assert sorted(rows) == expected_ids(BBOX)
+    assert rows["z1-2"]["severity"] == "critical"
@@ -0,0 +1,76 @@
+"""HEREService geocoding: blank addresses refused, batches resolved concurrently with a safety deadline"""
+
+import time
+
+import pytest
+
+from image_cache import BlobCache
+from here_service import HEREService
+from rate_limiter import RateLimiter
+
+@pytest.fixture
+def service():
+    service = HEREService()
+    service.api_key = "test"
+    service._geocode_cache = BlobCache(path=None, table="geocode")
+    service.lookups = []
+
+    def fake_geocode(address):
+        service.lookups.append(address)
+        return {"lat": 19.07, "lon": 72.87, "address": address}
+
+    service._geocode = fake_geocode
+    return service
+
+@pytest.mark.parametrize("address", ["", "   ", " , . ", None])
+def test_blank_address_is_invalid(service, address):
+    result = service.geocode(address)
+    assert result["status"] == "invalid"
+    assert service.lookups == []
+    assert service._geocode_cache.metrics["writes"] == 0
+
+def test_batch_marks_blank_addresses_invalid(service):
+    result = service.geocode_batch(["Andheri East", " ", None, "andheri  east!"])
+    statuses = [entry.get("status") for entry in result["results"]]
+    assert statuses == [None, "invalid", "invalid", None]
+    assert service.lookups == ["Andheri East"]
+
+def test_cold_batch_resolves_in_one_call_within_the_budget(service):
+    service.limiter = RateLimiter(key_rate=1000, key_burst=50, budgets={"geocode": (1000, 50)})
+    lookup = service._geocode
+
+    def paced_geocode(address):
+        service.limiter.acquire_sync(service.api_key, "geocode")
+        return lookup(address)
+
+    service._geocode = paced_geocode
+    addresses = [f"Street {i % 300}" for i in range(1000)]
+
+    result = service.geocode_batch(addresses, concurrency=8)
+
+    assert (result["count"], result["unique"], result["resolved"], result["deferred"]) == (1000, 300, 300, 0)
+    assert sorted(service.lookups) == sorted(set(addresses))
+    assert [entry["query"] for entry in result["results"]] == addresses
+    assert all(entry["address"] == entry["query"] for entry in result["results"])
+    assert service.limiter.stats()["endpoints"]["geocode"]["requests"] == 300
+
+def test_batch_defers_lookups_not_started_by_the_deadline(service):
+    lookup = service._geocode
+
+    def slow_geocode(address):
+        time.sleep(0.05)
+        return lookup(address)
+
+    service._geocode = slow_geocode
+    addresses = [f"Street {i}" for i in range(20)]
+    first = service.geocode_batch(addresses, concurrency=2, deadline_seconds=0.12)
+
+    statuses = [entry.get("status") for entry in first["results"]]
+    done = statuses.count(None)
+    assert 0 < done < 20 and first["deferred"] == 20 - done
+    # Queued in input order, so the deferred ones are the tail
+    assert statuses == [None] * done + ["deferred"] * (20 - done)
+
+    second = service.geocode_batch(addresses, concurrency=8)
+    assert (second["cached"], second["resolved"], second["deferred"]) == (done, 20, 0)
+    assert sorted(service.lookups) == sorted(addresses)
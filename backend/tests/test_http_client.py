@@ -0,0 +1,108 @@
+"""Pooled HTTP client and HEREService._get against a local stub server"""
+
+import http.server
+import json
+import threading
+
+import pytest
+
+import http_client
+from http_client import HTTPClient
+from here_service import HEREService
+from rate_limiter import RateLimitedError, RateLimiter
+
+@pytest.fixture
+def stub():
+    """Server answering with the queued (status, headers) responses, then 200s"""
+    state = {"script": [], "requests": 0}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["requests"] += 1
+            status, headers = state["script"].pop(0) if state["script"] else (200, {})
+            body = json.dumps({"status": status}).encode()
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def client():
+    client = HTTPClient(pool_size=2, retries=3, backoff=0.01)
+    client.session.trust_env = False  # no proxies from the environment
+    yield client
+    client.close()
+
+@pytest.fixture
+def service(stub, client):
+    service = HEREService()
+    service.api_key = "test"
+    service.http = client
+    service.limiter = RateLimiter(1000, 1000, {}, default_budget=(1000, 1000))
+    return service
+
+def test_5xx_is_retried_with_backoff(stub, client):
+    stub["script"] = [(503, {}), (502, {})]
+    response = client.get("geocode", f"{stub['url']}/geocode")
+
+    assert response.status_code == 200
+    assert stub["requests"] == 3
+    stats = client.stats()["geocode"]
+    assert (stats["calls"], stats["retries"], stats["failed"]) == (1, 2, 0)
+
+def test_persistent_5xx_counts_as_failed(stub, client):
+    stub["script"] = [(500, {})] * 4
+    response = client.get("routes", f"{stub['url']}/routes")
+
+    assert response.status_code == 500
+    assert stub["requests"] == 4
+    stats = client.stats()["routes"]
+    assert (stats["retries"], stats["failed"]) == (3, 1)
+
+def test_429_is_left_to_the_limiter(stub, client):
+    stub["script"] = [(429, {"Retry-After": "0"})]
+    response = client.get("tiles", f"{stub['url']}/tile")
+
+    assert response.status_code == 429
+    assert stub["requests"] == 1
+
+def test_short_retry_after_is_waited_out(stub, service):
+    stub["script"] = [(429, {"Retry-After": "0"})]
+    response = service._get("geocode", f"{stub['url']}/geocode", {}, timeout=5)
+
+    assert response.status_code == 200
+    assert stub["requests"] == 2
+    limiter = service.limiter.stats()
+    assert limiter["endpoints"]["geocode"]["throttled"] == 1
+    assert limiter["endpoints"]["geocode"]["requests"] == 2
+
+def test_long_retry_after_raises(stub, service):
+    stub["script"] = [(429, {"Retry-After": "120"})]
+    with pytest.raises(RateLimitedError) as error:
+        service._get("geocode", f"{stub['url']}/geocode", {}, timeout=5)
+
+    assert error.value.retry_after == pytest.approx(120)
+    assert error.value.as_result()["status"] == "rate_limited"
+    assert stub["requests"] == 1
+
+def test_session_is_rebuilt_after_fork(client, monkeypatch):
+    parent = client.session
+    assert client.session is parent
+
+    monkeypatch.setattr(http_client.os, "getpid", lambda: -1)
+    child = client.session
+    assert child is not parent
+    assert client.session is child
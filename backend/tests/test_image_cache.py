@@ -0,0 +1,108 @@
+"""BlobCache tiers: size bounds, running disk totals, per-entry expiry and lock independence"""
+
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from image_cache import DISK_EVICT_TARGET, BlobCache, ImageCache
+
+def disk_totals(path):
+    with sqlite3.connect(path) as connection:
+        return tuple(connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM images").fetchone())
+
+def test_disk_tier_stays_within_budget(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ImageCache(path=path, memory_bytes=20_000, disk_bytes=100_000)
+    for i in range(60):
+        cache.put(f"k{i}", os.urandom(5_000))
+        # Replacing a key must not double-count it
+        cache.put(f"k{i}", os.urandom(4_000))
+
+    entries, size = disk_totals(path)
+    assert size <= 100_000
+    stats = cache.stats()
+    assert (stats["disk_entries"], stats["disk_bytes"]) == (entries, size)
+    assert stats["memory_bytes"] <= 20_000
+    # Oldest keys evicted first, newest still served from disk after the memory tier drops them
+    assert cache.get("k0") is None
+    assert len(cache.get("k59")) == 4_000
+    assert size >= 100_000 * DISK_EVICT_TARGET - 4_000
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ImageCache(path=str(tmp_path / "cache.sqlite"), ttl_seconds=60)
+    cache.put("short", b"x", ttl_seconds=0.05)
+    cache.put("long", b"y")
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    assert cache.get("long") == b"y"
+    assert cache.metrics["expired"] == 1
+
+def test_entries_keep_their_own_expiry(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = BlobCache(path=path, ttl_seconds=0.05, table="geocode")
+    cache.put("default", b"x")
+    cache.put("longer", b"y", ttl_seconds=3600)
+    time.sleep(0.1)
+    assert cache.get("default") is None
+    # A fresh process (empty memory tier) reads the expiry from disk
+    assert BlobCache(path=path, ttl_seconds=0.05, table="geocode").get("longer") == b"y"
+    with sqlite3.connect(path) as connection:
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        expires_at = connection.execute("SELECT expires_at FROM geocode WHERE key = 'longer'").fetchone()[0]
+    assert tables == {"geocode"}
+    assert 3500 < expires_at - time.time() <= 3600
+
+def test_caches_share_a_file_in_separate_tables(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    images, geocodes = ImageCache(path=path), BlobCache(path=path, table="geocode")
+    images.put("k", b"png")
+    geocodes.put("k", b"{}")
+    assert (images.get("k"), geocodes.get("k")) == (b"png", b"{}")
+    assert images.stats()["disk_entries"] == geocodes.stats()["disk_entries"] == 1
+    with pytest.raises(ValueError):
+        BlobCache(path=path, table="images; DROP TABLE images")
+
+def test_tables_without_expiry_column_are_rebuilt(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE images (key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, "
+                           "created REAL NOT NULL, accessed REAL NOT NULL)")
+        connection.execute("INSERT INTO images VALUES ('old', x'00', 1, 0, 0)")
+    cache = ImageCache(path=path)
+    assert cache.get("old") is None
+    cache.put("new", b"data")
+    assert cache.get("new") == b"data"
+
+def test_memory_hits_do_not_wait_for_disk(tmp_path):
+    cache = ImageCache(path=str(tmp_path / "cache.sqlite"))
+    cache.put("hot", b"data")
+    result = []
+    with cache._disk_lock:
+        reader = threading.Thread(target=lambda: result.append(cache.get("hot")))
+        reader.start()
+        reader.join(timeout=2)
+    assert result == [b"data"]
+
+def test_disk_errors_while_expiring_are_misses(tmp_path):
+    cache = ImageCache(path=str(tmp_path / "cache.sqlite"), memory_bytes=0)
+    cache.put("stale", b"x", ttl_seconds=0.01)
+    time.sleep(0.05)
+
+    class FailingDeletes:
+        def __init__(self, connection):
+            self.connection = connection
+
+        def execute(self, sql, *args):
+            if sql.startswith("DELETE"):
+                raise sqlite3.OperationalError("database is locked")
+            return self.connection.execute(sql, *args)
+
+        def __getattr__(self, name):
+            return getattr(self.connection, name)
+
+    cache._connection = FailingDeletes(cache._connection)
+    assert cache.get("stale") is None
+    assert cache.metrics["expired"] == 1
@@ -0,0 +1,39 @@
+"""LayerBroadcaster diffs and their SSE encoding"""
+
+import asyncio
+from datetime import datetime
+
+import numpy as np
+
+from layer_stream import LayerBroadcaster
+from serialization import loads
+
+def parse(message: bytes):
+    fields = dict(line.split(": ", 1) for line in message.decode().strip().split("\n"))
+    return fields["event"], fields["id"], loads(fields["data"])
+
+def test_snapshot_then_coalesced_delta():
+    broadcaster = LayerBroadcaster(coalesce_window=0)
+    broadcaster.publish("zones", [{"id": 1, "level": 1}, {"id": 2, "level": 1}])
+
+    async def run():
+        subscription = broadcaster.subscribe(["zones"])
+        events = broadcaster.events(subscription)
+        assert await events.__anext__() == b"retry: 3000\n\n"
+        snapshot = parse(await events.__anext__())
+        # Two publishes before the client reads - delivered as one delta
+        broadcaster.publish("zones", [{"id": 1, "level": 2}, {"id": 3, "level": 1}])
+        broadcaster.publish("zones", [{"id": 1, "level": 3, "seen": datetime(2026, 1, 1), "score": np.float32(0.5)},
+                                      {"id": 3, "level": 1}])
+        delta = parse(await events.__anext__())
+        broadcaster.unsubscribe(subscription)
+        return snapshot, delta
+
+    (snapshot_type, _, snapshot), (delta_type, delta_id, delta) = asyncio.run(run())
+    assert snapshot_type == "snapshot"
+    assert [record["id"] for record in snapshot["records"]] == [1, 2]
+    assert delta_type == "delta"
+    assert delta_id == f"{broadcaster.stream_id}:3"
+    assert delta["added"] == [{"id": 3, "level": 1}]
+    assert delta["updated"] == [{"id": 1, "level": 3, "seen": "2026-01-01T00:00:00", "score": 0.5}]
+    assert delta["removed"] == ["2"]
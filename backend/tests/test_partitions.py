@@ -0,0 +1,50 @@
+"""Daily partition DDL and the query plans of the partitioned layer queries"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from partitions import (
+    PARTITIONED_TABLES, PLAN_CHECKS, check_query_plans,
+    create_partition_sql, partition_name
+)
+
+def test_partition_covers_one_day():
+    assert partition_name("alerts", date(2026, 1, 31)) == "alerts_p20260131"
+    assert create_partition_sql("alerts", date(2026, 1, 31)) == (
+        "CREATE TABLE IF NOT EXISTS alerts_p20260131 PARTITION OF alerts "
+        "FOR VALUES FROM ('2026-01-31') TO ('2026-02-01')"
+    )
+
+@pytest.fixture(scope="module")
+def plans(postgis):
+    return check_query_plans(bind=postgis)
+
+@pytest.mark.parametrize("index_name", list(PLAN_CHECKS))
+def test_layer_query_uses_index(plans, index_name):
+    assert plans[index_name], f"{index_name} not used by: {PLAN_CHECKS[index_name][0]}"
+
+def explain(bind, query: str) -> str:
+    with bind.connect() as conn:
+        conn.execute(text("SET enable_seqscan = off"))
+        return "\n".join(conn.execute(text(f"EXPLAIN {query}")).scalars().all())
+
+@pytest.mark.parametrize("table", PARTITIONED_TABLES)
+def test_time_window_prunes_to_one_partition(postgis, table):
+    today = datetime.utcnow().date()
+    plan = explain(postgis, f"SELECT id FROM {table} "
+                            f"WHERE timestamp >= '{today}' AND timestamp < '{today + timedelta(days=1)}'")
+    assert partition_name(table, today) in plan
+    assert partition_name(table, today - timedelta(days=1)) not in plan
+    assert f"{table}_default" not in plan
+    # BRIN on the partition's timestamp column
+    assert f"{partition_name(table, today)}_timestamp_idx" in plan
+
+def test_bbox_and_time_window_use_gist_on_the_pruned_partition(postgis):
+    today = datetime.utcnow().date()
+    plan = explain(postgis, "SELECT id FROM alerts "
+                            "WHERE ST_Intersects(location, ST_MakeEnvelope(72.8, 18.9, 73.0, 19.2, 4326)) "
+                            f"AND timestamp >= '{today}' AND timestamp < '{today + timedelta(days=1)}'")
+    assert f"{partition_name('alerts', today)}_location_idx" in plan
+    assert partition_name("alerts", today - timedelta(days=1)) not in plan
@@ -0,0 +1,111 @@
+"""Token buckets: burst and refill, per-key vs per-endpoint budgets, 429 backoff and recovery"""
+
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimiter, TokenBucket, retry_after_seconds
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    return clock
+
+def response(status, retry_after=None):
+    return SimpleNamespace(status_code=status, headers={"Retry-After": retry_after} if retry_after else {})
+
+def test_burst_then_refill(clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    assert [bucket.reserve() for _ in range(5)] == [0.0] * 5
+    # Past the burst, callers queue 1/rate apart
+    assert [bucket.reserve() for _ in range(3)] == pytest.approx([0.1, 0.2, 0.3])
+
+    clock.now += 1.0
+    # 10 tokens refilled, 3 owed, capped at the burst
+    assert bucket.reserve() == 0.0
+    assert bucket.tokens == pytest.approx(4.0)
+
+    clock.now += 60
+    bucket.reserve()
+    assert bucket.tokens == pytest.approx(4.0)
+
+def test_endpoint_budget_within_key_budget(clock):
+    limiter = RateLimiter(key_rate=4, key_burst=4, budgets={"isolines": (1, 1)})
+    # The endpoint bucket limits isolines ...
+    assert limiter._reserve("key", "isolines") == 0.0
+    assert limiter._reserve("key", "isolines") == pytest.approx(1.0)
+    # ... while the key bucket, already down two tokens, caps every endpoint together
+    assert [limiter._reserve("key", "geocode") for _ in range(2)] == [0.0, 0.0]
+    assert limiter._reserve("key", "geocode") == pytest.approx(0.25)
+    # Budgets are per key
+    assert limiter._reserve("other", "isolines") == 0.0
+
+def test_throttled_pauses_and_halves_the_rate(clock):
+    bucket = TokenBucket(rate=8, burst=8)
+    bucket.throttled(retry_after=2.0)
+
+    assert bucket.rate == 4
+    assert bucket.reserve() == pytest.approx(2.0)
+    bucket.throttled(retry_after=0)
+    bucket.throttled(retry_after=0)
+    bucket.throttled(retry_after=0)
+    # Never below a tenth of the configured rate
+    assert bucket.rate == pytest.approx(0.8)
+
+def test_rate_recovers_additively(clock):
+    bucket = TokenBucket(rate=10, burst=10)
+    bucket.throttled(retry_after=0)
+    assert bucket.rate == 5
+    rates = []
+    for _ in range(12):
+        bucket.succeeded()
+        rates.append(bucket.rate)
+    assert rates[:3] == pytest.approx([5.5, 6.0, 6.5])
+    assert rates[-1] == 10
+
+def test_feedback_routes_429_to_the_endpoint_bucket(clock):
+    limiter = RateLimiter(key_rate=10, key_burst=10, budgets={"tiles": (10, 10)})
+    limiter._reserve("secret-api-key", "tiles")
+    assert limiter.feedback("secret-api-key", "tiles", response(200)) is None
+    assert limiter.feedback("secret-api-key", "tiles", response(429, "3")) == 3.0
+
+    stats = limiter.stats()
+    key_id = limiter._key_id("secret-api-key")
+    assert stats["endpoints"]["tiles"]["throttled"] == 1
+    # Only the endpoint bucket backs off, and the API key itself never shows up in stats
+    assert stats["rates"] == {f"{key_id}:*": 10.0, f"{key_id}:tiles": 5.0}
+    assert "secret" not in str(stats)
+
+def test_acquire_sync_records_waits(clock, monkeypatch):
+    slept = []
+    monkeypatch.setattr(rate_limiter.time, "sleep", slept.append)
+    limiter = RateLimiter(key_rate=100, key_burst=100, budgets={"routes": (2, 1)})
+
+    limiter.acquire_sync("key", "routes")
+    limiter.acquire_sync("key", "routes")
+
+    assert slept == [pytest.approx(0.5)]
+    stats = limiter.stats()["endpoints"]["routes"]
+    assert (stats["requests"], stats["waited"]) == (2, 1)
+    assert stats["max_wait_seconds"] == pytest.approx(0.5)
+
+@pytest.mark.parametrize("value, expected", [
+    (None, 1.0), ("", 1.0), ("7", 7.0), ("2.5", 2.5), ("-3", 0.0), ("soon", 1.0)
+])
+def test_retry_after_seconds(value, expected):
+    assert retry_after_seconds(value) == expected
+
+def test_retry_after_http_date():
+    assert retry_after_seconds(formatdate(time.time() + 30, usegmt=True)) == pytest.approx(30, abs=1.5)
+    assert retry_after_seconds(formatdate(time.time() - 30, usegmt=True)) == 0.0
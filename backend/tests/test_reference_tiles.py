@@ -0,0 +1,114 @@
+"""Reference windows mosaicked from z/x/y tiles served by a local tile server"""
+
+import http.server
+import threading
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from tiles import TILE_SIZE, lonlat_to_pixel, mosaic
+
+def tile_pixels(x: int, y: int) -> np.ndarray:
+    """Tile whose pixels encode their position: R/G = pixel in tile, B = tile parity"""
+    rows, columns = np.mgrid[0:TILE_SIZE, 0:TILE_SIZE]
+    blue = np.full((TILE_SIZE, TILE_SIZE), (x % 16) * 16 + y % 16)
+    return np.dstack([columns, rows, blue]).astype(np.uint8)
+
+def expected_window(left: int, top: int, zoom: int, width: int, height: int) -> np.ndarray:
+    rows, columns = np.mgrid[top:top + height, left:left + width]
+    tile_x = (columns // TILE_SIZE) % (2 ** zoom)
+    tile_y = rows // TILE_SIZE
+    return np.dstack([columns % TILE_SIZE, rows % TILE_SIZE, (tile_x % 16) * 16 + tile_y % 16]).astype(np.uint8)
+
+@pytest.fixture
+def tile_server():
+    requests = []
+
+    class TileHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            z, x, y = (int(v) for v in self.path.split("?")[0].strip("/").removesuffix(".png").split("/"))
+            requests.append((z, x, y))
+            if x == 0 and y == 0:
+                self.send_error(404)
+                return
+            buffer = BytesIO()
+            Image.fromarray(tile_pixels(x, y)).save(buffer, "PNG")
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(buffer.getvalue())))
+            self.end_headers()
+            self.wfile.write(buffer.getvalue())
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), TileHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/{{z}}/{{x}}/{{y}}.png", requests
+    server.shutdown()
+
+@pytest.fixture
+def image_service(tile_server, tmp_path, monkeypatch):
+    url, _ = tile_server
+    monkeypatch.setenv("HERE_TILE_URL", url)
+    monkeypatch.setenv("HERE_CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setenv("HERE_API_KEY", "test-key")
+    monkeypatch.delenv("USE_MOCK_IMAGES", raising=False)
+    from here_image_service import HEREImageService
+    return HEREImageService()
+
+def test_mosaic_crops_window_across_tiles():
+    window = mosaic(1000.5, 700, 4, 300, 200, lambda z, x, y: Image.fromarray(tile_pixels(x, y)))
+    assert window.size == (300, 200)
+    assert np.array_equal(np.array(window), expected_window(1000, 700, 4, 300, 200))
+
+def test_mosaic_wraps_the_antimeridian():
+    zoom = 2
+    left = TILE_SIZE * 2 ** zoom - 100
+    window = mosaic(left, 300, zoom, 200, 100, lambda z, x, y: Image.fromarray(tile_pixels(x, y)))
+    assert np.array_equal(np.array(window), expected_window(left, 300, zoom, 200, 100))
+
+def test_mosaic_needs_every_tile():
+    assert mosaic(0, 0, 3, 600, 300, lambda z, x, y: None if x == 1 else Image.fromarray(tile_pixels(x, y))) is None
+
+def test_reference_window_from_fetched_tiles(image_service, tile_server):
+    _, requests = tile_server
+    lat, lon, zoom = 19.076, 72.8777, 15
+    result = image_service.get_reference_png(lat, lon, zoom, 512, 384, "satellite.day")
+
+    center_x, center_y = lonlat_to_pixel(lon, lat, zoom)
+    left, top = round(center_x) - 256, round(center_y) - 192
+    # A window not aligned to the tile grid spans 3x2 or 3x3 tiles
+    assert result["tiles"] == {"total": len(requests), "cached": 0}
+    assert len(requests) in (6, 9)
+    image = np.array(Image.open(BytesIO(result["png"])))
+    assert image.shape == (384, 512, 3)
+    assert np.array_equal(image, expected_window(left, top, zoom, 512, 384))
+
+    # The same window again is one cached PNG; a nearby one reuses the cached tiles
+    assert image_service.get_reference_png(lat, lon, zoom, 512, 384, "satellite.day")["cached"]
+    fetched = len(requests)
+    nearby = image_service.get_reference_png(lat + 1e-4, lon, zoom, 512, 384, "satellite.day")
+    assert nearby["tiles"]["cached"] > 0
+    assert nearby["tiles"]["total"] - nearby["tiles"]["cached"] == len(requests) - fetched
+
+def test_missing_tile_is_an_error(image_service):
+    result = image_service.get_reference_png(85.0, -180.0, 1, 256, 256)
+    assert "error" in result and "png" not in result
+
+@pytest.mark.parametrize("max_side, expected", [(None, (512, 1024, 3)), (512, (256, 512, 3)), (10_000, (1000, 2000, 3))])
+def test_compare_runs_at_requested_side(image_service, monkeypatch, max_side, expected):
+    import here_image_service
+    monkeypatch.setattr(here_image_service, "COMPARE_MAX_SIDE_LIMIT", 2000)
+    monkeypatch.setattr(here_image_service, "COMPARE_ALIGN", False)
+    upload = BytesIO()
+    Image.new("RGB", (2000, 1000), (90, 120, 60)).save(upload, "JPEG")
+    kwargs = {} if max_side is None else {"max_side": max_side}
+
+    result = image_service.compare_disaster_image(upload.getvalue(), 19.076, 72.8777, 15, **kwargs)
+
+    assert result["success"]
+    assert tuple(result["disaster_image_size"]) == expected
+    assert tuple(result["reference_image_size"]) == expected
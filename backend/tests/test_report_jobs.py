@@ -0,0 +1,30 @@
+"""PDF report workers reuse one exporter (and its image caches) per process"""
+
+import pytest
+
+pytest.importorskip("reportlab")
+
+import report_jobs
+
+def test_worker_builds_one_exporter(monkeypatch):
+    built = []
+
+    class FakeExporter:
+        def __init__(self):
+            built.append(self)
+
+        def generate_pdf_report(self, disaster_data, statistics):
+            return b"%PDF-" + str(len(disaster_data)).encode()
+
+    monkeypatch.setattr(report_jobs, "MapExporter", FakeExporter)
+    monkeypatch.setattr(report_jobs, "_exporter", None)
+
+    assert report_jobs.render_pdf_report({"zones": []}, {}) == b"%PDF-1"
+    assert report_jobs.render_pdf_report({"zones": [], "alerts": []}, {}) == b"%PDF-2"
+    assert len(built) == 1
+
+def test_exporter_uses_the_given_image_service():
+    from map_exporter import MapExporter
+
+    service = object()
+    assert MapExporter(image_service=service).static_maps.image_service is service
@@ -0,0 +1,108 @@
+"""Route/isoline cache: snapped keys, TTL, compact polygons and zone invalidation"""
+
+import time
+
+import numpy as np
+import pytest
+
+from here_service import HEREService, changed_zones, zone_area
+from route_cache import RouteCache, circle_bbox, compact_isolines, expand_isolines, intersects, route_bbox
+
+@pytest.fixture
+def service():
+    service = HEREService()
+    service.api_key = "test"
+    service._route_cache = RouteCache(max_entries=64, ttl_seconds=300)
+    service.upstream = []
+
+    def fake_route(origin, destination, transport_mode):
+        service.upstream.append(("route", origin, destination))
+        return {"success": True, "distance_meters": 1200, "polyline": "abc", "transport_mode": transport_mode}
+
+    def fake_isoline(origin, range_type, range_values, transport_mode):
+        service.upstream.append(("isoline", origin))
+        return {"success": True, "origin": {"lat": origin[0], "lon": origin[1]}, "isolines": [{
+            "range_value": range_values[0], "range_type": range_type, "transport_mode": transport_mode,
+            "polygons": [[[origin[1] - 0.01, origin[0] - 0.01], [origin[1] + 0.01, origin[0] - 0.01],
+                          [origin[1], origin[0] + 0.01]]]
+        }]}
+
+    service._calculate_route = fake_route
+    service._calculate_isoline = fake_isoline
+    return service
+
+def zone(zone_id, lat, lon, area=3.14, severity="high", **extra):
+    return {"id": zone_id, "coordinates": {"lat": lat, "lon": lon}, "affected_area_km2": area,
+            "severity": severity, **extra}
+
+def test_nearby_endpoints_share_a_route(service):
+    first = service.calculate_route((19.07600, 72.87770), (19.11000, 72.90000))
+    # A few meters away: same geohash-8 cells
+    second = service.calculate_route((19.07601, 72.87771), (19.11001, 72.90001))
+    other_mode = service.calculate_route((19.07600, 72.87770), (19.11000, 72.90000), "pedestrian")
+    elsewhere = service.calculate_route((19.20000, 72.87770), (19.11000, 72.90000))
+
+    assert "cached" not in first and second["cached"]
+    assert "cached" not in other_mode and "cached" not in elsewhere
+    assert len(service.upstream) == 3
+    assert service.route_cache_stats()["hits"] == 1
+
+def test_entries_expire_after_their_ttl():
+    cache = RouteCache(ttl_seconds=0.05)
+    cache.put("short", {"a": 1}, (0, 0, 1, 1))
+    cache.put("long", {"b": 2}, (0, 0, 1, 1), ttl_seconds=60)
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    assert cache.get("long") == {"b": 2}
+    assert cache.stats()["expired"] == 1
+
+def test_isolines_round_trip_through_compact_form(service):
+    result = service.calculate_isoline((19.076, 72.8777), range_values=[600])
+    cached = service.calculate_isoline((19.076, 72.8777), range_values=[600])
+
+    assert cached["cached"] and len(service.upstream) == 1
+    np.testing.assert_allclose(cached["isolines"][0]["polygons"], result["isolines"][0]["polygons"], atol=1e-6)
+
+    compact, bbox = compact_isolines(result)
+    assert compact["isolines"][0]["polygons"][0].dtype == np.int32
+    assert bbox == pytest.approx((72.8677, 19.066, 72.8877, 19.086))
+    assert expand_isolines(compact)["isolines"][0]["range_value"] == 600
+    assert compact_isolines({"isolines": [{"polygons": [[]]}]})[1] is None
+
+def test_zone_invalidates_only_routes_it_crosses(service):
+    service.calculate_route((19.00, 72.80), (19.02, 72.82))
+    service.calculate_route((19.30, 73.10), (19.32, 73.12))
+    service.calculate_isoline((19.01, 72.81), range_values=[600])
+
+    dropped = service.invalidate_routes([zone("z1", 19.01, 72.81)])
+
+    assert dropped == 2
+    assert service.calculate_route((19.30, 73.10), (19.32, 73.12))["cached"]
+    assert "cached" not in service.calculate_route((19.00, 72.80), (19.02, 72.82))
+
+def test_bbox_helpers():
+    box = circle_bbox(19.0, 72.8, 1.0)
+    assert box[0] < 72.8 < box[2] and box[1] < 19.0 < box[3]
+    assert intersects(box, (72.8, 19.0, 72.9, 19.1))
+    assert not intersects(box, (73.0, 19.5, 73.1, 19.6))
+    # Padded by at least 1 km even for a zero-length route
+    west, south, east, north = route_bbox((19.0, 72.8), (19.0, 72.8))
+    assert north - south == pytest.approx(2 / 111.32)
+
+def test_changed_zones_ignores_refreshed_timestamps():
+    before = {"z1": zone("z1", 19.0, 72.8, last_updated="t0"), "z2": zone("z2", 19.1, 72.9),
+              "z3": zone("z3", 19.2, 73.0)}
+    diff = {
+        "added": {"z4": zone("z4", 19.3, 73.1)},
+        "updated": {
+            "z1": zone("z1", 19.0, 72.8, last_updated="t1"),
+            "z2": zone("z2", 19.15, 72.9),
+            "z3": zone("z3", 19.2, 73.0, severity="critical")
+        },
+        "removed": []
+    }
+
+    changed = changed_zones(diff, before)
+
+    footprints = [(item["id"], zone_area(item)[:2]) for item in changed]
+    assert footprints == [("z4", (19.3, 73.1)), ("z2", (19.15, 72.9)), ("z2", (19.1, 72.9)), ("z3", (19.2, 73.0))]
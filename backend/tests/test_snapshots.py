@@ -0,0 +1,116 @@
+"""Snapshot endpoints through main.app: ETags, bbox variants, 304s and wire-size accounting"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from snapshots import SnapshotStore, etag_matches
+
+@pytest.fixture(scope="module")
+def main():
+    # main loads the ML models' dependencies (torch, transformers) at import time
+    return pytest.importorskip("main")
+
+def zone(i, lat, lon, **extra):
+    return {"id": f"z{i}", "name": f"Zone {i}", "coordinates": {"lat": lat, "lon": lon},
+            "severity": "high", "affected_area_km2": 1.5, "last_updated": "2026-10-19T12:00:00", **extra}
+
+def layers(main, zones=None, posts=None):
+    zones = zones if zones is not None else (
+        main.tag_real_time([zone(i, 19.0 + i * 0.01, 72.8, source="USGS") for i in range(3)]) +
+        [zone(i, 19.0 + i * 0.01, 72.9) for i in range(3, 200)]
+    )
+    return {
+        "zones": zones,
+        "flood_areas": [],
+        "alerts": [{"id": "a1", "category": "rescue", "status": "active"}],
+        "social_feed": posts if posts is not None else [],
+        "infrastructure": [],
+        "displacement": []
+    }
+
+@pytest.fixture
+def client(main, monkeypatch):
+    store = SnapshotStore()
+    monkeypatch.setattr(main, "snapshot_store", store)
+    monkeypatch.setattr(main, "repository", None)
+    main.publish_snapshots(layers(main))
+    # No context manager: the startup background tasks (scrapers, refresh loop) stay off
+    return TestClient(main.app), store
+
+def test_etag_is_weak_and_matches_any_encoding():
+    store = SnapshotStore()
+    snapshot = store.put("zones", {"zones": [{"id": i, "name": "zone"} for i in range(200)]})
+    assert snapshot.etag.startswith('W/"')
+    assert snapshot.variant_etag("72,18,74,20").startswith('W/"')
+    assert etag_matches(snapshot.etag, snapshot.etag)
+    assert etag_matches(snapshot.etag[2:], snapshot.etag)
+    assert etag_matches(f'W/"other", {snapshot.etag}', snapshot.etag)
+    assert not etag_matches('W/"other"', snapshot.etag)
+
+def test_disaster_zones_304_across_encodings(client):
+    client, store = client
+    snapshot = store.get("disaster-zones")
+
+    gzipped = client.get("/api/disaster-zones", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.status_code == 200
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] == snapshot.etag
+    assert "Accept-Encoding" in gzipped.headers["vary"]
+    body = gzipped.json()
+    assert (body["count"], body["real_count"], body["simulation_count"]) == (200, 3, 197)
+    assert body["sources"] == ["USGS", "Mumbai Simulation"]
+
+    # A tag received with gzip revalidates an identity request too
+    cached = client.get("/api/disaster-zones",
+                        headers={"Accept-Encoding": "identity", "If-None-Match": gzipped.headers["etag"]})
+    assert cached.status_code == 304
+    assert cached.headers["vary"] == "Accept-Encoding"
+    assert cached.headers["etag"] == snapshot.etag
+
+    stats = store.stats()["disaster-zones"]
+    assert (stats["requests"], stats["not_modified"]) == (2, 1)
+    assert stats["bytes_sent"] == gzipped.num_bytes_downloaded < len(snapshot.body)
+    # Saved as much as the last body sent for this tag
+    assert stats["bytes_saved"] == gzipped.num_bytes_downloaded
+
+def test_bbox_variant_has_its_own_etag(client):
+    client, store = client
+    snapshot = store.get("disaster-zones")
+
+    response = client.get("/api/disaster-zones", params={"bbox": "72.85,18.9,73,21"})
+    body = response.json()
+    assert response.headers["etag"] == snapshot.variant_etag("72.85,18.9,73,21")
+    assert response.headers["etag"] != snapshot.etag
+    assert (body["count"], body["real_count"]) == (197, 0)
+
+    cached = client.get("/api/disaster-zones", params={"bbox": "72.85,18.9,73,21"},
+                        headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    # The full snapshot's tag does not validate a filtered view
+    other = client.get("/api/disaster-zones", params={"bbox": "72.85,18.9,73,21"},
+                       headers={"If-None-Match": snapshot.etag})
+    assert other.status_code == 200
+    assert client.get("/api/disaster-zones", params={"bbox": "bad"}).status_code == 400
+
+def test_social_feed_counts_only_scraped_posts(main, client):
+    client, store = client
+    samples = main.data_generator.generate_social_feed()
+    assert all(post.get("source") for post in samples)
+
+    main.publish_snapshots(layers(main, posts=samples))
+    body = client.get("/api/social-feed").json()
+    assert (body["count"], body["real_count"], body["sample_count"]) == (len(samples), 0, len(samples))
+
+    scraped = main.tag_real_time([{"id": "s1", "text": "Water rising", "source": "Reddit r/mumbai"}])
+    main.publish_snapshots(layers(main, posts=scraped + samples))
+    body = client.get("/api/social-feed").json()
+    assert (body["real_count"], body["sample_count"]) == (1, len(samples))
+
+def test_statistics_snapshot_ignores_timestamp(main, client):
+    client, store = client
+    first = client.get("/api/statistics")
+    assert first.json()["rescue_operations_active"] == 1
+
+    main.publish_snapshots(layers(main))
+    assert client.get("/api/statistics", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+    assert store.stats()["statistics"]["not_modified"] == 1
@@ -0,0 +1,72 @@
+"""
+Slippy map tile math
+Web Mercator pixel/tile coordinates and local mosaicking of z/x/y tiles
+"""
+
+import math
+from typing import Callable, List, Optional, Tuple
+
+from PIL import Image
+
+TILE_SIZE = 256
+
+def lonlat_to_pixel(lon: float, lat: float, zoom: int) -> Tuple[float, float]:
+    """Global Web Mercator pixel coordinates at a zoom level"""
+    lat = max(min(lat, 85.0511), -85.0511)
+    scale = TILE_SIZE * (2 ** zoom)
+    x = (lon + 180.0) / 360.0 * scale
+    sin_lat = math.sin(math.radians(lat))
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+def pixel_to_lonlat(x: float, y: float, zoom: int) -> Tuple[float, float]:
+    scale = TILE_SIZE * (2 ** zoom)
+    lon = x / scale * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / scale))))
+    return lon, lat
+
+def window_tiles(left: float, top: float, zoom: int, width: int, height: int) -> List[Tuple[int, int, int]]:
+    """(x, y, column) of every tile under a pixel window; x is wrapped across the antimeridian"""
+    first_x, first_y = int(left // TILE_SIZE), int(top // TILE_SIZE)
+    last_x, last_y = int((left + width - 1) // TILE_SIZE), int((top + height - 1) // TILE_SIZE)
+    tiles_per_side = 2 ** zoom
+    return [
+        (tile_x % tiles_per_side, tile_y, tile_x - first_x)
+        for tile_x in range(first_x, last_x + 1)
+        for tile_y in range(first_y, last_y + 1)
+        if 0 <= tile_y < tiles_per_side
+    ]
+
+def mosaic(left: float, top: float, zoom: int, width: int, height: int,
+           get_tile: Callable[[int, int, int], Optional[Image.Image]],
+           background=(241, 245, 249)) -> Optional[Image.Image]:
+    """
+    Compose a pixel window from tiles and crop it
+
+    Args:
+        left: Window left edge in global pixels
+        top: Window top edge in global pixels
+        zoom: Zoom level
+        width: Window width in pixels
+        height: Window height in pixels
+        get_tile: (zoom, x, y) -> tile image, or None when unavailable
+        background: Fill outside the map (beyond the poles)
+
+    Returns:
+        RGB image of the window, or None if any tile is unavailable
+    """
+    first_x, first_y = int(left // TILE_SIZE), int(top // TILE_SIZE)
+    columns = int((left + width - 1) // TILE_SIZE) - first_x + 1
+    rows = int((top + height - 1) // TILE_SIZE) - first_y + 1
+
+    canvas = Image.new("RGB", (columns * TILE_SIZE, rows * TILE_SIZE), color=background)
+    for x, y, column in window_tiles(left, top, zoom, width, height):
+        tile = get_tile(zoom, x, y)
+        if tile is None:
+            return None
+        if tile.size != (TILE_SIZE, TILE_SIZE):
+            tile = tile.resize((TILE_SIZE, TILE_SIZE))
+        canvas.paste(tile.convert("RGB"), (column * TILE_SIZE, (y - first_y) * TILE_SIZE))
+
+    offset_x, offset_y = int(left - first_x * TILE_SIZE), int(top - first_y * TILE_SIZE)
+    return canvas.crop((offset_x, offset_y, offset_x + width, offset_y + height))
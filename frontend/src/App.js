@@ -13,7 +13,12 @@ import { Sun, Moon } from 'lucide-react';
 import TimeSlider from './components/TimeSlider';
 import SearchBar from './components/SearchBar';
 import Notifications from './components/Notifications';
-import { fetchDisasterData } from './services/api';
+import { fetchDisasterData, fetchHistoryFrame, subscribeToLayerStream, applyLayerDelta } from './services/api';
+
+// /api/stream layer -> disasterData key; these are pushed, the rest is polled.
+// The same layers are recorded by the history store and replayed by the TimeSlider
+const STREAMED_LAYERS = { zones: 'zones', flood_areas: 'floodAreas', alerts: 'alerts' };
+const POLL_INTERVAL_MS = 300000;
 
 function App() {
   const [theme, setTheme] = useState('dark');
@@ -40,6 +45,7 @@ function App() {
   
   const [currentTime, setCurrentTime] = useState(24); // 24 = now, 0 = 24h ago
   const [isPlaying, setIsPlaying] = useState(false);
+  const [historyFrame, setHistoryFrame] = useState(null); // layer -> frame while viewing the past
   const [notifications, setNotifications] = useState([]);
   const [selectedZone, setSelectedZone] = useState(null);
   const [liveStatus, setLiveStatus] = useState(false);
@@ -48,14 +54,30 @@ function App() {
   const [coverageData, setCoverageData] = useState(null);
 
   useEffect(() => {
-    const poll = async () => {
-      await loadData();
+    const flashLive = () => {
       setLiveStatus(true);
       setTimeout(() => setLiveStatus(false), 1000);
     };
-    poll();
-    const interval = setInterval(poll, 30000); // Poll every 30 seconds instead of 10
-    return () => clearInterval(interval);
+    const updateLayer = (layer, update) => {
+      const key = STREAMED_LAYERS[layer];
+      setDisasterData(prevData => ({ ...prevData, [key]: update(prevData[key]) }));
+      flashLive();
+    };
+
+    loadData().then(flashLive);
+    const unsubscribe = subscribeToLayerStream(Object.keys(STREAMED_LAYERS), {
+      onSnapshot: (snapshot) => updateLayer(snapshot.layer, () => snapshot.records),
+      onDelta: (delta) => updateLayer(delta.layer, (records) => applyLayerDelta(records, delta)),
+    });
+    // Statistics and the layers that aren't streamed are still polled, far less often
+    const interval = setInterval(
+      () => loadData(Object.values(STREAMED_LAYERS)).then(flashLive),
+      POLL_INTERVAL_MS
+    );
+    return () => {
+      unsubscribe();
+      clearInterval(interval);
+    };
   }, []);
 
   // Time slider playback
@@ -75,9 +97,27 @@ function App() {
     };
   }, [isPlaying, currentTime]);
 
-  const loadData = async () => {
+  // Replay recorded layers when the slider is moved into the past
+  useEffect(() => {
+    if (currentTime >= 24) {
+      setHistoryFrame(null);
+      return undefined;
+    }
+    let cancelled = false;
+    const at = new Date(Date.now() - (24 - currentTime) * 60 * 60 * 1000);
+    fetchHistoryFrame(Object.keys(STREAMED_LAYERS), at).then((frame) => {
+      if (!cancelled) setHistoryFrame(frame);
+    });
+    return () => {
+      cancelled = true;
+    };
+  }, [currentTime]);
+
+  const loadData = async (skip = []) => {
     try {
       const data = await fetchDisasterData();
+      // Streamed layers are kept current by /api/stream
+      skip.forEach(key => delete data[key]);
       // Merge new data with existing state to preserve user interactions
       setDisasterData(prevData => ({
         ...prevData,
@@ -173,6 +213,24 @@ function App() {
     });
   };
 
+  // Past layer states replace the live ones while the slider isn't at "now"
+  const viewData = historyFrame
+    ? {
+        ...disasterData,
+        ...Object.fromEntries(
+          Object.entries(STREAMED_LAYERS).map(([layer, key]) => [key, historyFrame[layer]?.records || []])
+        ),
+      }
+    : disasterData;
+  const recorded = historyFrame && Object.values(historyFrame).filter(Boolean);
+  const historyStatus = !historyFrame
+    ? null
+    : recorded.length
+      ? `Replaying ${new Date(recorded[0].timestamp).toLocaleString('en-US', {
+          month: 'short', day: 'numeric', hour: '2-digit', minute: '2-digit'
+        })}`
+      : 'No history recorded this far back';
+
   if (loading) {
     return (
       <div className="loading-screen">
@@ -206,7 +264,7 @@ function App() {
       <div className="main-container">
         <div className="left-panel">
           <SearchBar 
-            zones={disasterData.zones}
+            zones={viewData.zones}
             onLocationSelect={handleLocationSelect}
           />
           <TimeSlider
@@ -215,8 +273,9 @@ function App() {
             isPlaying={isPlaying}
             onPlayPause={handlePlayPause}
             onReset={handleReset}
+            historyStatus={historyStatus}
           />
-          <PrioritizationPanel zones={disasterData.zones} />
+          <PrioritizationPanel zones={viewData.zones} />
           <RoutePanel 
             zones={disasterData.zones}
             onRouteCalculated={(route) => setRouteData(route)}
@@ -232,13 +291,13 @@ function App() {
             toggleLayer={toggleLayer}
             onExport={handleExport}
           />
-          <AlertPanel alerts={disasterData.alerts} />
+          <AlertPanel alerts={viewData.alerts} />
         </div>
         
         <div className="map-container">
           <DisasterMapLeaflet 
-            zones={disasterData.zones}
-            floodAreas={disasterData.floodAreas}
+            zones={viewData.zones}
+            floodAreas={viewData.floodAreas}
             infrastructure={disasterData.infrastructure}
             displacement={disasterData.displacement}
             selectedLayer={selectedLayer}
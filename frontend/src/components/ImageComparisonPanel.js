@@ -26,12 +26,12 @@ const ImageComparisonPanel = () => {
   const fetchReferenceImage = async () => {
     try {
       const response = await fetch(
-        `${API_URL}/api/here/reference-image?lat=${location.lat}&lon=${location.lon}&zoom=${zoom}&map_type=satellite.day`
+        `${API_URL}/api/here/reference-image.png?lat=${location.lat}&lon=${location.lon}&zoom=${zoom}&map_type=satellite.day`
       );
-      const data = await response.json();
-      
-      if (data.success) {
-        setReferenceImage(`data:image/png;base64,${data.image_base64}`);
+
+      if (response.ok) {
+        const blob = await response.blob();
+        setReferenceImage(URL.createObjectURL(blob));
       }
     } catch (error) {
       console.error('Failed to fetch reference image:', error);
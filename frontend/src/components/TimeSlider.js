@@ -2,7 +2,7 @@ import React from 'react';
 import { Clock, Play, Pause, RotateCcw } from 'lucide-react';
 import './TimeSlider.css';
 
-const TimeSlider = ({ currentTime, onTimeChange, isPlaying, onPlayPause, onReset }) => {
+const TimeSlider = ({ currentTime, onTimeChange, isPlaying, onPlayPause, onReset, historyStatus }) => {
   // Generate time options (last 24 hours)
   const generateTimeOptions = () => {
     const options = [];
@@ -36,6 +36,8 @@ const TimeSlider = ({ currentTime, onTimeChange, isPlaying, onPlayPause, onReset
         <span className="current-time">{currentOption.fullLabel}</span>
       </div>
 
+      {historyStatus && <div className="history-status">{historyStatus}</div>}
+
       <div className="time-slider-controls">
         <button 
           className="time-control-btn"
@@ -87,4 +87,64 @@ export const getHereConfig = async () => {
   }
 };
 
+export const fetchHistory = async (layer, from, to, stepSeconds = 60) => {
+  try {
+    const response = await api.get('/api/history', {
+      params: {
+        layer,
+        from: from.toISOString(),
+        to: to.toISOString(),
+        step: stepSeconds,
+      },
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching layer history:', error);
+    return { layer, frames: [] };
+  }
+};
+
+// Layer states as of one moment, from /api/history (null for a layer with nothing recorded by then)
+export const fetchHistoryFrame = async (layers, at) => {
+  const results = await Promise.all(layers.map((layer) => fetchHistory(layer, at, at)));
+  return Object.fromEntries(
+    results.map((result, i) => [layers[i], result.frames.length ? result.frames[result.frames.length - 1] : null])
+  );
+};
+
+// Apply a layer diff from /api/stream to a list of records
+export const applyLayerDelta = (records, delta) => {
+  const removed = new Set(delta.removed);
+  const changed = new Map(
+    [...delta.added, ...delta.updated].map((record) => [String(record.id), record])
+  );
+  const next = records
+    .filter((record) => !removed.has(String(record.id)))
+    .map((record) => changed.get(String(record.id)) || record);
+  const existing = new Set(next.map((record) => String(record.id)));
+  delta.added.forEach((record) => {
+    if (!existing.has(String(record.id))) next.push(record);
+  });
+  return next;
+};
+
+// Subscribe to pushed layer diffs; EventSource resumes from the last cursor on reconnect
+export const subscribeToLayerStream = (layers, { onSnapshot, onDelta, onError } = {}) => {
+  const params = new URLSearchParams({ layers: layers.join(',') });
+  const source = new EventSource(`${API_BASE_URL}/api/stream?${params}`);
+
+  source.addEventListener('snapshot', (event) => {
+    if (onSnapshot) onSnapshot(JSON.parse(event.data));
+  });
+  source.addEventListener('delta', (event) => {
+    if (onDelta) onDelta(JSON.parse(event.data));
+  });
+  source.onerror = (error) => {
+    console.error('Layer stream error:', error);
+    if (onError) onError(error);
+  };
+
+  return () => source.close();
+};
+
 export default api;